@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# lib/benchmarks/analytics.py
+"""Compare per-doctor, per-hour booking counts from the NumPy snapshot with a loop over Appointment objects.
+
+Run from lib/:  python -m benchmarks.analytics --appointments 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+import dataset
+from models.__init__ import DB
+from models.analytics import AppointmentSnapshot
+from models.appointment import Appointment
+from models.schedule import parse_appointment_date
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def object_counts():
+    counts = Counter()
+    for appointment in Appointment.get_all():
+        counts[appointment.doctor_id, parse_appointment_date(appointment.appointment_date).hour] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset.load(patients=max(args.appointments // 10, 1), doctors=max(args.appointments // 2000, 1),
+                 appointments=args.appointments, medical_records=0, seed=args.seed)
+    directory = tempfile.mkdtemp()
+
+    snapshot = AppointmentSnapshot(directory)
+    _, load = timed(snapshot.refresh)
+    (doctor_ids, counts), grouped = timed(snapshot.bookings_per_doctor_hour)
+    _, heatmap = timed(snapshot.weekday_hour_heatmap)
+    _, weekly = timed(lambda: snapshot.bookings_per_period("W"))
+    _, reopen = timed(lambda: AppointmentSnapshot(directory).refresh())
+
+    expected, loop = timed(object_counts)
+    assert all(counts[i, hour] == expected[doctor_id, hour]
+               for i, doctor_id in enumerate(doctor_ids) for hour in range(24))
+    assert counts.sum() == sum(expected.values())
+
+    print(f"{len(snapshot)} appointments, {len(doctor_ids)} doctors")
+    print(f"snapshot load:             {load * 1000:9.1f} ms")
+    print(f"reopen + refresh (no-op):  {reopen * 1000:9.1f} ms")
+    print(f"doctor x hour counts:      {grouped * 1000:9.1f} ms")
+    print(f"weekday x hour heatmap:    {heatmap * 1000:9.1f} ms")
+    print(f"weekly trend:              {weekly * 1000:9.1f} ms")
+    print(f"Appointment objects loop:  {loop * 1000:9.1f} ms ({loop / grouped:.0f}x the vectorized count)")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# lib/benchmarks/async_lookups.py
+"""Compare awaiting Patient lookups one after another with running them concurrently.
+
+Run from lib/:  python -m benchmarks.async_lookups --patients 20000 --lookups 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from models.__init__ import DB
+from models.patient import Patient
+
+
+async def sequential(names):
+    return [await Patient.afind_by_name(*name) for name in names]
+
+
+async def concurrent(names):
+    return await asyncio.gather(*(Patient.afind_by_name(*name) for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    Patient.drop_table()
+    Patient.create_table()
+    Patient.create_many((f"First{i}", f"Last{i}", 1 + i % 90, "Other") for i in range(args.patients))
+    rng = random.Random(0)
+    names = [(f"First{i}", f"Last{i}") for i in (rng.randrange(args.patients) for _ in range(args.lookups))]
+
+    for label, run in (("sequential", sequential), ("concurrent", concurrent)):
+        start = time.perf_counter()
+        patients = asyncio.run(run(names))
+        elapsed = time.perf_counter() - start
+        assert all(patients)
+        print(f"{label:<11} {args.lookups / elapsed:10.0f} lookups/s")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
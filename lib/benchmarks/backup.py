@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# lib/benchmarks/backup.py
+"""Measure online backup speed, and how long a concurrent writer waits, per step size and profile.
+
+Run from lib/:  python -m benchmarks.backup --patients 200000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import dataset
+from models.__init__ import DB
+from models.backup import backup
+from models.patient import Patient
+
+
+def writer(stop, latencies, interval):
+    """Update one patient every interval seconds until stopped, recording each commit's latency"""
+    patient = Patient.find_by_id(1)
+    while not stop.is_set():
+        start = time.perf_counter()
+        patient.age = patient.age % 90 + 1
+        patient.update()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    DB.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[64, 1024, -1])
+    parser.add_argument("--write-interval", type=float, default=0.01, help="seconds between the writer's commits")
+    parser.add_argument("--profiles", nargs="+", default=["default", "balanced"])
+    args = parser.parse_args()
+
+    DB.configure(profile="fast")
+    dataset.load(patients=args.patients)
+    directory = tempfile.mkdtemp()
+    for profile in args.profiles:
+        DB.configure(profile=profile)
+        for pages in args.pages:
+            stop, latencies = threading.Event(), []
+            thread = threading.Thread(target=writer, args=(stop, latencies, args.write_interval))
+            thread.start()
+            time.sleep(0.05)
+            result = backup(os.path.join(directory, "backup.db"), pages=pages)
+            stop.set()
+            thread.join()
+            latencies.sort()
+            print(f"{profile:<9} pages={pages:>5}: {result.pages} pages in {result.seconds:6.2f} s "
+                  f"({result.pages / result.seconds:8.0f} pages/s, {result.restarts} restarts); "
+                  f"writer commits {len(latencies):4}, max wait {latencies[-1] * 1000:7.1f} ms")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# lib/benchmarks/date_ranges.py
+"""Compare indexed find_between date range queries with filtering iter_all() in Python.
+
+Run from lib/:  python -m benchmarks.date_ranges --appointments 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+import dataset
+from models.__init__ import DB
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.schedule import parse_appointment_date
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def filtered(start, end, doctor_id=None):
+    """The appointments in [start, end) found by loading every appointment"""
+    return [
+        appointment for appointment in Appointment.iter_all(batch_size=10000)
+        if start <= parse_appointment_date(appointment.appointment_date) < end
+        and (doctor_id is None or appointment.doctor_id == doctor_id)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 31])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset.load(
+        patients=max(args.appointments // 10, 1), doctors=max(args.appointments // 2000, 1),
+        appointments=args.appointments, medical_records=args.appointments // 2, seed=args.seed
+    )
+    first = dataset.FIRST_DAY + timedelta(days=30)
+    for days in args.days:
+        end = first + timedelta(days=days)
+        appointments, appointment_time = timed(lambda: Appointment.find_between(first, end))
+        _, doctor_time = timed(lambda: Appointment.find_between(first, end, doctor_id=1))
+        records, record_time = timed(lambda: MedicalRecord.find_between(first, end))
+        print(f"{days:3} days: Appointment.find_between {len(appointments):7} rows {appointment_time * 1000:8.1f} ms, "
+              f"one doctor {doctor_time * 1000:6.1f} ms; "
+              f"MedicalRecord.find_between {len(records):7} rows {record_time * 1000:8.1f} ms")
+
+    end = first + timedelta(days=args.days[0])
+    start_time, end_time = (parse_appointment_date(f"{day} 00:00") for day in (first, end))
+    expected, scan = timed(lambda: filtered(start_time, end_time))
+    assert [a.id for a in expected] == sorted(a.id for a in Appointment.find_between(first, end))
+    print(f"{args.days[0]:3} days: iter_all() filtered in Python {len(expected):7} rows {scan * 1000:8.1f} ms")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# lib/benchmarks/export.py
+"""Measure export throughput and peak Python memory for growing appointment tables.
+
+Run from lib/:  python -m benchmarks.export --sizes 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+import dataset
+from models.__init__ import DB
+from models.export import export_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    for size in args.sizes:
+        dataset.load(patients=max(size // 10, 1), doctors=max(size // 2000, 1), appointments=size,
+                     medical_records=0, seed=args.seed)
+        for name in ("appointments.csv", "appointments.csv.gz", "appointments.jsonl.gz"):
+            path = os.path.join(directory, name)
+            start = time.perf_counter()
+            rows, _ = export_table("appointments", path)
+            elapsed = time.perf_counter() - start
+            # Peak memory on a second pass, as tracemalloc slows allocation down
+            tracemalloc.start()
+            export_table("appointments", path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{rows:>9} rows -> {name:<22} {rows / elapsed:10.0f} rows/s, "
+                  f"{os.path.getsize(path) / 2 ** 20:7.1f} MB, peak {peak / 2 ** 20:5.1f} MB")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# lib/benchmarks/hydration.py
+"""Measure memory per MedicalRecord instance and instance_from_db throughput.
+
+Run from lib/:  python -m benchmarks.hydration --records 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+from models.__init__ import DB
+from models.medical_record import MedicalRecord
+
+
+def populate(count):
+    MedicalRecord.drop_table()
+    MedicalRecord.create_table()
+    with DB.session():
+        DB.executemany(
+            "INSERT INTO medical_records (patient_id, doctor_id, record_date, diagnosis, treatment) VALUES (?, ?, ?, ?, ?)",
+            ((1 + i % 5000, 1 + i % 100, f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "Hypertension", "ACE inhibitors")
+             for i in range(count))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000000)
+    args = parser.parse_args()
+
+    populate(args.records)
+    rows = DB.execute("SELECT * FROM medical_records").fetchall()
+
+    start = time.perf_counter()
+    records = [MedicalRecord.instance_from_db(row) for row in rows]
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in rows:
+        MedicalRecord.instance_from_db(row)
+    warm = time.perf_counter() - start
+
+    # Measure memory on a second cold pass, as tracemalloc slows allocation down
+    del records
+    MedicalRecord.all.clear()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [MedicalRecord.instance_from_db(row) for row in rows]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    sample = records[0]
+    values = [getattr(sample, slot) for slot in MedicalRecord.__slots__ if slot != "__weakref__"]
+    instance, fields = sys.getsizeof(sample), sum(sys.getsizeof(value) for value in values)
+    print(f"{len(records)} MedicalRecord rows; slotted instance {instance} bytes, "
+          f"plus {fields} bytes of field values (shared with the fetched row)")
+    print(f"new instances:      {len(rows) / cold:10.0f} rows/s, {used / len(records):.0f} bytes per instance "
+          f"(incl. identity map references)")
+    print(f"refresh registered: {len(rows) / warm:10.0f} rows/s")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
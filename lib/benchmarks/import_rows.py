@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# lib/benchmarks/import_rows.py
+"""Compare the validated bulk import of a patients CSV with one Patient.create() per row.
+
+Run from lib/:  python -m benchmarks.import_rows --rows 500000 --workers 0 2 4
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+from dataset import Generator
+from models.__init__ import DB
+from models.importer import import_file
+from models.patient import Patient
+
+
+def write_patients(path, rows, seed):
+    """Write rows patients to a CSV file, one in 50 of them invalid; return the number of invalid rows"""
+    generator = Generator(seed)
+    invalid = 0
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(("first_name", "last_name", "age", "gender"))
+        for index in range(rows):
+            first_name, last_name, age, gender = generator.patient()
+            if index % 50 == 49:
+                age, invalid = -age, invalid + 1
+            writer.writerow((first_name, last_name, age, gender))
+    return invalid
+
+
+def reset():
+    Patient.drop_table()
+    Patient.create_table()
+    Patient.all.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count()])
+    parser.add_argument("--create-rows", type=int, default=5000, help="rows for the per-row create() baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "patients.csv")
+    invalid = write_patients(path, args.rows, args.seed)
+    errors = os.path.join(directory, "errors.jsonl")
+
+    for workers in args.workers:
+        reset()
+        result = import_file("patients", path, errors, workers=workers)
+        assert result.rejected == invalid and result.imported == args.rows - invalid
+        print(f"import, {workers} workers: {result.rows / result.seconds:10.0f} rows/s "
+              f"({result.imported} imported, {result.rejected} rejected)")
+
+    reset()
+    generator = Generator(args.seed)
+    start = time.perf_counter()
+    for _ in range(args.create_rows):
+        Patient.create(*generator.patient())
+    elapsed = time.perf_counter() - start
+    print(f"Patient.create per row: {args.create_rows / elapsed:10.0f} rows/s")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
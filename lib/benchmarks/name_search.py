@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# lib/benchmarks/name_search.py
+"""Time prefix and fuzzy patient name lookups against an exact-name LIKE scan.
+
+Run from lib/:  python -m benchmarks.name_search --patients 1000000 --queries 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+from models.__init__ import DB
+from models.name_search import PATIENT_NAMES
+from models.patient import Patient
+
+# Onset + vowel + coda syllables, a few hundred, so names vary roughly as much as real ones
+SYLLABLES = [onset + vowel + coda
+             for onset in ("", "b", "br", "c", "ch", "d", "f", "g", "h", "j", "k", "l", "m", "n", "p", "r", "s", "st", "t", "v", "w", "z")
+             for vowel in ("a", "e", "i", "o", "u", "ie", "ou")
+             for coda in ("", "n", "r", "l", "s", "tt")]
+
+
+def random_name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def misspell(name, rng):
+    """Swap two neighbouring letters of a name"""
+    i = rng.randrange(len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def latencies(func, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return f"median {timings[len(timings) // 2]:.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [(random_name(rng), random_name(rng)) for _ in range(args.patients)]
+    Patient.drop_table()
+    Patient.create_table()
+    with DB.session():
+        DB.executemany(
+            "INSERT INTO patients (first_name, last_name, age, gender) VALUES (?, ?, ?, 'Other')",
+            ((first, last, 1 + i % 90) for i, (first, last) in enumerate(names))
+        )
+    start = time.perf_counter()
+    PATIENT_NAMES.rebuild()
+    print(f"Indexed {args.patients} patient names in {time.perf_counter() - start:.1f}s")
+
+    sample = [rng.choice(names) for _ in range(args.queries)]
+    prefixes = [f"{first[:3]} {last[:2]}" for first, last in sample]
+    typos = [f"{misspell(first, rng)} {last}" for first, last in sample]
+    word_typos = [misspell(last, rng) for first, last in sample]
+    like_sql = "SELECT id FROM patients WHERE first_name || ' ' || last_name LIKE ? LIMIT 10"
+
+    print(f"LIKE '%name%' scan:  {latencies(lambda q: DB.execute(like_sql, (f'%{q}%',)).fetchall(), prefixes[:10])}")
+    print(f"prefix index:       {latencies(PATIENT_NAMES.prefix, prefixes)}")
+    print(f"fuzzy, full name:   {latencies(PATIENT_NAMES.fuzzy, typos)}")
+    print(f"fuzzy, one word:    {latencies(PATIENT_NAMES.fuzzy, word_typos)}")
+    print(f"search_by_name:     {latencies(Patient.search_by_name, typos)}")
+    found = sum(1 for (first, last), typo in zip(sample, typos)
+                if any((p.first_name, p.last_name) == (first, last) for p in Patient.search_by_name(typo)))
+    print(f"Misspelt names found in the top 10: {found}/{len(typos)}")
+    found = sum(1 for (first, last), typo in zip(sample, word_typos)
+                if any(p.last_name == last for p in Patient.search_by_name(typo)))
+    print(f"Misspelt single last names found in the top 10: {found}/{len(word_typos)}")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# lib/benchmarks/next_slot.py
+"""Time "next free slots for a specialization" lookups on a year of bookings.
+
+Run from lib/:  python -m benchmarks.next_slot --doctors 500 --per-day 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+from models.__init__ import DB
+from models.availability import AVAILABILITY
+from models.doctor import Doctor
+from models.appointment import Appointment
+
+SPECIALIZATIONS = ["Cardiology", "Dermatology", "Neurology", "Oncology", "Paediatrics",
+                   "Psychiatry", "Radiology", "Surgery", "Gynaecology", "General Practice"]
+
+
+def populate(doctors, per_day, first_day, rng):
+    """Book per_day random 30 minute slots per doctor per day for a year, straight into the table"""
+    Doctor.drop_table()
+    Appointment.drop_table()
+    Doctor.create_table()
+    Appointment.create_table()
+    DB.executemany(
+        "INSERT INTO doctors (name, specialization) VALUES (?, ?)",
+        ((f"Doctor {i}", SPECIALIZATIONS[i % len(SPECIALIZATIONS)]) for i in range(doctors))
+    )
+    rows = []
+    for doctor_id in range(1, doctors + 1):
+        for offset in range(365):
+            day = datetime.combine(first_day + timedelta(days=offset), datetime.min.time())
+            for slot in rng.sample(range(20), per_day):
+                start = day + timedelta(hours=8, minutes=30 * slot)
+                rows.append((f"{start:%Y-%m-%d %H:%M}", 1, doctor_id, None, 30))
+    with DB.session():
+        DB.executemany(
+            "INSERT INTO appointments (appointment_date, patient_id, doctor_id, notes, duration) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+    return len(rows)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--per-day", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    first_day = datetime(2024, 1, 1).date()
+    start = time.perf_counter()
+    count = populate(args.doctors, args.per_day, first_day, rng)
+    print(f"Booked {count} appointments for {args.doctors} doctors in {time.perf_counter() - start:.1f}s")
+
+    afters = [datetime.combine(first_day + timedelta(days=rng.randrange(358)), datetime.min.time()) + timedelta(hours=rng.randrange(8, 18))
+              for _ in range(args.queries)]
+    _, cold = timed(Doctor.next_available, "Cardiology", after=afters[0], count=5)
+    print(f"First lookup (loads one week of {args.doctors // len(SPECIALIZATIONS)} calendars): {cold:.1f} ms")
+
+    lookups = [(rng.choice(SPECIALIZATIONS), after) for after in afters]
+    for label in ("cold weeks", "warm weeks"):
+        latencies = sorted(timed(Doctor.next_available, specialization, after=after, count=5)[1] for specialization, after in lookups)
+        print(f"{label}: median {latencies[len(latencies) // 2]:.2f} ms, p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms")
+
+    doctor = Doctor.find_by_id(1)
+    slot_doctor, slot = Doctor.next_available(doctor.specialization, after=afters[0], count=1)[0]
+    appointment, booking = timed(Appointment.create, f"{slot:%Y-%m-%d %H:%M}", 1, slot_doctor.id)
+    _, delete = timed(appointment.delete)
+    print(f"Incremental update: book {booking:.2f} ms, cancel {delete:.2f} ms; {AVAILABILITY}")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# lib/benchmarks/profiles.py
+"""Compare the SQLite performance profiles on a create/find/update/delete mix.
+
+Each profile gets a fresh database file. Run from lib/:
+    python -m benchmarks.profiles --operations 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from models.__init__ import DB, initialize_database
+from models.connection import PROFILES
+from models.patient import Patient
+from models.appointment import Appointment
+
+
+def crud_mix(operations, rng):
+    """Run the mix and return the elapsed seconds per phase"""
+    timings = {}
+
+    start = time.perf_counter()
+    patients = [Patient.create(f"First{i}", f"Last{i}", 1 + i % 90, "Other") for i in range(operations)]
+    # 20 doctors, each booked back to back in 30 minute slots
+    appointments = [
+        Appointment.create(f"{datetime(2024, 1, 1) + timedelta(minutes=30 * (i // 20)):%Y-%m-%d %H:%M}", patient.id, 1 + i % 20)
+        for i, patient in enumerate(patients)
+    ]
+    timings["create"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(operations):
+        patient = Patient.find_by_id(rng.choice(patients).id)
+        Appointment.find_by_patient_id(patient.id)
+    timings["find"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for patient in rng.sample(patients, operations // 2):
+        patient.age += 1
+        patient.update()
+    timings["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for appointment in rng.sample(appointments, operations // 2):
+        appointment.delete()
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(f"{'profile':<10}" + "".join(f"{phase:>12}" for phase in ("create", "find", "update", "delete", "total")))
+    for profile in args.profiles:
+        DB.configure(path=os.path.join(directory, f"{profile}.db"), profile=profile)
+        initialize_database()
+        timings = crud_mix(args.operations, random.Random(0))
+        timings["total"] = sum(timings.values())
+        print(f"{profile:<10}" + "".join(f"{seconds:>11.3f}s" for seconds in timings.values()))
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# lib/benchmarks/query_plans.py
+"""Check that the hot lookups are served by indexes rather than table scans.
+
+Prints the EXPLAIN QUERY PLAN of each lookup and exits non-zero if any of them
+scans a table. Run from lib/:  python -m benchmarks.query_plans
+The test suite asserts the same for every LOOKUPS entry (tests/test_query_plans.py).
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from models.__init__ import DB, initialize_database
+
+LOOKUPS = {
+    "Patient.find_by_name": ("SELECT * FROM patients WHERE first_name = ? AND last_name = ?", ("John", "Doe")),
+    "Doctor.find_by_name": ("SELECT * FROM doctors WHERE name = ?", ("House",)),
+    "Appointment.find_by_patient_id": ("SELECT * FROM appointments WHERE patient_id = ?", (1,)),
+    "Appointment.find_by_doctor_id": ("SELECT * FROM appointments WHERE doctor_id = ?", (1,)),
+    "Appointment by date": ("SELECT * FROM appointments WHERE appointment_date >= ? AND appointment_date < ?", ("2024-01-01", "2024-02-01")),
+    "MedicalRecord.find_by_patient_id": ("SELECT * FROM medical_records WHERE patient_id = ?", (1,)),
+    "MedicalRecord.find_by_doctor_id": ("SELECT * FROM medical_records WHERE doctor_id = ?", (1,)),
+    "Appointment.find_between": ("SELECT * FROM appointments WHERE appointment_date >= ? AND appointment_date < ? ORDER BY appointment_date, id", ("2024-01-01 00:00", "2024-02-01 00:00")),
+    "Appointment.find_between for a doctor": ("SELECT * FROM appointments WHERE appointment_date >= ? AND appointment_date < ? AND doctor_id = ? ORDER BY appointment_date, id", ("2024-01-01 00:00", "2024-02-01 00:00", 1)),
+    "Patient.timeline appointments": ("SELECT * FROM appointments WHERE patient_id = ? AND appointment_date <= ? AND (appointment_date, id) < (?, ?) ORDER BY appointment_date DESC, id DESC", (1, "2024-06-01 09:00", "2024-06-01 09:00", 10)),
+    "Patient.timeline medical records": ("SELECT * FROM medical_records WHERE patient_id = ? AND record_date < ? ORDER BY record_date DESC, id DESC", (1, "2024-06-01 09:00")),
+    "MedicalRecord.find_between": ("SELECT * FROM medical_records WHERE record_date >= ? AND record_date < ? ORDER BY record_date, id", ("2024-01-01", "2024-02-01")),
+    "MedicalRecord.find_between for a doctor": ("SELECT * FROM medical_records WHERE record_date >= ? AND record_date < ? AND doctor_id = ? ORDER BY record_date, id", ("2024-01-01", "2024-02-01", 1)),
+    "workload.by_day for a doctor": ("SELECT * FROM appointment_workload WHERE doctor_id = ? AND day >= ? AND day < ?", (1, "2024-01-01", "2024-02-01")),
+    "workload.by_doctor for a period": ("SELECT * FROM medical_record_workload WHERE day >= ? AND day < ?", ("2024-01-01", "2024-02-01")),
+}
+
+
+def query_plan(sql, params):
+    return [row[3] for row in DB.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def main():
+    initialize_database()
+    failures = 0
+    for name, (sql, params) in LOOKUPS.items():
+        plan = query_plan(sql, params)
+        uses_index = all(not step.startswith("SCAN") for step in plan)
+        failures += not uses_index
+        print(f"{'ok  ' if uses_index else 'SCAN'} {name}: {'; '.join(plan)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
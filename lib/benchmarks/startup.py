@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# lib/benchmarks/startup.py
+"""Measure interpreter startup for the CLI and the models, and the schema check on a current database.
+
+Each case runs in a fresh interpreter, as a user would start it. Run from lib/:
+python -m benchmarks.startup --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+LIB = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "python -c pass": "pass",
+    "import cli": "import cli",
+    "import every model": (
+        "import models.patient, models.doctor, models.appointment, models.medical_record"
+    ),
+    "initialize_database (current)": (
+        "from models.__init__ import initialize_database; assert not initialize_database()"
+    ),
+}
+
+
+def run(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=LIB, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.environ.get("HOSPITAL_DB") or os.path.join(tempfile.mkdtemp(), "bench.db")
+    env = dict(os.environ, HOSPITAL_DB=path)
+    subprocess.run([sys.executable, "-c", "from models.__init__ import initialize_database; initialize_database()"],
+                   cwd=LIB, env=env, check=True)
+    modified = os.stat(path).st_mtime_ns
+
+    for name, code in CASES.items():
+        timings = sorted(run(code, env) for _ in range(args.runs))
+        print(f"{name:<32} median {statistics.median(timings) * 1000:7.1f} ms, "
+              f"best {timings[0] * 1000:7.1f} ms")
+    print(f"database written during the runs: {'yes' if os.stat(path).st_mtime_ns != modified else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# lib/benchmarks/suite.py
+"""Time each model's create/find/get_all/update/delete and relation loading at several dataset sizes.
+
+The measurements are driven by pytest (tests/test_benchmark_suite.py), one
+test per size and model; every size is loaded into a fresh database with
+dataset.load and the results are written as JSON so runs can be compared.
+The tests are marked benchmark and left out of normal runs. From the
+repository root (give file options with '=', or pytest takes the file for a test path):
+    python -m pytest -m benchmark --bench-output=bench.json    # 1k, 100k and 1M rows
+    python -m pytest -m benchmark --bench-sizes 1000 100000    # a quicker run
+    python -m pytest -m benchmark --bench-baseline=bench.json    # fails on a regression
+"""
+import platform
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from models.__init__ import DB
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+
+TABLES = {Patient: "patients", Doctor: "doctors", Appointment: "appointments", MedicalRecord: "medical_records"}
+
+
+def timed(operations, func, *args):
+    """Run func(*args) once and return a result entry for the given operation count"""
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    return {"operations": operations, "seconds": round(seconds, 6), "us_per_op": round(seconds / operations * 1e6, 2)}
+
+
+def new_rows(model, count):
+    """Return count constructor rows for model that can be inserted into any generated dataset"""
+    if model is Patient:
+        return [(f"Bench{i}", "Patient", 40, "Other") for i in range(count)]
+    if model is Doctor:
+        return [(f"Dr. Bench {i}", "Cardiology") for i in range(count)]
+    if model is Appointment:
+        # Generated calendars start in 2024; these are booked years later
+        return [(f"{datetime(2040, 1, 1) + timedelta(minutes=30 * i):%Y-%m-%d %H:%M}", 1, 1, None) for i in range(count)]
+    return [(1, 1, "2024-06-01", "Checkup", "None required") for _ in range(count)]
+
+
+def mutate(instance):
+    if isinstance(instance, Patient):
+        instance.age = instance.age % 99 + 1
+    elif isinstance(instance, Doctor):
+        instance.specialization = "Neurology"
+    elif isinstance(instance, Appointment):
+        instance.notes = "Rescheduled"
+    else:
+        instance.treatment = "Updated treatment"
+
+
+def bench_model(model, counts, rng, reads=1000, writes=200, page_size=500, get_all_limit=100000):
+    """Time the model's operations against the loaded dataset and return {operation: result entry}.
+
+    reads is the number of find_by_id calls, writes the number of create,
+    update and delete calls, and page_size the owners per load_relations
+    call; get_all is skipped on tables larger than get_all_limit.
+    """
+    results = {}
+    table_size = counts[TABLES[model]]
+    created = []
+    results["create"] = timed(
+        writes, lambda: created.extend(model.create(*row) for row in new_rows(model, writes))
+    )
+    ids = [rng.randint(1, table_size) for _ in range(reads)]
+    results["find_by_id"] = timed(reads, lambda: [model.find_by_id(id) for id in ids])
+    if table_size <= get_all_limit:
+        results["get_all"] = timed(1, model.get_all)
+    sample = [model.find_by_id(id) for id in rng.sample(range(1, table_size + 1), min(writes, table_size))]
+    for instance in sample:
+        mutate(instance)
+    results["update"] = timed(len(sample), lambda: [instance.update() for instance in sample])
+    if hasattr(model, "load_relations"):
+        owners = model.page(rng.randint(0, max(table_size - page_size, 0)), page_size)
+        results["load_relations"] = timed(len(owners), model.load_relations, owners)
+    results["delete"] = timed(len(created), lambda: [instance.delete() for instance in created])
+    return results
+
+
+def new_report(seed):
+    """Return an empty report; the runs are appended as {"size", "counts", "results"} entries"""
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "profile": DB.profile,
+        "seed": seed,
+        "runs": [],
+    }
+
+
+def regressions(report, baseline, tolerance):
+    """Yield (size, model, operation, before, after) for operations slower than the baseline by more than tolerance"""
+    before = {
+        (run["size"], model, operation): entry["us_per_op"]
+        for run in baseline["runs"] for model, operations in run["results"].items() for operation, entry in operations.items()
+    }
+    for run in report["runs"]:
+        for model, operations in run["results"].items():
+            for operation, entry in operations.items():
+                old = before.get((run["size"], model, operation))
+                if old and entry["us_per_op"] > old * (1 + tolerance):
+                    yield run["size"], model, operation, old, entry["us_per_op"]
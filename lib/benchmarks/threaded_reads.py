@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# lib/benchmarks/threaded_reads.py
+"""Measure read throughput of the models with an increasing number of threads.
+
+Every thread reads through its own connection, so SQLite never serializes
+the lookups; but sqlite3 only releases the GIL while SQLite itself runs.
+The share of a lookup spent there, measured single-threaded, bounds the
+speedup any number of cores can give (Amdahl's law), and is printed with
+the measured one. Speedups above x1 need as many cores as threads.
+
+Run from lib/:  python -m benchmarks.threaded_reads --patients 20000 --lookups 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Never benchmark against the application database
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from models.__init__ import DB
+from models.patient import Patient
+
+
+def populate(count):
+    Patient.drop_table()
+    Patient.create_table()
+    rows = [(f"First{i}", f"Last{i}", 20 + i % 60, "Female") for i in range(count)]
+    DB.executemany("INSERT INTO patients (first_name, last_name, age, gender) VALUES (?, ?, ?, ?)", rows)
+    DB.commit()
+
+
+def run(threads, names):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        found = sum(1 for patient in pool.map(lambda name: Patient.find_by_name(*name), names) if patient)
+    elapsed = time.perf_counter() - start
+    assert found == len(names)
+    return elapsed
+
+
+def sqlite_share(names):
+    """Return the fraction of a Patient.find_by_name call spent inside SQLite, with the GIL released.
+
+    That is the time of the bare statement less the time of a trivial one,
+    which costs the same binding and cursor overhead in Python.
+    """
+    conn = DB.connection
+    sql = "SELECT * FROM patients WHERE first_name = ? AND last_name = ?"
+    timings = {}
+    for label, lookup in (("model", lambda name: Patient.find_by_name(*name)),
+                          ("statement", lambda name: conn.execute(sql, name).fetchone()),
+                          ("trivial", lambda name: conn.execute("SELECT ? AND ?", name).fetchone())):
+        start = time.perf_counter()
+        for name in names:
+            lookup(name)
+        timings[label] = time.perf_counter() - start
+    return max(timings["statement"] - timings["trivial"], 0) / timings["model"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"Database: {DB.path}")
+    populate(args.patients)
+    rng = random.Random(0)
+    names = [(f"First{i}", f"Last{i}") for i in (rng.randrange(args.patients) for _ in range(args.lookups))]
+
+    share = sqlite_share(names)
+    print(f"{os.cpu_count()} CPUs; {share:.0%} of a lookup runs in SQLite with the GIL released")
+
+    baseline = None
+    for threads in args.threads:
+        elapsed = run(threads, names)
+        baseline = baseline or elapsed
+        bound = 1 / (1 - share + share / threads)
+        print(f"{threads:>3} threads: {args.lookups / elapsed:10.0f} lookups/s  speedup x{baseline / elapsed:.2f}"
+              f"  (at most x{bound:.2f} with {threads} cores)")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# lib/benchmarks/timeline.py
+"""Compare Patient.timeline pages with loading and sorting a patient's full history.
+
+Run from lib/:  python -m benchmarks.timeline --events 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+import dataset
+from models.__init__ import DB
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+
+
+def timed(function, runs=5):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def add_history(patient_id, events):
+    """Give a patient events appointments and records, half of each, one a day before the generated data"""
+    days = [dataset.FIRST_DAY - timedelta(days=day + 1) for day in range(events // 2)]
+    Appointment.create_many([(f"{day} 09:00", patient_id, 1, "Follow-up") for day in days])
+    MedicalRecord.create_many([(patient_id, 1, f"{day}", "Check-up", "No change") for day in days])
+
+
+def sorted_history(patient_id):
+    """The full history as before the timeline: load the patient's lists and sort them"""
+    patient = Patient.find_by_id(patient_id)
+    patient.appointments = patient.medical_records = None
+    events = [(a.appointment_date, a) for a in patient.appointments]
+    events += [(r.record_date, r) for r in patient.medical_records]
+    return sorted(events, key=lambda event: event[0], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="appointments and records of the long history")
+    parser.add_argument("--appointments", type=int, default=200000, help="appointments of the other patients")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    dataset.load(patients=max(args.appointments // 10, 1), doctors=max(args.appointments // 2000, 1),
+                 appointments=args.appointments, medical_records=args.appointments // 2)
+    add_history(1, args.events)
+
+    history, full = timed(lambda: sorted_history(1))
+    page, first = timed(lambda: Patient.timeline(1, limit=args.limit))
+    middle = Patient.timeline(1, limit=len(history) // 2)[-1]
+    _, later = timed(lambda: Patient.timeline(1, middle, args.limit))
+    assert [event.date for event in page] == [date for date, _ in history[:args.limit]]
+
+    for label, seconds in ((f"load and sort all {len(history)} events", full),
+                           (f"timeline, first {args.limit}", first),
+                           (f"timeline, {args.limit} from the middle", later)):
+        print(f"{label:<36} {seconds * 1000:8.2f} ms")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# lib/benchmarks/workload.py
+"""Compare workload reports read from the summary tables with counting over Doctor.get_all().
+
+Run from lib/:  python -m benchmarks.workload --appointments 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("HOSPITAL_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("HOSPITAL_DB_PROFILE", "fast")
+
+import dataset
+from models.__init__ import DB
+from models.doctor import Doctor
+from models import workload
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def counted_from_objects():
+    return {
+        doctor.id: (len(doctor.appointments), len(doctor.medical_records))
+        for doctor in Doctor.get_all()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts, load = timed(lambda: dataset.load(
+        patients=max(args.appointments // 10, 1), doctors=max(args.appointments // 2000, 1),
+        appointments=args.appointments, medical_records=args.appointments // 2, seed=args.seed
+    ))
+    print(f"loaded {counts} in {load:.1f} s (summary tables maintained by triggers)")
+
+    report, by_doctor = timed(workload.by_doctor)
+    _, by_specialization = timed(workload.by_specialization)
+    _, one_month = timed(lambda: workload.by_doctor("2024-03-01", "2024-04-01"))
+    _, doctor_days = timed(lambda: workload.by_day(doctor_id=1))
+    mismatches, check = timed(workload.check)
+    assert not mismatches
+
+    expected, objects = timed(counted_from_objects)
+    assert {row.key: (row.appointments, row.medical_records) for row in report} == {
+        doctor_id: pair for doctor_id, pair in expected.items() if any(pair)
+    }
+
+    print(f"by_doctor (all time):          {by_doctor * 1000:9.1f} ms")
+    print(f"by_doctor (one month):         {one_month * 1000:9.1f} ms")
+    print(f"by_specialization (all time):  {by_specialization * 1000:9.1f} ms")
+    print(f"by_day for one doctor:         {doctor_days * 1000:9.1f} ms")
+    print(f"check against source tables:   {check * 1000:9.1f} ms")
+    print(f"Doctor.get_all() and count:    {objects * 1000:9.1f} ms ({objects / by_doctor:.0f}x by_doctor)")
+    DB.close_all()
+
+
+if __name__ == "__main__":
+    main()
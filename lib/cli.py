@@ -1,9 +1,8 @@
 # lib/cli.py
+import os
 import sys
-from models.patient import manage_patients
-from models.doctor import manage_doctors
-from models.appointment import manage_appointments
-from models.medical_record import manage_medical_records
+from contextlib import nullcontext
+from models.__init__ import initialize_database, track_queries
 
 from helpers import (
     exit_program,
@@ -12,23 +11,37 @@ from helpers import (
 
 
 def main():
+    initialize_database()
     while True:
         menu()
         choice = input("Enter your choice: ")
-        if choice == "0":
-            exit_program()
-        elif choice == "1":
-            manage_patients()
-        elif choice == "2":
-            manage_doctors()
-        elif choice == "3":
-            manage_appointments()
-        elif choice == "4":
-            manage_medical_records()
-        elif choice == "5":
-            exit_program()
-        else:
-            print("Invalid choice. Please try again.")
+        # HOSPITAL_QUERY_STATS=1 prints the statements each menu ran on leaving it
+        with (track_queries(f"menu {choice}") if os.environ.get("HOSPITAL_QUERY_STATS") else nullcontext()) as report:
+            run_choice(choice)
+        if report:
+            print(report.summary())
+
+
+def run_choice(choice):
+    if choice == "0":
+        exit_program()
+    # Each menu's models are imported on first use, to keep startup fast
+    elif choice == "1":
+        from models.patient import manage_patients
+        manage_patients()
+    elif choice == "2":
+        from models.doctor import manage_doctors
+        manage_doctors()
+    elif choice == "3":
+        from models.appointment import manage_appointments
+        manage_appointments()
+    elif choice == "4":
+        from models.medical_record import manage_medical_records
+        manage_medical_records()
+    elif choice == "5":
+        exit_program()
+    else:
+        print("Invalid choice. Please try again.")
 
 
 
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# lib/dataset.py
+"""Load a reproducible synthetic dataset of patients, doctors, appointments and medical records.
+
+The same seed and sizes always produce the same rows. Run from lib/:
+    HOSPITAL_DB=/tmp/big.db python dataset.py --patients 100000 --seed 1
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from faker import Faker
+
+from models.__init__ import DB, initialize_database
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+
+SPECIALIZATIONS = ["Cardiology", "Dermatology", "Neurology", "Oncology", "Paediatrics", "Psychiatry",
+                   "Radiology", "Surgery", "Gynaecology", "General Practice", "Orthopaedics", "Urology"]
+DIAGNOSES = ["Hypertension", "Type 2 diabetes", "Asthma", "Migraine", "Acute bronchitis", "Influenza",
+             "Lower back pain", "Gastritis", "Anaemia", "Urinary tract infection", "Dermatitis",
+             "Sprained ankle", "Depression", "Anxiety disorder", "Otitis media", "Malaria", "Typhoid fever"]
+TREATMENTS = ["Rest and fluids", "Paracetamol as needed", "Inhaled corticosteroids", "Metformin",
+              "ACE inhibitors", "Course of antibiotics", "Physiotherapy", "Iron supplements",
+              "Antihistamines", "Cognitive behavioural therapy", "Topical steroid cream", "Follow-up in two weeks"]
+GENDERS = ["Male", "Female", "Other"]
+FIRST_DAY = date(2024, 1, 1)
+# Appointments are booked in 30 minute slots from 08:00 to 18:00
+SLOTS_PER_DAY = 20
+
+
+class Generator:
+    """Produce synthetic rows from a seed; names and notes come from Faker, the rest from random.Random"""
+
+    def __init__(self, seed=0, name_pool=5000):
+        self.rng = random.Random(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+        # Sampling from fixed pools is much faster than calling Faker per row
+        self.first_names = [fake.first_name() for _ in range(name_pool)]
+        self.last_names = [fake.last_name() for _ in range(name_pool)]
+        self.sentences = [fake.sentence(nb_words=8) for _ in range(name_pool)]
+
+    def patient(self):
+        return (self.rng.choice(self.first_names), self.rng.choice(self.last_names),
+                self.rng.randint(1, 99), self.rng.choice(GENDERS))
+
+    def doctor(self):
+        return (f"Dr. {self.rng.choice(self.first_names)} {self.rng.choice(self.last_names)}",
+                self.rng.choice(SPECIALIZATIONS))
+
+    def medical_record(self, patients, doctors):
+        return (self.rng.randint(1, patients), self.rng.randint(1, doctors),
+                f"{FIRST_DAY + timedelta(days=self.rng.randrange(730)):%Y-%m-%d}",
+                self.rng.choice(DIAGNOSES), f"{self.rng.choice(TREATMENTS)}. {self.rng.choice(self.sentences)}")
+
+    def appointments(self, count, patients, doctors):
+        """Yield appointment rows that never double-book a doctor: each doctor fills its calendar in order, with random gaps"""
+        next_slot = [0] * doctors
+        for _ in range(count):
+            doctor = self.rng.randrange(doctors)
+            slot = next_slot[doctor] + self.rng.randint(0, 2)
+            next_slot[doctor] = slot + 1
+            start = datetime.combine(FIRST_DAY + timedelta(days=slot // SLOTS_PER_DAY), datetime.min.time())
+            start += timedelta(hours=8, minutes=30 * (slot % SLOTS_PER_DAY))
+            notes = self.rng.choice(self.sentences) if self.rng.random() < 0.5 else None
+            yield (f"{start:%Y-%m-%d %H:%M}", self.rng.randint(1, patients), doctor + 1, notes, 30)
+
+
+def batched(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load(patients=1000, doctors=None, appointments=None, medical_records=None, seed=0, batch_size=20000):
+    """Replace the four tables with a synthetic dataset and return the row counts loaded.
+
+    doctors defaults to one per 100 patients (at least 10), appointments and
+    medical_records to one per patient. Rows go through each model's
+    create_many in batches of batch_size.
+    """
+    doctors = doctors or max(patients // 100, 10)
+    appointments = patients if appointments is None else appointments
+    medical_records = patients if medical_records is None else medical_records
+    generator = Generator(seed)
+    initialize_database()
+    for model in (Patient, Doctor, Appointment, MedicalRecord):
+        model.drop_table()
+        model.create_table()
+        model.all.clear()
+    loads = [
+        (Patient, (generator.patient() for _ in range(patients))),
+        (Doctor, (generator.doctor() for _ in range(doctors))),
+        (Appointment, generator.appointments(appointments, patients, doctors)),
+        (MedicalRecord, (generator.medical_record(patients, doctors) for _ in range(medical_records))),
+    ]
+    for model, rows in loads:
+        for batch in batched(rows, batch_size):
+            model.create_many(batch)
+    return {"patients": patients, "doctors": doctors, "appointments": appointments, "medical_records": medical_records}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--doctors", type=int, help="default: patients / 100, at least 10")
+    parser.add_argument("--appointments", type=int, help="default: one per patient")
+    parser.add_argument("--medical-records", type=int, help="default: one per patient")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = load(args.patients, args.doctors, args.appointments, args.medical_records, args.seed)
+    print(f"Loaded {', '.join(f'{count} {table}' for table, count in counts.items())} "
+          f"into {DB.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
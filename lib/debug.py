@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 # lib/debug.py
 
-from models.__init__ import CONN, CURSOR
 import ipdb
 
 
@@ -1,10 +1,30 @@
 # lib/helpers.py
-from models.patient import Patient
 
 def helper_1():
     print("Performing useful function#1.")
 
 
+def page_through(fetch_page, show, page_size=20, after=0, cursor=lambda item: item.id):
+    """Print results one page at a time and return how many were shown.
+
+    fetch_page(after, limit) must return the items following after, where
+    after starts at the given value and is then cursor(last item shown), so
+    only one page is held in memory however large the table is. By default
+    items are instances in id order.
+    """
+    shown = 0
+    while True:
+        items = fetch_page(after, page_size)
+        for item in items:
+            show(item)
+        shown += len(items)
+        if len(items) < page_size:
+            return shown
+        after = cursor(items[-1])
+        if input("Press Enter for more, or q to stop: ").strip().lower() == "q":
+            return shown
+
+
 def exit_program():
     print("Goodbye!")
     exit()
\ No newline at end of file
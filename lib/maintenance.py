@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# lib/maintenance.py
+"""Database maintenance commands. Run from lib/:  python maintenance.py <command>"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from models.medical_record import MedicalRecord
+from models.name_search import PATIENT_NAMES, DOCTOR_NAMES
+from models.__init__ import initialize_database
+from models import backup, export, importer, workload
+
+
+def rebuild_search(args):
+    MedicalRecord.rebuild_search_index()
+    print("Rebuilt the medical record search index.")
+
+
+def rebuild_names(args):
+    PATIENT_NAMES.rebuild()
+    DOCTOR_NAMES.rebuild()
+    print("Rebuilt the patient and doctor name indexes.")
+
+
+def check_workload(args):
+    mismatches = workload.check()
+    for summary, doctor_id, day in mismatches[:args.show]:
+        print(f"{summary}: doctor {doctor_id} on {day} differs from its source rows")
+    if mismatches:
+        print(f"{len(mismatches)} workload summary rows are out of date; run rebuild-workload.")
+        sys.exit(1)
+    print("The workload summary tables match the appointments and medical records.")
+
+
+def rebuild_workload(args):
+    workload.rebuild()
+    print("Rebuilt the workload summary tables.")
+
+
+def export_tables(args):
+    start = time.perf_counter()
+    if args.after_id is not None:
+        if len(args.tables) != 1:
+            sys.exit("--after-id needs exactly one --table")
+        table = args.tables[0]
+        path = os.path.join(args.directory, f"{table}.{args.format}{'.gz' if args.gzip else ''}")
+        os.makedirs(args.directory, exist_ok=True)
+        results = {table: export.export_table(table, path, args.format, args.after_id, args.chunk_size)}
+    else:
+        results = export.export_tables(
+            args.directory, args.tables, args.format, args.gzip, args.watermark, args.chunk_size
+        )
+    elapsed = time.perf_counter() - start
+    for table, (rows, last_id) in results.items():
+        print(f"{table}: {rows} rows, up to id {last_id}")
+    total = sum(rows for rows, last_id in results.values())
+    print(f"Exported {total} rows in {elapsed:.1f} s ({total / elapsed:.0f} rows/s).")
+
+
+def import_rows(args):
+    result = importer.import_file(args.table, args.file, args.errors, args.workers, args.batch_size)
+    print(f"Imported {result.imported} of {result.rows} rows into {args.table} in {result.seconds:.1f} s "
+          f"({result.rows / result.seconds:.0f} rows/s).")
+    if result.rejected:
+        where = f"; see {args.errors}" if args.errors else ""
+        print(f"Rejected {result.rejected} rows{where}.")
+
+
+def report_copy(verb, result):
+    rate = result.pages / result.seconds if result.seconds else 0
+    restarts = f", restarted {result.restarts} times by concurrent writes" if result.restarts else ""
+    print(f"{verb} {result.pages} pages in {result.seconds:.2f} s ({rate:.0f} pages/s{restarts}): {result.path}")
+
+
+def backup_database(args):
+    report_copy("Backed up", backup.backup(args.path, args.pages))
+
+
+def snapshot_database(args):
+    while True:
+        report_copy("Snapshot of", backup.snapshot(args.directory, args.keep, args.pages))
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+
+def restore_database(args):
+    path = args.source
+    if os.path.isdir(path):
+        at = datetime.fromisoformat(args.at) if args.at else None
+        try:
+            path = backup.find_snapshot(path, at)
+        except ValueError as error:
+            sys.exit(str(error))
+    report_copy(f"Restored {path}:", backup.restore(path, args.pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "rebuild-search", help="re-index medical record diagnosis and treatment text"
+    ).set_defaults(func=rebuild_search)
+    subparsers.add_parser(
+        "rebuild-names", help="re-index patient and doctor names for name search"
+    ).set_defaults(func=rebuild_names)
+    check = subparsers.add_parser(
+        "check-workload", help="compare the workload summary tables with the rows they summarize"
+    )
+    check.add_argument("--show", type=int, default=20, help="number of differing rows to list")
+    check.set_defaults(func=check_workload)
+    subparsers.add_parser(
+        "rebuild-workload", help="recompute the per-doctor, per-day workload summary tables"
+    ).set_defaults(func=rebuild_workload)
+    exporter = subparsers.add_parser(
+        "export", help="stream tables to CSV or JSONL files, optionally gzipped and incremental"
+    )
+    exporter.add_argument("directory", help="directory for the <table>.<format>[.gz] files")
+    exporter.add_argument("--table", dest="tables", action="append", choices=export.TABLES,
+                          help="table to export; repeat for several (default: all)")
+    exporter.add_argument("--format", choices=export.FORMATS, default="csv")
+    exporter.add_argument("--gzip", action="store_true", help="gzip the files")
+    exporter.add_argument("--watermark", help="JSON file of the last exported id per table; "
+                                              "only newer rows are exported, and the file is updated")
+    exporter.add_argument("--after-id", type=int, help="export the rows of a single --table with a greater id")
+    exporter.add_argument("--chunk-size", type=int, default=10000)
+    exporter.set_defaults(func=export_tables, tables=None)
+    loader = subparsers.add_parser(
+        "import", help="validate and bulk insert the rows of a CSV or JSONL file, optionally gzipped"
+    )
+    loader.add_argument("table", choices=importer.MODELS)
+    loader.add_argument("file")
+    loader.add_argument("--errors", help="write rejected rows, with the reason, to this JSONL file")
+    loader.add_argument("--workers", type=int, help="validation processes (default: one per CPU; 0 validates inline)")
+    loader.add_argument("--batch-size", type=int, default=5000, help="rows per validation chunk and transaction")
+    loader.set_defaults(func=import_rows)
+    backer = subparsers.add_parser("backup", help="copy the database to a file while it stays in use")
+    backer.add_argument("path")
+    backer.add_argument("--pages", type=int, help="pages copied per step (default: all at once under WAL, "
+                                                  f"{backup.STEP_PAGES} otherwise)")
+    backer.set_defaults(func=backup_database)
+    snapshotter = subparsers.add_parser(
+        "snapshot", help="back up to a timestamped file in a directory, keeping the newest --keep"
+    )
+    snapshotter.add_argument("directory")
+    snapshotter.add_argument("--keep", type=int, help="number of snapshots to keep (default: all)")
+    snapshotter.add_argument("--every", type=float, help="keep running, taking a snapshot every this many seconds")
+    snapshotter.add_argument("--pages", type=int, help="pages copied per step (see backup)")
+    snapshotter.set_defaults(func=snapshot_database)
+    restorer = subparsers.add_parser(
+        "restore", help="replace the database with a backup file, or the latest snapshot in a directory"
+    )
+    restorer.add_argument("source", help="backup file, or snapshot directory")
+    restorer.add_argument("--at", help="with a directory: the newest snapshot taken at or before this "
+                                       "time (YYYY-MM-DD HH:MM[:SS])")
+    restorer.add_argument("--pages", type=int, default=backup.STEP_PAGES, help="pages copied per step")
+    restorer.set_defaults(func=restore_database)
+
+    args = parser.parse_args()
+    initialize_database()
+    if args.command == "export" and not args.tables:
+        args.tables = list(export.TABLES)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
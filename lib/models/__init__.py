@@ -1,9 +1,248 @@
-import sqlite3
+import warnings
 
-CONN = sqlite3.connect('hospital.db')
-CURSOR = CONN.cursor()
+from models.connection import DB
+# with track_queries("name") as report: ... records the statements run in the block
+from models.instrumentation import track_queries
 
-def initialize_database():
+# with session(): ... groups the writes of all models into one transaction
+session = DB.session
+
+# Keep IN (...) lists below SQLite's default bound-parameter limit
+SQL_VARIABLE_LIMIT = 900
+
+def day_sql(column):
+    """SQL for the zero-padded YYYY-MM-DD day of a date column, also for legacy values like '2024-7-1 08:30'"""
+    return (
+        f"printf('%s-%02d-%02d', substr({column}, 1, 4), substr({column}, 6), "
+        f"substr({column}, instr(substr({column}, 6), '-') + 6))"
+    )
+
+# Queries that compute each workload summary table from its source table, in the summary's column order
+WORKLOAD_QUERIES = {
+    "appointment_workload": f"""
+        SELECT doctor_id, {day_sql("appointment_date")} AS day, COUNT(*), SUM(duration)
+        FROM appointments GROUP BY doctor_id, day
+    """,
+    "medical_record_workload": f"""
+        SELECT doctor_id, {day_sql("record_date")} AS day, COUNT(*)
+        FROM medical_records GROUP BY doctor_id, day
+    """,
+}
+
+# Secondary indexes backing the find_by_* lookups, per table
+INDEXES = {
+    "patients": [
+        "CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (last_name, first_name)",
+        # Name words and trigrams for models.name_search, written by the Patient model
+        """
+            CREATE TABLE IF NOT EXISTS patient_name_keys (
+                key TEXT NOT NULL, patient_id INTEGER NOT NULL, PRIMARY KEY (key, patient_id)
+            ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_patient_name_keys_patient_id ON patient_name_keys (patient_id)",
+        """
+            CREATE TABLE IF NOT EXISTS patient_name_trigrams (
+                trigram TEXT NOT NULL, patient_id INTEGER NOT NULL, PRIMARY KEY (trigram, patient_id)
+            ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_patient_name_trigrams_patient_id ON patient_name_trigrams (patient_id)",
+    ],
+    "doctors": [
+        "CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors (name)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_specialization ON doctors (specialization)",
+        """
+            CREATE TABLE IF NOT EXISTS doctor_name_keys (
+                key TEXT NOT NULL, doctor_id INTEGER NOT NULL, PRIMARY KEY (key, doctor_id)
+            ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_doctor_name_keys_doctor_id ON doctor_name_keys (doctor_id)",
+        """
+            CREATE TABLE IF NOT EXISTS doctor_name_trigrams (
+                trigram TEXT NOT NULL, doctor_id INTEGER NOT NULL, PRIMARY KEY (trigram, doctor_id)
+            ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_doctor_name_trigrams_doctor_id ON doctor_name_trigrams (doctor_id)",
+    ],
+    "appointments": [
+        # (patient_id, appointment_date) also serves patient_id lookups, and
+        # reads a patient's appointments in date order for Patient.timeline
+        "DROP INDEX IF EXISTS idx_appointments_patient_id",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_patient_date ON appointments (patient_id, appointment_date)",
+        # (doctor_id, appointment_date) also serves doctor_id lookups, and
+        # per-doctor date ranges for the availability cache
+        "DROP INDEX IF EXISTS idx_appointments_doctor_id",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON appointments (doctor_id, appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date)",
+        # Appointments and booked minutes per doctor per day for models.workload, kept current by triggers
+        """
+            CREATE TABLE IF NOT EXISTS appointment_workload (
+                doctor_id INTEGER NOT NULL, day TEXT NOT NULL,
+                appointments INTEGER NOT NULL, booked_minutes INTEGER NOT NULL,
+                PRIMARY KEY (doctor_id, day)
+            ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_appointment_workload_day ON appointment_workload (day)",
+        f"""
+            CREATE TRIGGER IF NOT EXISTS appointment_workload_insert AFTER INSERT ON appointments BEGIN
+                INSERT INTO appointment_workload (doctor_id, day, appointments, booked_minutes)
+                VALUES (new.doctor_id, {day_sql("new.appointment_date")}, 1, new.duration)
+                ON CONFLICT (doctor_id, day) DO UPDATE SET
+                    appointments = appointments + 1, booked_minutes = booked_minutes + excluded.booked_minutes;
+            END
+        """,
+        f"""
+            CREATE TRIGGER IF NOT EXISTS appointment_workload_delete AFTER DELETE ON appointments BEGIN
+                UPDATE appointment_workload SET appointments = appointments - 1, booked_minutes = booked_minutes - old.duration
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.appointment_date")};
+                DELETE FROM appointment_workload
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.appointment_date")} AND appointments = 0;
+            END
+        """,
+        f"""
+            CREATE TRIGGER IF NOT EXISTS appointment_workload_update
+            AFTER UPDATE OF appointment_date, doctor_id, duration ON appointments BEGIN
+                UPDATE appointment_workload SET appointments = appointments - 1, booked_minutes = booked_minutes - old.duration
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.appointment_date")};
+                DELETE FROM appointment_workload
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.appointment_date")} AND appointments = 0;
+                INSERT INTO appointment_workload (doctor_id, day, appointments, booked_minutes)
+                VALUES (new.doctor_id, {day_sql("new.appointment_date")}, 1, new.duration)
+                ON CONFLICT (doctor_id, day) DO UPDATE SET
+                    appointments = appointments + 1, booked_minutes = booked_minutes + excluded.booked_minutes;
+            END
+        """,
+    ],
+    "medical_records": [
+        # (patient_id, record_date) also serves patient_id lookups, and reads a
+        # patient's records in date order for Patient.timeline
+        "DROP INDEX IF EXISTS idx_medical_records_patient_id",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_patient_date ON medical_records (patient_id, record_date)",
+        # (doctor_id, record_date) also serves doctor_id lookups, and per-doctor
+        # date ranges for MedicalRecord.find_between
+        "DROP INDEX IF EXISTS idx_medical_records_doctor_id",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_doctor_date ON medical_records (doctor_id, record_date)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_date ON medical_records (record_date)",
+        # Full-text index over diagnosis and treatment, kept in sync by triggers
+        """
+            CREATE VIRTUAL TABLE IF NOT EXISTS medical_records_fts USING fts5(
+                diagnosis, treatment, content='medical_records', content_rowid='id', tokenize='porter unicode61'
+            )
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS medical_records_fts_insert AFTER INSERT ON medical_records BEGIN
+                INSERT INTO medical_records_fts (rowid, diagnosis, treatment)
+                VALUES (new.id, new.diagnosis, new.treatment);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS medical_records_fts_delete AFTER DELETE ON medical_records BEGIN
+                INSERT INTO medical_records_fts (medical_records_fts, rowid, diagnosis, treatment)
+                VALUES ('delete', old.id, old.diagnosis, old.treatment);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS medical_records_fts_update AFTER UPDATE ON medical_records BEGIN
+                INSERT INTO medical_records_fts (medical_records_fts, rowid, diagnosis, treatment)
+                VALUES ('delete', old.id, old.diagnosis, old.treatment);
+                INSERT INTO medical_records_fts (rowid, diagnosis, treatment)
+                VALUES (new.id, new.diagnosis, new.treatment);
+            END
+        """,
+        # Medical records per doctor per day for models.workload, kept current by triggers
+        """
+            CREATE TABLE IF NOT EXISTS medical_record_workload (
+                doctor_id INTEGER NOT NULL, day TEXT NOT NULL, medical_records INTEGER NOT NULL,
+                PRIMARY KEY (doctor_id, day)
+            ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_medical_record_workload_day ON medical_record_workload (day)",
+        f"""
+            CREATE TRIGGER IF NOT EXISTS medical_record_workload_insert AFTER INSERT ON medical_records BEGIN
+                INSERT INTO medical_record_workload (doctor_id, day, medical_records)
+                VALUES (new.doctor_id, {day_sql("new.record_date")}, 1)
+                ON CONFLICT (doctor_id, day) DO UPDATE SET medical_records = medical_records + 1;
+            END
+        """,
+        f"""
+            CREATE TRIGGER IF NOT EXISTS medical_record_workload_delete AFTER DELETE ON medical_records BEGIN
+                UPDATE medical_record_workload SET medical_records = medical_records - 1
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.record_date")};
+                DELETE FROM medical_record_workload
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.record_date")} AND medical_records = 0;
+            END
+        """,
+        f"""
+            CREATE TRIGGER IF NOT EXISTS medical_record_workload_update
+            AFTER UPDATE OF record_date, doctor_id ON medical_records BEGIN
+                UPDATE medical_record_workload SET medical_records = medical_records - 1
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.record_date")};
+                DELETE FROM medical_record_workload
+                WHERE doctor_id = old.doctor_id AND day = {day_sql("old.record_date")} AND medical_records = 0;
+                INSERT INTO medical_record_workload (doctor_id, day, medical_records)
+                VALUES (new.doctor_id, {day_sql("new.record_date")}, 1)
+                ON CONFLICT (doctor_id, day) DO UPDATE SET medical_records = medical_records + 1;
+            END
+        """,
+    ],
+}
+
+# Date columns, with a GLOB pattern matching their canonical stored form
+DATE_COLUMNS = {
+    "appointments": ("appointment_date", "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]"),
+    "medical_records": ("record_date", "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"),
+}
+
+# Columns added after the first release, per table, with their definitions
+ADDED_COLUMNS = {
+    "appointments": {
+        "duration": "INTEGER NOT NULL DEFAULT 30",
+    },
+}
+
+def add_missing_columns(table):
+    """Add columns introduced after the table was created; existing databases are upgraded in place"""
+    existing = {row[1] for row in DB.execute(f"PRAGMA table_info({table})")}
+    for column, definition in ADDED_COLUMNS.get(table, {}).items():
+        if column not in existing:
+            DB.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+# External-content full-text indexes, per table; they start out empty, so they are filled when created
+SEARCH_INDEXES = {"medical_records": "medical_records_fts"}
+
+def create_indexes(table):
+    """Create the secondary indexes of a table; existing databases are upgraded in place"""
+    search_index = SEARCH_INDEXES.get(table)
+    search_index_missing = search_index and not DB.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (search_index,)
+    ).fetchone()
+    for sql in INDEXES[table]:
+        DB.execute(sql)
+    if search_index_missing:
+        # Index the rows written before the search index existed
+        DB.execute(f"INSERT INTO {search_index} ({search_index}) VALUES ('rebuild')")
+
+# Bump whenever the DDL below changes, so that existing databases are upgraded
+SCHEMA_VERSION = 3
+
+def schema_version():
+    """Return the schema version stored in the database's PRAGMA user_version; 0 for new or older databases"""
+    return DB.execute("PRAGMA user_version").fetchone()[0]
+
+def initialize_database(force=False):
+    """Create the tables, indexes and triggers, or upgrade an older database in place; return True if any DDL ran.
+
+    Call it once at startup: when the stored schema version is current it only
+    reads PRAGMA user_version, so nothing is written. Importing the models
+    never touches the database.
+    """
+    if not force and schema_version() >= SCHEMA_VERSION:
+        return False
+    with DB.session():
+        create_schema()
+        DB.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return True
+
+def create_schema():
     create_doctors_table_sql = """
         CREATE TABLE IF NOT EXISTS doctors (
             id INTEGER PRIMARY KEY,
@@ -11,51 +250,87 @@ def initialize_database():
             specialization TEXT NOT NULL
         )
     """
-    CURSOR.execute(create_doctors_table_sql)
-
-create_appointments_table_sql = """
-    CREATE TABLE IF NOT EXISTS appointments (
-        id INTEGER PRIMARY KEY,
-        appointment_date TEXT NOT NULL,
-        patient_id INTEGER NOT NULL,
-        doctor_id INTEGER NOT NULL,
-        notes TEXT,
-        FOREIGN KEY(patient_id) REFERENCES patients(id),
-        FOREIGN KEY(doctor_id) REFERENCES doctors(id)
-    )
-"""
-
-CURSOR.execute(create_appointments_table_sql)
-
-create_medical_records_table_sql = """
-    CREATE TABLE IF NOT EXISTS medical_records (
-        id INTEGER PRIMARY KEY,
-        patient_id INTEGER NOT NULL,
-        doctor_id INTEGER NOT NULL,
-        record_date TEXT NOT NULL,
-        diagnosis TEXT NOT NULL,
-        treatment TEXT NOT NULL,
-        FOREIGN KEY(patient_id) REFERENCES patients(id),
-        FOREIGN KEY(doctor_id) REFERENCES doctors(id)
-    )
-"""
-
-CURSOR.execute(create_medical_records_table_sql)
+    DB.execute(create_doctors_table_sql)
 
-create_patients_table_sql = """
-    CREATE TABLE IF NOT EXISTS patients (
-        id INTEGER PRIMARY KEY,
-        first_name TEXT NOT NULL,
-        last_name TEXT NOT NULL,
-        age INTEGER NOT NULL,
-        gender TEXT NOT NULL
-    )
-"""
+    create_appointments_table_sql = """
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY,
+            appointment_date TEXT NOT NULL,
+            patient_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            notes TEXT,
+            duration INTEGER NOT NULL DEFAULT 30,
+            FOREIGN KEY(patient_id) REFERENCES patients(id),
+            FOREIGN KEY(doctor_id) REFERENCES doctors(id)
+        )
+    """
+    DB.execute(create_appointments_table_sql)
 
-CURSOR.execute(create_patients_table_sql)
+    create_medical_records_table_sql = """
+        CREATE TABLE IF NOT EXISTS medical_records (
+            id INTEGER PRIMARY KEY,
+            patient_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            record_date TEXT NOT NULL,
+            diagnosis TEXT NOT NULL,
+            treatment TEXT NOT NULL,
+            FOREIGN KEY(patient_id) REFERENCES patients(id),
+            FOREIGN KEY(doctor_id) REFERENCES doctors(id)
+        )
+    """
+    DB.execute(create_medical_records_table_sql)
 
+    create_patients_table_sql = """
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            gender TEXT NOT NULL
+        )
+    """
+    DB.execute(create_patients_table_sql)
 
+    existing_workload = {row[0] for row in DB.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('appointment_workload', 'medical_record_workload')"
+    )}
+    for table in INDEXES:
+        add_missing_columns(table)
+        create_indexes(table)
+    # Summarize the rows written before the workload tables existed
+    for summary, sql in WORKLOAD_QUERIES.items():
+        if summary not in existing_workload:
+            DB.execute(f"INSERT INTO {summary} {sql}")
+    quarantined = canonicalize_dates()
+    for table, ids in quarantined.items():
+        warnings.warn(f"{len(ids)} {table} rows have dates that cannot be read and were moved to "
+                      f"{table}_quarantine (ids {', '.join(map(str, ids[:10]))}{', ...' if len(ids) > 10 else ''}); "
+                      "correct their dates and insert them back")
 
-CONN.commit()
+def canonicalize_dates():
+    """Rewrite dates stored in other accepted forms, like '2024-7-1 8:30', in their canonical sortable form.
 
-initialize_database()
+    Rows whose dates cannot be parsed at all are moved to a <table>_quarantine
+    table with the same columns plus quarantined_at, so that no query, cache
+    or report ever sees them. Returns {table: [ids]} of the moved rows.
+    """
+    from models.schedule import canonical_appointment_date, canonical_record_date
+    canonical = {"appointments": canonical_appointment_date, "medical_records": canonical_record_date}
+    quarantined = {}
+    for table, (column, pattern) in DATE_COLUMNS.items():
+        rows = DB.execute(f"SELECT id, {column} FROM {table} WHERE {column} NOT GLOB ?", (pattern,)).fetchall()
+        updates, unreadable = [], []
+        for id, value in rows:
+            try:
+                updates.append((canonical[table](value), id))
+            except ValueError:
+                unreadable.append((id,))
+        DB.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+        if unreadable:
+            DB.execute(f"CREATE TABLE IF NOT EXISTS {table}_quarantine AS "
+                       f"SELECT *, NULL AS quarantined_at FROM {table} WHERE 0")
+            DB.executemany(f"INSERT INTO {table}_quarantine SELECT *, CURRENT_TIMESTAMP FROM {table} WHERE id = ?",
+                           unreadable)
+            DB.executemany(f"DELETE FROM {table} WHERE id = ?", unreadable)
+            quarantined[table] = [id for id, in unreadable]
+    return quarantined
@@ -0,0 +1,25 @@
+# lib/models/aio.py
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking model calls run on these threads so the event loop stays free. Each
+# worker opens its own connection through DB on first use, and results still go
+# through the models' shared identity maps.
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("HOSPITAL_ASYNC_WORKERS", 8)),
+    thread_name_prefix="hospital-db"
+)
+
+
+async def run_in_worker(func, *args, **kwargs):
+    """Run a blocking data-access call on the database worker pool and await its result.
+
+    Pass a function that opens a session() to run a whole unit of work on one
+    worker thread, since sessions belong to the thread that opened them.
+    """
+    # asyncio is imported here rather than at module level: it costs tens of
+    # milliseconds at startup, and only async callers need it
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, functools.partial(func, *args, **kwargs))
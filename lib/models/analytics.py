@@ -0,0 +1,170 @@
+# lib/models/analytics.py
+import os
+
+import numpy as np
+
+from models.__init__ import DB
+from models.schedule import parse_appointment_date, stored_appointment_date
+
+# Column name -> dtype of the snapshot arrays, in SELECT order
+COLUMNS = {
+    "id": "int64",
+    "doctor_id": "int64",
+    "patient_id": "int64",
+    "start": "datetime64[m]",
+    "duration": "int32",
+}
+
+
+class AppointmentSnapshot:
+    """Appointments as contiguous NumPy column arrays, for vectorized analytics.
+
+    Rows are read from the appointments table in chunks of chunk_size, without
+    creating Appointment objects. When a directory is given the columns are
+    saved there as one .npy file each and memory-mapped on the next load;
+    refresh() then only reads rows with an id greater than the last one in the
+    snapshot. Deleted rows trigger a full reload; rescheduled appointments are
+    only picked up by rebuild().
+    """
+
+    def __init__(self, directory=None, chunk_size=100000):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        if directory and all(os.path.exists(self._path(name)) for name in COLUMNS):
+            self.columns = {name: np.load(self._path(name), mmap_mode="r") for name in COLUMNS}
+
+    def __repr__(self):
+        return f"AppointmentSnapshot(rows={len(self)}, last_id={self.last_id}, directory={self.directory!r})"
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def __getattr__(self, name):
+        # snapshot.doctor_id, snapshot.start, ... return the column arrays
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    @property
+    def last_id(self):
+        return int(self.columns["id"][-1]) if len(self) else 0
+
+    def refresh(self):
+        """Append the rows added since the snapshot was taken and return how many there were"""
+        stored = DB.execute("SELECT COUNT(*) FROM appointments WHERE id <= ?", (self.last_id,)).fetchone()[0]
+        if stored != len(self):
+            return self.rebuild()
+        new = self._read(self.last_id)
+        if len(new["id"]):
+            self.columns = {name: np.concatenate((self.columns[name], new[name])) for name in COLUMNS}
+            self._save()
+        return len(new["id"])
+
+    def rebuild(self):
+        """Reload every row and return how many there are"""
+        self.columns = self._read(0)
+        self._save()
+        return len(self)
+
+    def _read(self, after_id):
+        sql = """
+            SELECT id, doctor_id, patient_id, appointment_date, duration FROM appointments
+            WHERE id > ? ORDER BY id
+        """
+        cursor = DB.execute(sql, (after_id,))
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            ids, doctor_ids, patient_ids, dates, durations = zip(*rows)
+            chunks.append({
+                "id": np.array(ids, dtype=COLUMNS["id"]),
+                "doctor_id": np.array(doctor_ids, dtype=COLUMNS["doctor_id"]),
+                "patient_id": np.array(patient_ids, dtype=COLUMNS["patient_id"]),
+                "start": _parse_dates(ids, dates),
+                "duration": np.array(durations, dtype=COLUMNS["duration"]),
+            })
+        if not chunks:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS}
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"appointments_{name}.npy")
+
+    def _save(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for name in COLUMNS:
+            # Write next to the old file and swap, so readers never see half a column
+            temporary = self._path(name) + ".tmp.npy"
+            np.save(temporary, np.ascontiguousarray(self.columns[name]))
+            os.replace(temporary, self._path(name))
+        self.columns = {name: np.load(self._path(name), mmap_mode="r") for name in COLUMNS}
+
+    def _select(self, start=None, end=None, doctor_id=None):
+        """Return a boolean mask of the appointments starting in [start, end) for doctor_id"""
+        mask = ~np.isnat(self.columns["start"])
+        if start is not None:
+            mask &= self.columns["start"] >= np.datetime64(parse_appointment_date(start), "m")
+        if end is not None:
+            mask &= self.columns["start"] < np.datetime64(parse_appointment_date(end), "m")
+        if doctor_id is not None:
+            mask &= self.columns["doctor_id"] == doctor_id
+        return mask
+
+    def bookings_per_doctor_hour(self, start=None, end=None):
+        """Return (doctor_ids, counts): counts[i, h] is the number of bookings of doctor_ids[i] starting in hour h"""
+        mask = self._select(start, end)
+        doctor_ids, doctor_index = np.unique(self.columns["doctor_id"][mask], return_inverse=True)
+        hours = _hours(self.columns["start"][mask])
+        counts = np.bincount(doctor_index * 24 + hours, minlength=len(doctor_ids) * 24)
+        return doctor_ids, counts.reshape(len(doctor_ids), 24)
+
+    def weekday_hour_heatmap(self, doctor_id=None, start=None, end=None):
+        """Return a 7 x 24 array of booking counts by weekday (Monday first) and starting hour"""
+        mask = self._select(start, end, doctor_id)
+        starts = self.columns["start"][mask]
+        days = starts.astype("datetime64[D]").astype("int64")
+        # 1970-01-01 was a Thursday
+        weekdays = (days + 3) % 7
+        return np.bincount(weekdays * 24 + _hours(starts), minlength=7 * 24).reshape(7, 24)
+
+    def bookings_per_period(self, period="W", doctor_id=None, start=None, end=None):
+        """Return (period_starts, counts) of bookings per day ("D"), week ("W") or month ("M"), in order"""
+        mask = self._select(start, end, doctor_id)
+        starts = self.columns["start"][mask]
+        if period == "W":
+            # Weeks start on Monday
+            days = starts.astype("datetime64[D]")
+            periods = days - ((days.astype("int64") + 3) % 7).astype("timedelta64[D]")
+        elif period in ("D", "M"):
+            periods = starts.astype(f"datetime64[{period}]")
+        else:
+            raise ValueError("Period must be 'D', 'W' or 'M'")
+        return np.unique(periods, return_counts=True)
+
+    def booked_minutes_per_doctor(self, start=None, end=None):
+        """Return (doctor_ids, minutes): total booked minutes per doctor"""
+        mask = self._select(start, end)
+        doctor_ids, doctor_index = np.unique(self.columns["doctor_id"][mask], return_inverse=True)
+        minutes = np.bincount(doctor_index, weights=self.columns["duration"][mask], minlength=len(doctor_ids))
+        return doctor_ids, minutes.astype("int64")
+
+
+def _hours(starts):
+    return (starts.astype("int64") // 60 % 24).astype("int64")
+
+
+def _parse_dates(ids, dates):
+    """Parse appointment_date strings into datetime64[m], falling back to the model parser for non-ISO values.
+
+    Unreadable dates become NaT, which every analysis leaves out.
+    """
+    try:
+        return np.array(dates, dtype="datetime64[m]")
+    except ValueError:
+        return np.array([stored_appointment_date(id, date) for id, date in zip(ids, dates)], dtype="datetime64[m]")
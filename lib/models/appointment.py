@@ -1,67 +1,51 @@
 # lib/models/appointment.py
-from models.__init__ import CONN, CURSOR
+from datetime import timedelta
+
+from models.__init__ import DB, add_missing_columns, create_indexes, SQL_VARIABLE_LIMIT
+from models.identity_map import IdentityMap
+from models.aio import run_in_worker
+from models.fields import AppointmentDate, OptionalString, PositiveInteger
+from models.schedule import SCHEDULE, canonical_appointment_date, parse_appointment_date
+from models.availability import AVAILABILITY
 
 class Appointment:
     
-    all = {}
+    __slots__ = ("id", "_appointment_date", "_patient_id", "_doctor_id", "_notes", "_duration", "_persisted_owners", "__weakref__")
+    
+    all = IdentityMap()
+    
+    appointment_date = AppointmentDate("Appointment date must be in the format YYYY-MM-DD HH:MM")
+    patient_id = PositiveInteger("Patient ID must be a positive integer")
+    doctor_id = PositiveInteger("Doctor ID must be a positive integer")
+    notes = OptionalString("Notes must be a string or None")
+    duration = PositiveInteger("Duration must be a positive number of minutes")
     
-    def __init__(self, appointment_date, patient_id, doctor_id, notes=None, id=None):
+    def __init__(self, appointment_date, patient_id, doctor_id, notes=None, duration=30, id=None):
         self.id = id
         self.appointment_date = appointment_date
         self.patient_id = patient_id
         self.doctor_id = doctor_id
         self.notes = notes
+        self.duration = duration
+        # (patient_id, doctor_id) as last written to or read from the database
+        self._persisted_owners = None
 
     def __repr__(self):
         return (
-            f"Appointment(id={self.id}, appointment_date={self.appointment_date}, patient_id={self.patient_id}, doctor_id={self.doctor_id}, notes={self.notes})"
+            f"Appointment(id={self.id}, appointment_date={self.appointment_date}, patient_id={self.patient_id}, doctor_id={self.doctor_id}, notes={self.notes}, duration={self.duration})"
         )
     
     @property
-    def appointment_date(self):
-        return self._appointment_date
-    
-    @appointment_date.setter
-    def appointment_date(self, appointment_date):
-        # Add validation if necessary
-        self._appointment_date = appointment_date
+    def start(self):
+        return parse_appointment_date(self.appointment_date)
 
     @property
-    def patient_id(self):
-        return self._patient_id
-    
-    @patient_id.setter
-    def patient_id(self, patient_id):
-        if isinstance(patient_id, int) and patient_id > 0:
-            self._patient_id = patient_id
-        else:
-            raise ValueError("Patient ID must be a positive integer")
-
-    @property
-    def doctor_id(self):
-        return self._doctor_id
-    
-    @doctor_id.setter
-    def doctor_id(self, doctor_id):
-        if isinstance(doctor_id, int) and doctor_id > 0:
-            self._doctor_id = doctor_id
-        else:
-            raise ValueError("Doctor ID must be a positive integer")
+    def end(self):
+        return self.start + timedelta(minutes=self.duration)
 
-    @property
-    def notes(self):
-        return self._notes
-    
-    @notes.setter
-    def notes(self, notes):
-        if notes is None or isinstance(notes, str):
-            self._notes = notes
-        else:
-            raise ValueError("Notes must be a string or None")
-    
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of Appointment instances"""
+        """Create a new table, and its indexes, to persist the attributes of Appointment instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS appointments (
                 id INTEGER PRIMARY KEY,
@@ -69,102 +53,291 @@ class Appointment:
                 patient_id INTEGER NOT NULL,
                 doctor_id INTEGER NOT NULL,
                 notes TEXT,
+                duration INTEGER NOT NULL DEFAULT 30,
                 FOREIGN KEY(patient_id) REFERENCES patients(id),
                 FOREIGN KEY(doctor_id) REFERENCES doctors(id)
             )
         """
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        add_missing_columns("appointments")
+        create_indexes("appointments")
+        DB.commit()
     
     @classmethod
     def drop_table(cls):
-        """Drop the table that persists the attributes of Appointment instances"""
+        """Drop the table that persists the attributes of Appointment instances, and its workload summary"""
         sql = "DROP TABLE IF EXISTS appointments"
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        DB.execute("DROP TABLE IF EXISTS appointment_workload")
+        DB.commit()
+        SCHEDULE.clear()
+        AVAILABILITY.clear()
+    
+    def reset_owner_relations(self):
+        """Discard the cached appointments lists of the patients and doctors this row belongs, or belonged, to"""
+        from models.patient import Patient
+        from models.doctor import Doctor
+        owners = {(self.patient_id, self.doctor_id)}
+        if self._persisted_owners:
+            owners.add(self._persisted_owners)
+        for patient_id, doctor_id in owners:
+            Patient.reset_relation(patient_id, "appointments")
+            Doctor.reset_relation(doctor_id, "appointments")
+        self._persisted_owners = (self.patient_id, self.doctor_id)
     
     def save(self):
-        """Persist the attributes of an Appointment instance to the database"""
+        """Persist the attributes of an Appointment instance to the database.
+
+        Raises ValueError if the doctor already has an overlapping appointment.
+        """
         sql = """
-            INSERT INTO appointments (appointment_date, patient_id, doctor_id, notes)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO appointments (appointment_date, patient_id, doctor_id, notes, duration)
+            VALUES (?, ?, ?, ?, ?)
         """
-        CURSOR.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes))
-        CONN.commit()
-        self.id = CURSOR.lastrowid
+        with SCHEDULE.lock:
+            SCHEDULE.check(self)
+            cursor = DB.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes, self.duration))
+            DB.commit()
+            self.id = cursor.lastrowid
+            SCHEDULE.add(self)
+            AVAILABILITY.add(self)
+        type(self).all.add_new(self.id, self)
+        self.reset_owner_relations()
     
     def update(self):
-        """Update the table row corresponding to the current Appointment instance"""
+        """Update the table row corresponding to the current Appointment instance.
+
+        Raises ValueError if the new time overlaps another appointment of the doctor.
+        """
         sql = """
             UPDATE appointments
-            SET appointment_date = ?, patient_id = ?, doctor_id = ?, notes = ?
+            SET appointment_date = ?, patient_id = ?, doctor_id = ?, notes = ?, duration = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes, self.id))
-        CONN.commit()
+        with SCHEDULE.lock:
+            SCHEDULE.check(self)
+            DB.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes, self.duration, self.id))
+            DB.commit()
+            SCHEDULE.add(self)
+            AVAILABILITY.add(self)
+        self.reset_owner_relations()
     
     def delete(self):
         """Delete the table row corresponding to the current Appointment instance"""
         sql = "DELETE FROM appointments WHERE id = ?"
-        CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        # Under the schedule lock, like save and update, so no other thread checks a booking in between
+        with SCHEDULE.lock:
+            DB.execute(sql, (self.id,))
+            DB.commit()
+            SCHEDULE.remove(self.id)
+            AVAILABILITY.remove(self.id)
+        type(self).all.pop(self.id)
+        self.reset_owner_relations()
     
     @classmethod
-    def create(cls, appointment_date, patient_id, doctor_id, notes=None):
+    def create(cls, appointment_date, patient_id, doctor_id, notes=None, duration=30):
         """Create a new Appointment instance and persist it to the database"""
-        appointment = cls(appointment_date, patient_id, doctor_id, notes)
+        appointment = cls(appointment_date, patient_id, doctor_id, notes, duration)
         appointment.save()
         return appointment
     
+    @classmethod
+    def create_many(cls, rows, validated=False):
+        """Create Appointment instances from (appointment_date, patient_id, doctor_id, notes[, duration]) tuples in a single transaction.
+
+        Pass validated=True for rows already cleaned by the fields, as the
+        importer's workers do; their values are then not validated again.
+        """
+        build = cls._trusted if validated else cls
+        appointments = [build(*row) for row in rows]
+        with SCHEDULE.lock:
+            SCHEDULE.check_many(appointments)
+            ids = DB.insert_many(
+                "appointments",
+                ("appointment_date", "patient_id", "doctor_id", "notes", "duration"),
+                [(appointment.appointment_date, appointment.patient_id, appointment.doctor_id, appointment.notes, appointment.duration) for appointment in appointments]
+            )
+            for appointment, id in zip(appointments, ids):
+                appointment.id = id
+                SCHEDULE.add(appointment)
+                AVAILABILITY.add(appointment)
+        for appointment in appointments:
+            cls.all.add_new(appointment.id, appointment)
+            appointment.reset_owner_relations()
+        return appointments
+    
+    @classmethod
+    def _unloaded(cls, id):
+        """Return an Appointment for id whose column attributes instance_from_db has yet to set"""
+        appointment = cls.__new__(cls)
+        appointment.id = id
+        return appointment
+    
+    @classmethod
+    def _trusted(cls, appointment_date, patient_id, doctor_id, notes=None, duration=30):
+        """Return a new, unsaved Appointment from values the fields have already cleaned, without validating them again"""
+        appointment = cls._unloaded(None)
+        appointment._appointment_date = appointment_date
+        appointment._patient_id = patient_id
+        appointment._doctor_id = doctor_id
+        appointment._notes = notes
+        appointment._duration = duration
+        appointment._persisted_owners = None
+        return appointment
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return an Appointment object having the attribute values from the table row."""
-        
-        # Check the dictionary for existing instances using the row's primary key
-        appointment = cls.all.get(row[0])
-        if appointment:
-            # Ensure attributes match row values in case local instance was modified
-            appointment.appointment_date = row[1]
-            appointment.patient_id = row[2]
-            appointment.doctor_id = row[3]
-            appointment.notes = row[4]
-        else:
-            # Create a new instance using row values
-            appointment = cls(row[1], row[2], row[3], row[4], id=row[0])
-            cls.all[row[0]] = appointment
-        
+        """Return an Appointment object having the attribute values from the table row.
+
+        Rows come from our own validated table, so they are written straight
+        into the slots without running the field validators.
+        """
+        appointment = cls.all.get_or_add(row[0], cls._unloaded)
+        appointment._appointment_date = row[1]
+        appointment._patient_id = row[2]
+        appointment._doctor_id = row[3]
+        appointment._notes = row[4]
+        appointment._duration = row[5]
+        appointment._persisted_owners = (row[2], row[3])
         return appointment
     
     @classmethod
     def get_all(cls):
         """Return a list of all Appointment instances persisted to the database"""
         sql = "SELECT * FROM appointments"
-        CURSOR.execute(sql)
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+    
+    @classmethod
+    def iter_all(cls, batch_size=500):
+        """Yield every Appointment instance, fetching rows from the database batch_size at a time"""
+        sql = "SELECT * FROM appointments ORDER BY id"
+        cursor = DB.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield cls.instance_from_db(row)
+    
+    @classmethod
+    def page(cls, after_id=0, limit=50):
+        """Return up to limit Appointment instances with an id greater than after_id, in id order"""
+        sql = "SELECT * FROM appointments WHERE id > ? ORDER BY id LIMIT ?"
+        rows = DB.execute(sql, (after_id, limit)).fetchall()
         return [cls.instance_from_db(row) for row in rows]
     
     @classmethod
     def find_by_id(cls, id):
         """Return the Appointment instance with the given primary key"""
         sql = "SELECT * FROM appointments WHERE id = ?"
-        row = CURSOR.execute(sql, (id,)).fetchone()
+        row = DB.execute(sql, (id,)).fetchone()
         return cls.instance_from_db(row) if row else None
     
     @classmethod
     def find_by_patient_id(cls, patient_id):
         """Return a list of Appointment instances for the given patient_id"""
         sql = "SELECT * FROM appointments WHERE patient_id = ?"
-        CURSOR.execute(sql, (patient_id,))
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql, (patient_id,)).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+
+    @classmethod
+    def find_by_patient_ids(cls, patient_ids):
+        """Return a list of Appointment instances for any of the given patient_ids"""
+        patient_ids = list(patient_ids)
+        rows = []
+        for start in range(0, len(patient_ids), SQL_VARIABLE_LIMIT):
+            chunk = patient_ids[start:start + SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT * FROM appointments WHERE patient_id IN ({placeholders})"
+            rows.extend(DB.execute(sql, chunk).fetchall())
         return [cls.instance_from_db(row) for row in rows]
 
     @classmethod
     def find_by_doctor_id(cls, doctor_id):
         """Return a list of Appointment instances for the given doctor_id"""
         sql = "SELECT * FROM appointments WHERE doctor_id = ?"
-        CURSOR.execute(sql, (doctor_id,))
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql, (doctor_id,)).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+
+    @classmethod
+    def find_between(cls, start, end, doctor_id=None):
+        """Return the Appointment instances starting in [start, end), of one doctor or of all, in date order.
+
+        start and end may be date strings, datetimes or dates. The range is read
+        from the appointment_date index, or the (doctor_id, appointment_date) index for one doctor.
+        """
+        sql = "SELECT * FROM appointments WHERE appointment_date >= ? AND appointment_date < ?"
+        params = [canonical_appointment_date(start), canonical_appointment_date(end)]
+        if doctor_id is not None:
+            sql += " AND doctor_id = ?"
+            params.append(doctor_id)
+        rows = DB.execute(sql + " ORDER BY appointment_date, id", params).fetchall()
         return [cls.instance_from_db(row) for row in rows]
+
+    @classmethod
+    def find_by_doctor_ids(cls, doctor_ids):
+        """Return a list of Appointment instances for any of the given doctor_ids"""
+        doctor_ids = list(doctor_ids)
+        rows = []
+        for start in range(0, len(doctor_ids), SQL_VARIABLE_LIMIT):
+            chunk = doctor_ids[start:start + SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT * FROM appointments WHERE doctor_id IN ({placeholders})"
+            rows.extend(DB.execute(sql, chunk).fetchall())
+        return [cls.instance_from_db(row) for row in rows]
+    
+    async def asave(self):
+        """Async counterpart of save, run on the database worker pool"""
+        await run_in_worker(self.save)
+    
+    async def aupdate(self):
+        """Async counterpart of update, run on the database worker pool"""
+        await run_in_worker(self.update)
+    
+    async def adelete(self):
+        """Async counterpart of delete, run on the database worker pool"""
+        await run_in_worker(self.delete)
+    
+    @classmethod
+    async def afind_by_id(cls, id):
+        """Async counterpart of find_by_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_id, id)
+    
+    @classmethod
+    async def afind_by_patient_id(cls, patient_id):
+        """Async counterpart of find_by_patient_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_patient_id, patient_id)
+    
+    @classmethod
+    async def afind_by_doctor_id(cls, doctor_id):
+        """Async counterpart of find_by_doctor_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_doctor_id, doctor_id)
+    
+    @classmethod
+    async def afind_between(cls, start, end, doctor_id=None):
+        """Async counterpart of find_between, run on the database worker pool"""
+        return await run_in_worker(cls.find_between, start, end, doctor_id)
+    
+    @classmethod
+    async def aget_all(cls):
+        """Async counterpart of get_all, run on the database worker pool"""
+        return await run_in_worker(cls.get_all)
+    
+    @classmethod
+    async def apage(cls, after_id=0, limit=50):
+        """Async counterpart of page, run on the database worker pool"""
+        return await run_in_worker(cls.page, after_id, limit)
+    
+    @classmethod
+    async def acreate(cls, appointment_date, patient_id, doctor_id, notes=None, duration=30):
+        """Async counterpart of create, run on the database worker pool"""
+        return await run_in_worker(cls.create, appointment_date, patient_id, doctor_id, notes, duration)
+    
+    @classmethod
+    async def acreate_many(cls, rows, validated=False):
+        """Async counterpart of create_many, run on the database worker pool"""
+        return await run_in_worker(cls.create_many, rows, validated)
     #CLI Interface
 def manage_appointments():
      while True:
@@ -196,15 +369,17 @@ def create_appointment():
         patient_id = int(input("Enter patient ID: "))
         doctor_id = int(input("Enter doctor ID: "))
         notes = input("Enter notes (optional): ")
-        Appointment.create(appointment_date, patient_id, doctor_id, notes)
+        duration = int(input("Enter duration in minutes (default 30): ") or 30)
+        Appointment.create(appointment_date, patient_id, doctor_id, notes, duration)
         print("Appointment created successfully!")
     except Exception as e:
         print(f"Error creating appointment: {e}")
 
 def view_all_appointments():
-    appointments = Appointment.get_all()
-    for appointment in appointments:
-        print(appointment)
+    from helpers import page_through
+    shown = page_through(Appointment.page, print)
+    if not shown:
+        print("No appointments found.")
 
 def find_appointment_by_id():
     try:
@@ -0,0 +1,161 @@
+# lib/models/availability.py
+import math
+import threading
+from datetime import datetime, time, timedelta
+
+from models.__init__ import DB, SQL_VARIABLE_LIMIT
+from models.schedule import parse_appointment_date, stored_appointment_date
+
+
+class AvailabilityCache:
+    """Per-doctor, per-day bitmaps of booked slots, used to find free slots quickly.
+
+    A working day is split into fixed slots; bit i of a bitmap is set when any
+    appointment of that doctor overlaps slot i. Days are read from the
+    appointments table the first time they are searched, one query for all the
+    requested doctors and days, and then updated incrementally by
+    Appointment.save/update/delete.
+    """
+
+    def __init__(self, slot_minutes=15, day_start=time(8, 0), day_end=time(18, 0)):
+        self.slot_minutes = slot_minutes
+        self.day_start = day_start
+        self.day_end = day_end
+        minutes = (day_end.hour - day_start.hour) * 60 + day_end.minute - day_start.minute
+        self.slots_per_day = minutes // slot_minutes
+        self._bitmaps = {}
+        # (doctor_id, day) -> {appointment_id: slot mask}, to rebuild a bitmap when one booking goes away
+        self._masks = {}
+        # appointment_id -> list of (doctor_id, day) it was marked on
+        self._marked = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return f"AvailabilityCache(days={len(self._bitmaps)}, bookings={len(self._marked)})"
+
+    def clear(self):
+        """Forget every loaded day; they are re-read from the database on next use"""
+        with self._lock:
+            self._bitmaps.clear()
+            self._masks.clear()
+            self._marked.clear()
+
+    def add(self, appointment):
+        """Mark the slots of a saved appointment on the days already loaded"""
+        with self._lock:
+            self.remove(appointment.id)
+            self._mark(appointment.id, appointment.doctor_id, appointment.start, appointment.end, self._bitmaps)
+
+    def remove(self, appointment_id):
+        """Free the slots of a deleted or rescheduled appointment"""
+        with self._lock:
+            for key in self._marked.pop(appointment_id, ()):
+                masks = self._masks[key]
+                masks.pop(appointment_id, None)
+                bitmap = 0
+                for mask in masks.values():
+                    bitmap |= mask
+                self._bitmaps[key] = bitmap
+
+    def free_slots(self, doctor_ids, duration=30, after=None, count=5, days=7):
+        """Return up to count (start, doctor_id) pairs, earliest first, where a doctor is free for duration minutes.
+
+        Searches from `after` (default: now) through the following `days` days.
+        """
+        after = parse_appointment_date(after) if after else datetime.now()
+        needed = -(-duration // self.slot_minutes)
+        if not doctor_ids or needed > self.slots_per_day:
+            return []
+        first_day = after.date()
+        self._load(doctor_ids, first_day, first_day + timedelta(days=days))
+        full = (1 << self.slots_per_day) - 1
+        found = []
+        with self._lock:
+            for offset in range(days + 1):
+                day = first_day + timedelta(days=offset)
+                first_slot = self._first_slot_after(day, after)
+                candidates = []
+                for doctor_id in doctor_ids:
+                    free = ~self._bitmaps.get((doctor_id, day), 0) & full
+                    # Bit i of `runs` is set when slots i .. i + needed - 1 are all free
+                    runs = free
+                    for shift in range(1, needed):
+                        runs &= free >> shift
+                    runs &= full >> (needed - 1)
+                    runs &= ~((1 << first_slot) - 1)
+                    for _ in range(count):
+                        if not runs:
+                            break
+                        slot = (runs & -runs).bit_length() - 1
+                        candidates.append((self._slot_start(day, slot), doctor_id))
+                        runs &= runs - 1
+                found.extend(sorted(candidates)[:count - len(found)])
+                if len(found) >= count:
+                    break
+        return found
+
+    def _first_slot_after(self, day, after):
+        if day > after.date():
+            return 0
+        minutes = (after.hour - self.day_start.hour) * 60 + after.minute - self.day_start.minute
+        return min(max(-(-minutes // self.slot_minutes), 0), self.slots_per_day)
+
+    def _slot_start(self, day, slot):
+        return datetime.combine(day, self.day_start) + timedelta(minutes=slot * self.slot_minutes)
+
+    def _mark(self, appointment_id, doctor_id, start, end, days):
+        """Set the slots overlapped by [start, end) on each of its (doctor_id, day) keys found in days"""
+        day = start.date()
+        while day <= end.date():
+            key = (doctor_id, day)
+            if key in days:
+                opening = datetime.combine(day, self.day_start)
+                first = math.floor((start - opening).total_seconds() / 60 / self.slot_minutes)
+                last = math.ceil((end - opening).total_seconds() / 60 / self.slot_minutes)
+                first, last = max(first, 0), min(last, self.slots_per_day)
+                if first < last:
+                    mask = ((1 << (last - first)) - 1) << first
+                    self._masks.setdefault(key, {})[appointment_id] = mask
+                    self._bitmaps[key] = self._bitmaps.get(key, 0) | mask
+                    self._marked.setdefault(appointment_id, []).append(key)
+            day += timedelta(days=1)
+
+    def _load(self, doctor_ids, first_day, last_day):
+        """Read the bookings of the doctors' days in [first_day, last_day] that are not cached yet"""
+        with self._lock:
+            missing = [
+                doctor_id for doctor_id in doctor_ids
+                if any((doctor_id, first_day + timedelta(days=offset)) not in self._bitmaps
+                       for offset in range((last_day - first_day).days + 1))
+            ]
+            if not missing:
+                return
+            # Appointments never span more than a day, so start a day early
+            # to catch bookings running past midnight.
+            low = f"{first_day - timedelta(days=1):%Y-%m-%d}"
+            high = f"{last_day + timedelta(days=1):%Y-%m-%d}"
+            for start in range(0, len(missing), SQL_VARIABLE_LIMIT):
+                chunk = missing[start:start + SQL_VARIABLE_LIMIT]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = f"""
+                    SELECT id, doctor_id, appointment_date, duration FROM appointments
+                    WHERE appointment_date >= ? AND appointment_date < ? AND doctor_id IN ({placeholders})
+                """
+                rows = DB.execute(sql, (low, high, *chunk)).fetchall()
+                new_days = set()
+                for doctor_id in chunk:
+                    for offset in range((last_day - first_day).days + 1):
+                        key = (doctor_id, first_day + timedelta(days=offset))
+                        if key not in self._bitmaps:
+                            self._bitmaps[key] = 0
+                            self._masks[key] = {}
+                            new_days.add(key)
+                for id, doctor_id, appointment_date, duration in rows:
+                    start_at = stored_appointment_date(id, appointment_date)
+                    if start_at is None:
+                        continue
+                    self._mark(id, doctor_id, start_at, start_at + timedelta(minutes=duration), new_days)
+
+
+AVAILABILITY = AvailabilityCache()
+DB.reset_hooks.append(AVAILABILITY.clear)
@@ -0,0 +1,194 @@
+# lib/models/backup.py
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from models.__init__ import DB
+
+# Pages copied per backup step without WAL; the database is only locked while a step runs
+STEP_PAGES = 1024
+# Pause between steps, so writers get the database in between
+STEP_SLEEP = 0.005
+# Writes by other connections restart a stepped copy; after this many restarts
+# the copy is redone in a single step
+MAX_RESTARTS = 3
+
+SNAPSHOT_PREFIX = "hospital-"
+# Down to the microsecond, so snapshots taken within one second get names of their own
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S-%f"
+# Names of snapshots taken before microseconds were added are still read
+SNAPSHOT_TIME_FORMATS = (SNAPSHOT_TIME_FORMAT, "%Y%m%d-%H%M%S")
+
+# restarts counts the copies started over because another connection wrote meanwhile
+BackupResult = namedtuple("BackupResult", ["path", "pages", "seconds", "restarts"])
+
+
+def backup(path, pages=None, sleep=STEP_SLEEP):
+    """Copy the configured database to path while it stays in use, and return a BackupResult.
+
+    Uses SQLite's online backup API. With a rollback journal a backup step
+    blocks writers, so pages are copied STEP_PAGES at a time with a pause
+    between steps; a write by another connection restarts the copy, and after
+    MAX_RESTARTS restarts it is finished in a single step. In WAL mode readers
+    never block writers, so by default everything is copied in one step from
+    one consistent snapshot. Pass pages to choose the step size yourself. The
+    copy is made under a temporary name and renamed when complete.
+    """
+    temporary = f"{path}.tmp"
+    # A connection of its own, with the profile's busy timeout, so the backup
+    # never shares a session with the application
+    source = DB.connect()
+    if pages is None:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        pages = -1 if wal else STEP_PAGES
+    start = time.perf_counter()
+    try:
+        try:
+            total, restarts = _copy(source, temporary, pages, sleep if pages > 0 else 0, MAX_RESTARTS)
+        except _Restarted:
+            total, restarts = _copy(source, temporary, -1, 0, None)
+            restarts += MAX_RESTARTS + 1
+        os.replace(temporary, path)
+    finally:
+        source.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return BackupResult(path, total, time.perf_counter() - start, restarts)
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _copy(source, path, pages, pause, max_restarts):
+    """Back up source into a new database at path and return (pages copied, restarts)"""
+    if os.path.exists(path):
+        os.remove(path)
+    target = sqlite3.connect(path)
+    total, restarts, last_remaining = 0, 0, None
+
+    def progress(status, remaining, count):
+        nonlocal total, restarts, last_remaining
+        total = count
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if max_restarts is not None and restarts > max_restarts:
+                raise _Restarted()
+        last_remaining = remaining
+        if pause and remaining:
+            # backup()'s own sleep only applies after SQLITE_BUSY; pausing here
+            # lets writers in after every step
+            time.sleep(pause)
+
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    finally:
+        target.close()
+    return total, restarts
+
+
+def snapshot(directory, keep=None, pages=None, sleep=STEP_SLEEP):
+    """Back up to directory/hospital-YYYYMMDD-HHMMSS-ffffff.db, then delete all but the newest keep snapshots.
+
+    Raises FileExistsError rather than replace an existing snapshot.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{SNAPSHOT_PREFIX}{datetime.now():{SNAPSHOT_TIME_FORMAT}}.db")
+    if os.path.exists(path):
+        raise FileExistsError(f"Snapshot {path} already exists")
+    result = backup(path, pages, sleep)
+    if keep is not None:
+        prune(directory, keep)
+    return result
+
+
+def snapshots(directory):
+    """Return [(taken at, path)] of the snapshots in directory, oldest first"""
+    found = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        if not (name.startswith(SNAPSHOT_PREFIX) and name.endswith(".db")):
+            continue
+        taken = _taken_at(name[len(SNAPSHOT_PREFIX):-3])
+        if taken:
+            found.append((taken, os.path.join(directory, name)))
+    return sorted(found)
+
+
+def _taken_at(stamp):
+    for time_format in SNAPSHOT_TIME_FORMATS:
+        try:
+            return datetime.strptime(stamp, time_format)
+        except ValueError:
+            continue
+    return None
+
+
+def prune(directory, keep):
+    """Delete all but the newest keep snapshots and return the deleted paths"""
+    if keep < 1:
+        raise ValueError("At least one snapshot must be kept")
+    expired = [path for taken, path in snapshots(directory)[:-keep]]
+    for path in expired:
+        os.remove(path)
+    return expired
+
+
+def find_snapshot(directory, at=None):
+    """Return the path of the newest snapshot taken at or before at (a datetime; default now)"""
+    at = at or datetime.now()
+    candidates = [path for taken, path in snapshots(directory) if taken <= at]
+    if not candidates:
+        raise ValueError(f"No snapshot in {directory} taken at or before {at:%Y-%m-%d %H:%M:%S}")
+    return candidates[-1]
+
+
+def restore(path, pages=STEP_PAGES):
+    """Replace the contents of the configured database with the backup at path and return a BackupResult.
+
+    The backup is integrity-checked first. Open connections are closed, and
+    once the copy is done DB.reset_hooks run, as after a rolled back session,
+    and the models' identity maps are cleared, so this process only sees the
+    restored rows. Other running processes still hold the old ones; restart
+    them afterwards.
+    """
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        try:
+            status = source.execute("PRAGMA quick_check").fetchone()[0]
+        except sqlite3.DatabaseError as error:
+            # Too damaged to check, or not a database at all
+            status = str(error)
+        if status != "ok":
+            raise ValueError(f"{path} failed its integrity check: {status}")
+        # Reconnect afterwards with a clean slate, as when switching databases
+        DB.configure(path=DB.path)
+        target = DB.connect()
+        total = 0
+
+        def progress(status, remaining, count):
+            nonlocal total
+            total = count
+
+        start = time.perf_counter()
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=0)
+        finally:
+            target.close()
+            _reset_caches()
+    finally:
+        source.close()
+    return BackupResult(DB.path, total, time.perf_counter() - start, 0)
+
+
+def _reset_caches():
+    """Drop everything loaded from the database before it was replaced"""
+    from models.patient import Patient
+    from models.doctor import Doctor
+    from models.appointment import Appointment
+    from models.medical_record import MedicalRecord
+    for hook in DB.reset_hooks:
+        hook()
+    for model in (Patient, Doctor, Appointment, MedicalRecord):
+        model.all.clear()
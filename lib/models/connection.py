@@ -0,0 +1,193 @@
+# lib/models/connection.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from models.identity_map import close_journal, open_journal
+from models.instrumentation import INSTRUMENTATION
+
+
+# PRAGMA settings applied to every new connection, by profile name
+PROFILES = {
+    # SQLite's own defaults: rollback journal, full sync, small page cache
+    "default": {},
+    # WAL lets readers and a writer proceed concurrently; NORMAL sync is still
+    # crash-safe in WAL mode and only risks the last commits on power loss
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # For bulk loads and benchmarks: no fsync at all
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Full fsync on every commit, WAL for concurrency
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+
+
+class ConnectionManager:
+    """Hand out one sqlite3 connection per thread for a configurable database file.
+
+    Every call to execute() runs on a fresh cursor of the calling thread's
+    connection, so threads never share a cursor and reads can run concurrently.
+    Connections run in autocommit mode; transactions are opened explicitly by
+    session() and insert_many().
+    """
+
+    def __init__(self, path, profile="default"):
+        if profile not in PROFILES:
+            raise ValueError(f"Profile must be one of: {', '.join(PROFILES)}")
+        self.path = path
+        self.profile = profile
+        self._local = threading.local()
+        self._connections = set()
+        self._lock = threading.Lock()
+        # Called to drop in-memory state derived from the database when it may be
+        # stale: after a session is rolled back or the database is switched
+        self.reset_hooks = []
+
+    def __repr__(self):
+        return f"ConnectionManager(path={self.path!r}, profile={self.profile!r}, open_connections={len(self._connections)})"
+
+    def configure(self, path=None, profile=None):
+        """Switch database file and/or performance profile, closing every open connection"""
+        if profile is not None and profile not in PROFILES:
+            raise ValueError(f"Profile must be one of: {', '.join(PROFILES)}")
+        self.close_all()
+        if path is not None:
+            self.path = path
+            for hook in self.reset_hooks:
+                hook()
+        if profile is not None:
+            self.profile = profile
+
+    def connect(self):
+        """Open a new connection to the configured database"""
+        # Each connection is only used by the thread that opened it; the flag is
+        # relaxed so close_all() can close connections of other threads.
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        for pragma, value in PROFILES[self.profile].items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    @property
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.add(conn)
+        return conn
+
+    def execute(self, sql, params=()):
+        """Execute a statement on a new cursor and return that cursor"""
+        if INSTRUMENTATION.active:
+            return INSTRUMENTATION.execute(self.connection.execute, sql, params)
+        return self.connection.execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        """Execute a statement once per parameter tuple on a new cursor and return it"""
+        if INSTRUMENTATION.active:
+            return INSTRUMENTATION.execute(self.connection.executemany, sql, seq_of_params)
+        return self.connection.executemany(sql, seq_of_params)
+
+    def insert_many(self, table, columns, rows):
+        """Insert rows with executemany in one transaction and return their new ids, in order.
+
+        executemany does not report a rowid per row, so ids are assigned explicitly
+        after the current maximum while the transaction holds the write lock.
+        """
+        rows = list(rows)
+        sql = f"INSERT INTO {table} (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})"
+        with self.session():
+            first_id = self.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+            self.executemany(sql, ((first_id + offset, *row) for offset, row in enumerate(rows)))
+        return list(range(first_id, first_id + len(rows)))
+
+    @property
+    def in_session(self):
+        return getattr(self._local, "depth", 0) > 0
+
+    @contextmanager
+    def session(self):
+        """Run the enclosed statements of every model as one unit of work.
+
+        Commits requested by save/update/delete inside the block are deferred
+        until the outermost session exits. Nested sessions become savepoints, and
+        an exception rolls back to the start of the innermost session. Instances
+        created in a rolled back session are dropped from the identity maps and
+        get their id reset to None.
+        """
+        conn = self.connection
+        depth = getattr(self._local, "depth", 0)
+        savepoint = f"session_{depth}"
+        conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+        self._local.depth = depth + 1
+        open_journal()
+        try:
+            yield self
+            conn.execute("COMMIT" if depth == 0 else f"RELEASE {savepoint}")
+        except BaseException:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            close_journal(rolled_back=True)
+            for hook in self.reset_hooks:
+                hook()
+            raise
+        else:
+            close_journal(rolled_back=False)
+        finally:
+            self._local.depth = depth
+
+    def commit(self):
+        """Commit the current transaction, unless a session is deferring commits"""
+        if not self.in_session:
+            self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def close_all(self):
+        """Close the connections of every thread"""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+DB = ConnectionManager(
+    os.environ.get("HOSPITAL_DB", "hospital.db"),
+    os.environ.get("HOSPITAL_DB_PROFILE", "default")
+)
@@ -1,49 +1,92 @@
 # lib/models/doctor.py
-from models.__init__ import CURSOR, CONN
+from models.__init__ import DB, create_indexes
+from models.identity_map import IdentityMap
+from models.aio import run_in_worker
+from models.fields import NonEmptyString
+from models.schedule import SCHEDULE
+from models.availability import AVAILABILITY
 from models.medical_record import MedicalRecord
 from models.appointment import Appointment
+from models.name_search import DOCTOR_NAMES
 
 class Doctor:
     
-    all = {}
+    __slots__ = ("id", "_name", "_specialization", "_appointments", "_medical_records", "__weakref__")
+    
+    all = IdentityMap()
+    
+    name = NonEmptyString("Name must be a non-empty string")
+    specialization = NonEmptyString("Specialization must be a non-empty string")
     
     def __init__(self, name, specialization, id=None):
         self.id = id
         self.name = name
         self.specialization = specialization
-        self.appointments = []
-        self.medical_records = []
+        self._appointments = None
+        self._medical_records = None
 
     def __repr__(self):
         return (
             f"Doctor(id={self.id}, name={self.name}, specialization={self.specialization}, appointments={self.appointments}, medical_records={self.medical_records})"
         )
-    
+            
     @property
-    def name(self):
-        return self._name
+    def appointments(self):
+        """Return the appointments of this Doctor, querying them on first access"""
+        if self._appointments is None:
+            if self.id is None:
+                return []
+            self._appointments = Appointment.find_by_doctor_id(self.id)
+        return self._appointments
+    
+    @appointments.setter
+    def appointments(self, appointments):
+        # None discards the cached list so the next access queries again
+        self._appointments = appointments
     
-    @name.setter
-    def name(self, name):
-        if isinstance(name, str) and len(name) > 0:
-            self._name = name
-        else:
-            raise ValueError("Name must be a non-empty string")
-
     @property
-    def specialization(self):
-        return self._specialization
+    def medical_records(self):
+        """Return the medical records of this Doctor, querying them on first access"""
+        if self._medical_records is None:
+            if self.id is None:
+                return []
+            self._medical_records = MedicalRecord.find_by_doctor_id(self.id)
+        return self._medical_records
+    
+    @medical_records.setter
+    def medical_records(self, medical_records):
+        # None discards the cached list so the next access queries again
+        self._medical_records = medical_records
+    
+    def is_free(self, start, end):
+        """Return True if this Doctor has no appointment overlapping the [start, end) interval"""
+        return SCHEDULE.is_free(self.id, start, end)
+    
+    @classmethod
+    def next_available(cls, specialization, duration=30, after=None, count=5, days=7):
+        """Return up to count (Doctor, start) pairs for the earliest free slots of any doctor with the specialization"""
+        sql = "SELECT id FROM doctors WHERE specialization = ?"
+        doctor_ids = [row[0] for row in DB.execute(sql, (specialization,))]
+        slots = AVAILABILITY.free_slots(doctor_ids, duration, after, count, days)
+        return [(cls.find_by_id(doctor_id), start) for start, doctor_id in slots]
+    
+    @classmethod
+    def reset_relation(cls, id, relation):
+        """Discard the cached relation list of the Doctor with the given id, if it is loaded"""
+        doctor = cls.all.peek(id)
+        if doctor:
+            setattr(doctor, relation, None)
+    
+    @classmethod
+    def reset_all_relations(cls):
+        """Discard the cached relation lists of every loaded Doctor"""
+        for doctor in cls.all.values():
+            doctor.appointments = None
+            doctor.medical_records = None
     
-    @specialization.setter
-    def specialization(self, specialization):
-        if isinstance(specialization, str) and len(specialization) > 0:
-            self._specialization = specialization
-        else:
-            raise ValueError("Specialization must be a non-empty string")
-            
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of Doctor instances"""
+        """Create a new table, and its indexes, to persist the attributes of Doctor instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS doctors (
                 id INTEGER PRIMARY KEY,
@@ -51,15 +94,18 @@ class Doctor:
                 specialization TEXT NOT NULL
             )
         """
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        create_indexes("doctors")
+        DB.commit()
     
     @classmethod
     def drop_table(cls):
         """Drop the table that persists the attributes of Doctor instances"""
         sql = "DROP TABLE IF EXISTS doctors"
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        DB.execute(f"DROP TABLE IF EXISTS {DOCTOR_NAMES.keys_table}")
+        DB.execute(f"DROP TABLE IF EXISTS {DOCTOR_NAMES.trigrams_table}")
+        DB.commit()
     
     def save(self):
         """Persist the attributes of a Doctor instance to the database"""
@@ -67,9 +113,11 @@ class Doctor:
             INSERT INTO doctors (name, specialization)
             VALUES (?, ?)
         """
-        CURSOR.execute(sql, (self.name, self.specialization))
-        CONN.commit()
-        self.id = CURSOR.lastrowid
+        with DB.session():
+            cursor = DB.execute(sql, (self.name, self.specialization))
+            DOCTOR_NAMES.add(cursor.lastrowid, self.name)
+        self.id = cursor.lastrowid
+        type(self).all.add_new(self.id, self)
     
     def update(self):
         """Update the table row corresponding to the current Doctor instance"""
@@ -78,14 +126,17 @@ class Doctor:
             SET name = ?, specialization = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.name, self.specialization, self.id))
-        CONN.commit()
+        with DB.session():
+            DB.execute(sql, (self.name, self.specialization, self.id))
+            DOCTOR_NAMES.replace(self.id, self.name)
     
     def delete(self):
         """Delete the table row corresponding to the current Doctor instance"""
         sql = "DELETE FROM doctors WHERE id = ?"
-        CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        with DB.session():
+            DB.execute(sql, (self.id,))
+            DOCTOR_NAMES.remove(self.id)
+        type(self).all.pop(self.id)
     
     @classmethod
     def create(cls, name, specialization):
@@ -95,43 +146,192 @@ class Doctor:
         return doctor
     
     @classmethod
-    def instance_from_db(cls, row):
-        """Return a Doctor object having the attribute values from the table row."""
-        
-        doctor = cls.all.get(row[0])
-        if doctor:
-            doctor.name = row[1]
-            doctor.specialization = row[2]
-        else:
-            doctor = cls(row[1], row[2], id=row[0])
-            cls.all[row[0]] = doctor
+    def create_many(cls, rows, validated=False):
+        """Create Doctor instances from (name, specialization) tuples in a single transaction.
+
+        Pass validated=True for rows already cleaned by the fields, as the
+        importer's workers do; their values are then not validated again.
+        """
+        build = cls._trusted if validated else cls
+        doctors = [build(*row) for row in rows]
+        with DB.session():
+            ids = DB.insert_many(
+                "doctors",
+                ("name", "specialization"),
+                [(doctor.name, doctor.specialization) for doctor in doctors]
+            )
+            DOCTOR_NAMES.add_many(zip(ids, (doctor.name for doctor in doctors)))
+        for doctor, id in zip(doctors, ids):
+            doctor.id = id
+            cls.all.add_new(id, doctor)
+        return doctors
     
-        doctor.appointments = Appointment.find_by_doctor_id(doctor.id)
-        doctor.medical_records = MedicalRecord.find_by_doctor_id(doctor.id)
-        
+    @classmethod
+    def _unloaded(cls, id):
+        """Return a Doctor for id whose column attributes instance_from_db has yet to set"""
+        doctor = cls.__new__(cls)
+        doctor.id = id
+        doctor._appointments = None
+        doctor._medical_records = None
         return doctor
     
+    @classmethod
+    def _trusted(cls, name, specialization):
+        """Return a new, unsaved Doctor from values the fields have already cleaned, without validating them again"""
+        doctor = cls._unloaded(None)
+        doctor._name = name
+        doctor._specialization = specialization
+        return doctor
+    
+    @classmethod
+    def instance_from_db(cls, row):
+        """Return a Doctor object having the attribute values from the table row.
+
+        Rows come from our own validated table, so they are written straight
+        into the slots without running the field validators.
+        """
+        doctor = cls.all.get_or_add(row[0], cls._unloaded)
+        doctor._name = row[1]
+        doctor._specialization = row[2]
+        return doctor
+    
+    @classmethod
+    def attach_relations(cls, doctors, appointments, medical_records):
+        """Group the given related rows by doctor_id and assign them to the matching doctors"""
+        doctors_by_id = {doctor.id: doctor for doctor in doctors}
+        for doctor in doctors:
+            doctor.appointments = []
+            doctor.medical_records = []
+        for appointment in appointments:
+            doctor = doctors_by_id.get(appointment.doctor_id)
+            if doctor:
+                doctor.appointments.append(appointment)
+        for medical_record in medical_records:
+            doctor = doctors_by_id.get(medical_record.doctor_id)
+            if doctor:
+                doctor.medical_records.append(medical_record)
+        return doctors
+    
+    @classmethod
+    def load_relations(cls, doctors):
+        """Eagerly load appointments and medical records for a list of Doctor instances"""
+        doctor_ids = [doctor.id for doctor in doctors]
+        return cls.attach_relations(
+            doctors,
+            Appointment.find_by_doctor_ids(doctor_ids),
+            MedicalRecord.find_by_doctor_ids(doctor_ids)
+        )
+    
     @classmethod
     def get_all(cls):
-        """Return a list of all Doctor instances persisted to the database"""
+        """Return a list of all Doctor instances persisted to the database.
+
+        Related rows are loaded with one query per table instead of two per doctor.
+        """
         sql = "SELECT * FROM doctors"
-        CURSOR.execute(sql)
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql).fetchall()
+        doctors = [cls.instance_from_db(row) for row in rows]
+        return cls.attach_relations(doctors, Appointment.get_all(), MedicalRecord.get_all())
+    
+    @classmethod
+    def iter_all(cls, batch_size=500):
+        """Yield every Doctor instance, fetching rows from the database batch_size at a time"""
+        sql = "SELECT * FROM doctors ORDER BY id"
+        cursor = DB.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield cls.instance_from_db(row)
+    
+    @classmethod
+    def page(cls, after_id=0, limit=50):
+        """Return up to limit Doctor instances with an id greater than after_id, in id order"""
+        sql = "SELECT * FROM doctors WHERE id > ? ORDER BY id LIMIT ?"
+        rows = DB.execute(sql, (after_id, limit)).fetchall()
         return [cls.instance_from_db(row) for row in rows]
     
     @classmethod
     def find_by_id(cls, id):
         """Return the Doctor instance with the given primary key"""
         sql = "SELECT * FROM doctors WHERE id = ?"
-        row = CURSOR.execute(sql, (id,)).fetchone()
+        row = DB.execute(sql, (id,)).fetchone()
         return cls.instance_from_db(row) if row else None
     
     @classmethod
     def find_by_name(cls, name):
         """Return a list of Doctor instances with the given name"""
         sql = "SELECT * FROM doctors WHERE name = ?"
-        row = CURSOR.execute(sql, (name,)).fetchone()
+        row = DB.execute(sql, (name,)).fetchone()
         return cls.instance_from_db(row) if row else None
+    
+    @classmethod
+    def search_by_name(cls, query, limit=10, fuzzy=True):
+        """Return up to limit Doctor instances matching a partial or misspelt name, best first.
+
+        Names with a word starting with every word of the query come first; when
+        fuzzy is true the rest of the list is filled with the most similar names,
+        scored word by word so that a typo only costs the word it is in.
+        """
+        ids = DOCTOR_NAMES.prefix(query, limit)
+        if fuzzy and len(ids) < limit:
+            ids += [id for id, _ in DOCTOR_NAMES.fuzzy(query, limit) if id not in ids][:limit - len(ids)]
+        return [doctor for doctor in (cls.find_by_id(id) for id in ids) if doctor]
+    
+    async def asave(self):
+        """Async counterpart of save, run on the database worker pool"""
+        await run_in_worker(self.save)
+    
+    async def aupdate(self):
+        """Async counterpart of update, run on the database worker pool"""
+        await run_in_worker(self.update)
+    
+    async def adelete(self):
+        """Async counterpart of delete, run on the database worker pool"""
+        await run_in_worker(self.delete)
+    
+    @classmethod
+    async def afind_by_id(cls, id):
+        """Async counterpart of find_by_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_id, id)
+    
+    @classmethod
+    async def afind_by_name(cls, name):
+        """Async counterpart of find_by_name, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_name, name)
+    
+    @classmethod
+    async def asearch_by_name(cls, query, limit=10, fuzzy=True):
+        """Async counterpart of search_by_name, run on the database worker pool"""
+        return await run_in_worker(cls.search_by_name, query, limit, fuzzy)
+    
+    @classmethod
+    async def aget_all(cls):
+        """Async counterpart of get_all, run on the database worker pool"""
+        return await run_in_worker(cls.get_all)
+    
+    @classmethod
+    async def apage(cls, after_id=0, limit=50):
+        """Async counterpart of page, run on the database worker pool"""
+        return await run_in_worker(cls.page, after_id, limit)
+    
+    @classmethod
+    async def acreate(cls, name, specialization):
+        """Async counterpart of create, run on the database worker pool"""
+        return await run_in_worker(cls.create, name, specialization)
+    
+    @classmethod
+    async def acreate_many(cls, rows, validated=False):
+        """Async counterpart of create_many, run on the database worker pool"""
+        return await run_in_worker(cls.create_many, rows, validated)
+    
+    @classmethod
+    async def aload_relations(cls, doctors):
+        """Async counterpart of load_relations, run on the database worker pool"""
+        return await run_in_worker(cls.load_relations, doctors)
+
+DB.reset_hooks.append(Doctor.reset_all_relations)
 
 def manage_doctors():
     """Function to manage doctor-related operations from the CLI"""
@@ -141,7 +341,8 @@ def manage_doctors():
         print("2. View Doctors")
         print("3. Update Doctor")
         print("4. Delete Doctor")
-        print("5. Back to Main Menu")
+        print("5. Search Doctors by Name")
+        print("6. Back to Main Menu")
         choice = input("Enter your choice: ")
         
         if choice == '1':
@@ -150,9 +351,13 @@ def manage_doctors():
             Doctor.create(name, specialization)
             print(f"Doctor {name} added successfully.")
         elif choice == '2':
-            doctors = Doctor.get_all()
-            for doctor in doctors:
-                print(doctor)
+            from helpers import page_through
+            shown = page_through(
+                Doctor.page,
+                lambda doctor: print(f"ID: {doctor.id}, Name: {doctor.name}, Specialization: {doctor.specialization}")
+            )
+            if not shown:
+                print("No doctors found.")
         elif choice == '3':
             id = int(input("Enter doctor's ID to update: "))
             doctor = Doctor.find_by_id(id)
@@ -172,6 +377,12 @@ def manage_doctors():
             else:
                 print("Doctor not found.")
         elif choice == '5':
+            doctors = Doctor.search_by_name(input("Enter part of the doctor's name: "))
+            for doctor in doctors:
+                print(f"ID: {doctor.id}, Name: {doctor.name}, Specialization: {doctor.specialization}")
+            if not doctors:
+                print("No matching doctors found.")
+        elif choice == '6':
             break
         else:
             print("Invalid choice. Please try again.")
@@ -0,0 +1,85 @@
+# lib/models/export.py
+import csv
+import gzip
+import json
+import os
+from functools import partial
+
+from models.__init__ import DB
+
+TABLES = ("patients", "doctors", "appointments", "medical_records")
+FORMATS = ("csv", "jsonl")
+# gzip's default level 9 is several times slower than 6 for a few percent smaller files
+GZIP_LEVEL = 6
+
+
+def export_table(table, path, format=None, after_id=0, chunk_size=10000):
+    """Write the rows of table with an id greater than after_id to path, in id order.
+
+    The format is "csv" or "jsonl", taken from the file extension when not
+    given; a ".gz" suffix gzips the output. Rows are streamed from one cursor,
+    chunk_size at a time, so memory use does not depend on the table size and
+    the file is a consistent snapshot. The file is written under a temporary
+    name and renamed when complete. Returns (rows written, highest id written),
+    the watermark to pass as after_id next time (after_id itself if no rows).
+    """
+    if table not in TABLES:
+        raise ValueError(f"Table must be one of {', '.join(TABLES)}")
+    compress = path.endswith(".gz")
+    format = format or os.path.splitext(path[:-3] if compress else path)[1].lstrip(".")
+    if format not in FORMATS:
+        raise ValueError(f"Format must be one of {', '.join(FORMATS)}")
+
+    cursor = DB.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (after_id,))
+    columns = [column[0] for column in cursor.description]
+    rows, last_id = 0, after_id
+    temporary = f"{path}.tmp"
+    open_file = partial(gzip.open, compresslevel=GZIP_LEVEL) if compress else open
+    try:
+        with open_file(temporary, "wt", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file) if format == "csv" else None
+            if writer:
+                writer.writerow(columns)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                if writer:
+                    writer.writerows(chunk)
+                else:
+                    file.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in chunk)
+                rows += len(chunk)
+                last_id = chunk[-1][0]
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    finally:
+        cursor.close()
+    return rows, last_id
+
+
+def export_tables(directory, tables=TABLES, format="csv", compress=False, watermark_path=None, chunk_size=10000):
+    """Export each table to directory/<table>.<format>[.gz] and return {table: (rows, last_id)}.
+
+    With watermark_path, only rows added since the last export are written:
+    the file holds the highest exported id per table as JSON, and is updated
+    once every table has been written.
+    """
+    watermarks = {}
+    if watermark_path and os.path.exists(watermark_path):
+        with open(watermark_path) as file:
+            watermarks = json.load(file)
+    os.makedirs(directory, exist_ok=True)
+    results = {}
+    for table in tables:
+        path = os.path.join(directory, f"{table}.{format}{'.gz' if compress else ''}")
+        results[table] = export_table(table, path, format, watermarks.get(table, 0), chunk_size)
+    if watermark_path:
+        watermarks.update({table: last_id for table, (rows, last_id) in results.items()})
+        temporary = f"{watermark_path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(watermarks, file, indent=2)
+        os.replace(temporary, watermark_path)
+    return results
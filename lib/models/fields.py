@@ -0,0 +1,84 @@
+# lib/models/fields.py
+from models.schedule import canonical_appointment_date, canonical_record_date
+
+
+class Field:
+    """A validated model attribute, stored in the slot `_<name>` declared by the model's __slots__.
+
+    Assigning to the attribute runs clean(), which raises ValueError with the
+    field's message and returns the value to store. instance_from_db writes
+    rows read back from the database straight into the slots, so trusted data
+    skips validation.
+    """
+
+    def __init__(self, message=None):
+        self.message = message
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        # The member descriptor __slots__ created for the backing slot
+        self.slot = owner.__dict__[f"_{name}"]
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return self.slot.__get__(instance, owner)
+
+    def __set__(self, instance, value):
+        self.slot.__set__(instance, self.clean(value))
+
+    def clean(self, value):
+        """Validate value and return it in its stored form"""
+        self.validate(value)
+        return value
+
+    def validate(self, value):
+        pass
+
+
+class NonEmptyString(Field):
+    def validate(self, value):
+        if not (isinstance(value, str) and len(value) > 0):
+            raise ValueError(self.message)
+
+
+class OptionalString(Field):
+    def validate(self, value):
+        if not (value is None or isinstance(value, str)):
+            raise ValueError(self.message)
+
+
+class PositiveInteger(Field):
+    def validate(self, value):
+        if not (isinstance(value, int) and value > 0):
+            raise ValueError(self.message)
+
+
+class OneOf(Field):
+    def __init__(self, choices, message=None):
+        super().__init__(message)
+        self.choices = frozenset(choices)
+
+    def validate(self, value):
+        if not (isinstance(value, str) and value in self.choices):
+            raise ValueError(self.message)
+
+
+class AppointmentDate(Field):
+    """A date and time, stored as "YYYY-MM-DD HH:MM" whatever form it was given in"""
+
+    def clean(self, value):
+        try:
+            return canonical_appointment_date(value)
+        except ValueError:
+            raise ValueError(self.message) from None
+
+
+class RecordDate(Field):
+    """A date, stored as "YYYY-MM-DD" whatever form it was given in"""
+
+    def clean(self, value):
+        try:
+            return canonical_record_date(value)
+        except ValueError:
+            raise ValueError(self.message) from None
@@ -0,0 +1,170 @@
+# lib/models/identity_map.py
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+# Per thread, one list per open session of the (map, id, instance) entries
+# added by add_new(), so that a rolled back session can take them back
+_journal = threading.local()
+
+
+def open_journal():
+    """Start recording the instances created by the calling thread; called when a session opens"""
+    _journal.__dict__.setdefault("stack", []).append([])
+
+
+def close_journal(rolled_back):
+    """Stop recording for the innermost session of the calling thread.
+
+    When it was rolled back, the instances it created are removed from their
+    maps and their id is reset to None, since their rows no longer exist and
+    the ids will be handed out again. Otherwise they are handed to the
+    enclosing session, which may still roll them back.
+    """
+    stack = _journal.stack
+    created = stack.pop()
+    if not rolled_back:
+        if stack:
+            stack[-1].extend(created)
+        return
+    for identity_map, id, instance in reversed(created):
+        if identity_map.peek(id) is instance:
+            identity_map.pop(id)
+        if instance.id == id:
+            instance.id = None
+
+
+class IdentityMap:
+    """Map primary keys to model instances with a bounded memory footprint.
+
+    The `maxsize` most recently used instances are held by strong references and
+    evicted in LRU order. Every instance is also tracked through a weak reference,
+    so an evicted instance that is still in use elsewhere keeps being returned for
+    its id and stays unique. Only instances nobody references any more - which
+    therefore cannot carry unsaved changes - are actually dropped.
+    """
+
+    DEFAULT_MAXSIZE = int(os.environ.get("HOSPITAL_IDENTITY_MAP_SIZE", 10000))
+
+    def __init__(self, maxsize=None):
+        self.maxsize = self.DEFAULT_MAXSIZE if maxsize is None else maxsize
+        self._recent = OrderedDict()
+        # id -> weakref.ref; dead references are swept out as the dict grows,
+        # which is much cheaper per insert than WeakValueDictionary's callbacks
+        self._refs = {}
+        self._sweep_at = 1024
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f"IdentityMap(size={len(self)}, maxsize={self.maxsize}, {self.stats()})"
+
+    def __len__(self):
+        return len(self.values())
+
+    def __contains__(self, id):
+        return self.peek(id) is not None
+
+    def __getitem__(self, id):
+        instance = self.get(id)
+        if instance is None:
+            raise KeyError(id)
+        return instance
+
+    def __setitem__(self, id, instance):
+        with self._lock:
+            self._refs[id] = weakref.ref(instance)
+            if len(self._refs) > self._sweep_at:
+                self._sweep()
+            self._touch(id, instance)
+
+    def add_new(self, id, instance):
+        """Map id to the instance of a row just inserted, so that a rolled back session can undo it"""
+        self[id] = instance
+        stack = getattr(_journal, "stack", None)
+        if stack:
+            stack[-1].append((self, id, instance))
+
+    def __delitem__(self, id):
+        if self.pop(id) is None:
+            raise KeyError(id)
+
+    def get(self, id, default=None):
+        """Return the instance for id, marking it as recently used"""
+        with self._lock:
+            instance = self.peek(id)
+            if instance is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._touch(id, instance)
+            return instance
+
+    def get_or_add(self, id, factory):
+        """Return the instance for id, adding factory(id) first if there is none.
+
+        Looking up and adding happen under one lock, so threads hydrating the
+        same row at once all get the same instance.
+        """
+        with self._lock:
+            instance = self.peek(id)
+            if instance is None:
+                self.misses += 1
+                instance = factory(id)
+                self[id] = instance
+            else:
+                self.hits += 1
+                self._touch(id, instance)
+            return instance
+
+    def peek(self, id, default=None):
+        """Return the instance for id without touching the LRU order or counters"""
+        ref = self._refs.get(id)
+        instance = ref() if ref is not None else None
+        return default if instance is None else instance
+
+    def pop(self, id, default=None):
+        """Remove and return the instance for id"""
+        with self._lock:
+            self._recent.pop(id, None)
+            ref = self._refs.pop(id, None)
+            instance = ref() if ref is not None else None
+            return default if instance is None else instance
+
+    def values(self):
+        """Return a list of the instances currently in the map"""
+        instances = (ref() for ref in list(self._refs.values()))
+        return [instance for instance in instances if instance is not None]
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._refs.clear()
+
+    def resize(self, maxsize):
+        """Change the number of strongly held instances, evicting as needed"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def stats(self):
+        """Return the hit, miss and eviction counters"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _sweep(self):
+        """Drop the references of instances that no longer exist"""
+        self._refs = {id: ref for id, ref in self._refs.items() if ref() is not None}
+        self._sweep_at = max(2 * len(self._refs), 1024)
+
+    def _touch(self, id, instance):
+        self._recent[id] = instance
+        self._recent.move_to_end(id)
+        self._evict()
+
+    def _evict(self):
+        while len(self._recent) > self.maxsize:
+            self._recent.popitem(last=False)
+            self.evictions += 1
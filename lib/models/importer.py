@@ -0,0 +1,165 @@
+# lib/models/importer.py
+import csv
+import gzip
+import importlib
+import json
+import os
+import sqlite3
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from models.fields import OptionalString, PositiveInteger
+
+# table -> (module, model class, columns in create_many order, defaults of optional columns)
+MODELS = {
+    "patients": ("models.patient", "Patient", ("first_name", "last_name", "age", "gender"), {}),
+    "doctors": ("models.doctor", "Doctor", ("name", "specialization"), {}),
+    "appointments": (
+        "models.appointment", "Appointment",
+        ("appointment_date", "patient_id", "doctor_id", "notes", "duration"), {"notes": None, "duration": 30},
+    ),
+    "medical_records": (
+        "models.medical_record", "MedicalRecord",
+        ("patient_id", "doctor_id", "record_date", "diagnosis", "treatment"), {},
+    ),
+}
+
+ImportResult = namedtuple("ImportResult", ["rows", "imported", "rejected", "seconds"])
+
+
+def import_file(table, path, errors_path=None, workers=None, batch_size=5000):
+    """Import the rows of a CSV or JSONL file (optionally .gz) into table and return an ImportResult.
+
+    Rows are validated by worker processes with the model's field rules, then
+    the valid ones are inserted by this process through the model's
+    create_many(validated=True), batch_size rows per transaction, so they are
+    not validated a second time. Rejected rows - invalid values, or
+    appointments that would double-book a doctor - are written to errors_path
+    as JSON lines with their line number and reason. workers=0 validates in
+    this process.
+    """
+    if table not in MODELS:
+        raise ValueError(f"Table must be one of {', '.join(MODELS)}")
+    model = _model(table)
+    workers = os.cpu_count() if workers is None else workers
+    start = time.perf_counter()
+    imported = rejected = 0
+    errors = open(errors_path, "w", encoding="utf-8") if errors_path else None
+    pool = ProcessPoolExecutor(workers) if workers > 0 else None
+    pending = deque()
+    try:
+        for records in _chunks(path, batch_size):
+            if pool:
+                pending.append(pool.submit(validate_chunk, table, records))
+                # Keep a bounded number of chunks in flight so memory stays flat
+                if len(pending) <= 2 * workers:
+                    continue
+                valid, invalid = pending.popleft().result()
+            else:
+                valid, invalid = validate_chunk(table, records)
+            written, refused = _write(table, model, valid, invalid, errors)
+            imported, rejected = imported + written, rejected + refused
+        while pending:
+            written, refused = _write(table, model, *pending.popleft().result(), errors)
+            imported, rejected = imported + written, rejected + refused
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        if errors:
+            errors.close()
+    return ImportResult(imported + rejected, imported, rejected, time.perf_counter() - start)
+
+
+def validate_chunk(table, records):
+    """Return ([(line, row tuple)], [(line, record, error)]) for a chunk of (line, record) pairs"""
+    module, name, columns, defaults = MODELS[table]
+    model = _model(table)
+    fields = [model.__dict__[column] for column in columns]
+    valid, invalid = [], []
+    for line, record in records:
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            if not isinstance(record, dict):
+                raise ValueError("Each line must be a JSON object")
+            values = []
+            for column, field in zip(columns, fields):
+                if column in record:
+                    value = _coerce(field, record[column])
+                elif column in defaults:
+                    value = defaults[column]
+                else:
+                    raise ValueError(f"Missing column {column}")
+                values.append(field.clean(value))
+            valid.append((line, tuple(values)))
+        except (TypeError, ValueError) as error:
+            invalid.append((line, record, str(error)))
+    return valid, invalid
+
+
+def _coerce(field, value):
+    # CSV values are all strings; convert them to the types the fields expect
+    if isinstance(field, PositiveInteger) and isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if isinstance(field, OptionalString) and value == "":
+        return None
+    return value
+
+
+def _model(table):
+    module, name, columns, defaults = MODELS[table]
+    return getattr(importlib.import_module(module), name)
+
+
+def _chunks(path, size):
+    """Yield lists of up to size (line number, record) pairs from a CSV or JSONL file.
+
+    CSV records are dicts; JSONL records are the unparsed lines.
+    """
+    compress = path.endswith(".gz")
+    extension = os.path.splitext(path[:-3] if compress else path)[1]
+    if extension not in (".csv", ".jsonl"):
+        raise ValueError("Import files must be .csv or .jsonl, optionally gzipped")
+    with (gzip.open if compress else open)(path, "rt", encoding="utf-8", newline="") as file:
+        if extension == ".csv":
+            reader = csv.DictReader(file)
+            records = ((reader.line_num, record) for record in reader)
+        else:
+            # JSON lines are parsed by the workers, as part of validation
+            records = ((line, text) for line, text in enumerate(file, 1) if text.strip())
+        chunk = []
+        for line_record in records:
+            chunk.append(line_record)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _write(table, model, valid, invalid, errors):
+    """Insert a validated chunk in one transaction and record rejected rows; return (imported, rejected)"""
+    rejected = list(invalid)
+    if valid:
+        try:
+            model.create_many([row for line, row in valid], validated=True)
+            imported = len(valid)
+        except (ValueError, sqlite3.IntegrityError):
+            # Some row conflicts with the stored data; insert one at a time to isolate it
+            imported = 0
+            for line, row in valid:
+                try:
+                    model.create_many([row], validated=True)
+                    imported += 1
+                except (ValueError, sqlite3.IntegrityError) as error:
+                    rejected.append((line, dict(zip(MODELS[table][2], row)), str(error)))
+    else:
+        imported = 0
+    if errors:
+        for line, record, error in sorted(rejected, key=lambda rejection: rejection[0]):
+            errors.write(json.dumps({"line": line, "error": error, "row": record}, default=str) + "\n")
+    return imported, len(rejected)
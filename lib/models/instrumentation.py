@@ -0,0 +1,244 @@
+# lib/models/instrumentation.py
+import logging
+import os
+import sys
+import threading
+import time
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+
+
+class NPlusOneWarning(UserWarning):
+    """The same parameterized statement ran more times in one tracked operation than allowed"""
+
+
+class QueryRecord:
+    """One executed statement: its SQL, where it was issued from, how long it took and how many rows it returned"""
+
+    __slots__ = ("sql", "call_site", "seconds", "rows", "_logged")
+
+    def __init__(self, sql, call_site, seconds, rows=0):
+        self.sql = sql
+        self.call_site = call_site
+        self.seconds = seconds
+        self.rows = rows
+        self._logged = False
+
+    def __repr__(self):
+        return f"QueryRecord(sql={self.sql!r}, call_site={self.call_site!r}, ms={self.seconds * 1000:.3f}, rows={self.rows})"
+
+
+class OperationReport:
+    """The statements run while an operation was tracked, with per-statement totals"""
+
+    def __init__(self, name, n_plus_one=10):
+        self.name = name
+        self.n_plus_one = n_plus_one
+        self.queries = []
+        self._counts = Counter()
+
+    def __repr__(self):
+        return f"OperationReport(name={self.name!r}, queries={self.count}, ms={self.seconds * 1000:.3f})"
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(record.seconds for record in self.queries)
+
+    @property
+    def rows(self):
+        return sum(record.rows for record in self.queries)
+
+    def add(self, record):
+        self.queries.append(record)
+        self._counts[record.sql] += 1
+        if self.n_plus_one is not None and self._counts[record.sql] == self.n_plus_one + 1:
+            warnings.warn(
+                f"{self.name}: statement ran more than {self.n_plus_one} times, from {record.call_site}: "
+                f"{_one_line(record.sql)}",
+                NPlusOneWarning,
+                # Point at the code calling DB.execute, past Instrumentation.execute and ConnectionManager.execute
+                stacklevel=4,
+            )
+
+    def statements(self):
+        """Return one dict per distinct statement - sql, count, seconds, rows, call_sites - slowest first"""
+        grouped = {}
+        for record in self.queries:
+            entry = grouped.setdefault(record.sql, {"sql": record.sql, "count": 0, "seconds": 0.0, "rows": 0, "call_sites": []})
+            entry["count"] += 1
+            entry["seconds"] += record.seconds
+            entry["rows"] += record.rows
+            if record.call_site not in entry["call_sites"]:
+                entry["call_sites"].append(record.call_site)
+        return sorted(grouped.values(), key=lambda entry: entry["seconds"], reverse=True)
+
+    def summary(self, top=10):
+        lines = [f"{self.name}: {self.count} queries, {self.rows} rows, {self.seconds * 1000:.2f} ms"]
+        for entry in self.statements()[:top]:
+            lines.append(
+                f"  {entry['count']:>5} x {entry['seconds'] * 1000:9.2f} ms {entry['rows']:>7} rows  "
+                f"{_one_line(entry['sql'])[:80]}  [{entry['call_sites'][0]}]"
+            )
+        return "\n".join(lines)
+
+
+class TimedCursor:
+    """Wrap a sqlite3 cursor so that fetching adds to its statement's time and row count.
+
+    The statement is checked against the slow-query log once its result is
+    done: fetched to the end, or dropped after being read in part.
+    """
+
+    def __init__(self, cursor, record, instrumentation):
+        self._cursor = cursor
+        self._record = record
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, row is not None, row is None)
+        if row is None:
+            raise StopIteration
+        return row
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self._cursor.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __del__(self):
+        # e.g. DB.execute(...).fetchone(), which never reads past its row
+        self._instrumentation.check_slow(self._record)
+
+    def _fetched(self, start, rows, done):
+        self._record.seconds += time.perf_counter() - start
+        self._record.rows += rows
+        if done:
+            self._instrumentation.check_slow(self._record)
+
+
+class Instrumentation:
+    """Time every statement run through ConnectionManager.execute/executemany while it is needed.
+
+    Statements are recorded while an operation is tracked on the calling thread,
+    and timed against slow_query_ms when the slow-query log is enabled. With
+    neither, execute() returns plain sqlite3 cursors and costs nothing extra.
+    """
+
+    def __init__(self, slow_query_ms=None):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log = logging.getLogger("hospital.slow_queries")
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"Instrumentation(slow_query_ms={self.slow_query_ms})"
+
+    @property
+    def active(self):
+        return self.slow_query_ms is not None or bool(getattr(self._local, "reports", None))
+
+    def log_slow_queries(self, slow_query_ms, path=None):
+        """Log statements slower than slow_query_ms (None to stop) to the hospital.slow_queries logger, and to path if given"""
+        self.slow_query_ms = slow_query_ms
+        if path:
+            handler = logging.FileHandler(path)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.slow_log.addHandler(handler)
+            self.slow_log.setLevel(logging.WARNING)
+
+    @contextmanager
+    def track(self, name="operation", n_plus_one=10):
+        """Record the statements run by the calling thread inside the block into an OperationReport.
+
+        Warns with NPlusOneWarning when one statement runs more than n_plus_one
+        times (None disables the check). Tracked blocks can be nested.
+        """
+        report = OperationReport(name, n_plus_one)
+        reports = getattr(self._local, "reports", None)
+        if reports is None:
+            reports = self._local.reports = []
+        reports.append(report)
+        try:
+            yield report
+        finally:
+            reports.remove(report)
+
+    def execute(self, run, sql, params):
+        """Run run(sql, params), record the statement and return its cursor, wrapped if it returns rows"""
+        start = time.perf_counter()
+        cursor = run(sql, params)
+        seconds = time.perf_counter() - start
+        # Rows returned are counted as they are fetched; for writes, count the rows changed
+        record = QueryRecord(sql, _call_site(), seconds, 0 if cursor.description else max(cursor.rowcount, 0))
+        for report in getattr(self._local, "reports", ()):
+            report.add(record)
+        if cursor.description:
+            # Checked by the cursor once the rows are fetched, so the log has their count
+            return TimedCursor(cursor, record, self)
+        self.check_slow(record)
+        return cursor
+
+    def check_slow(self, record):
+        """Log record to the slow-query log, once, if it took slow_query_ms or longer"""
+        if self.slow_query_ms is not None and not record._logged and record.seconds * 1000 >= self.slow_query_ms:
+            record._logged = True
+            self.slow_log.warning(
+                "slow query %.1f ms, %d rows, from %s: %s",
+                record.seconds * 1000, record.rows, record.call_site, _one_line(record.sql)
+            )
+
+
+# Frames in these files are skipped when looking for the code that issued a statement
+_INTERNAL_FILES = {__file__, os.path.join(os.path.dirname(__file__), "connection.py")}
+# Frames of the models package are skipped too, so the call site is the application code using
+# them; the first model frame is used when the models were called from no other code
+_MODELS_DIRECTORY = os.path.dirname(__file__) + os.sep
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame and frame.f_code.co_filename in _INTERNAL_FILES:
+        frame = frame.f_back
+    first_model_frame = frame
+    while frame and frame.f_code.co_filename.startswith(_MODELS_DIRECTORY):
+        frame = frame.f_back
+    frame = frame or first_model_frame
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def _one_line(sql):
+    return " ".join(sql.split())
+
+
+INSTRUMENTATION = Instrumentation()
+if os.environ.get("HOSPITAL_SLOW_QUERY_MS"):
+    INSTRUMENTATION.log_slow_queries(float(os.environ["HOSPITAL_SLOW_QUERY_MS"]), os.environ.get("HOSPITAL_SLOW_QUERY_LOG"))
+track_queries = INSTRUMENTATION.track
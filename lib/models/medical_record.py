@@ -1,14 +1,30 @@
 # lib/models/medical_record.py
-from models.__init__ import CONN, CURSOR
+import sqlite3
+
+from models.__init__ import DB, create_indexes, SQL_VARIABLE_LIMIT
+from models.identity_map import IdentityMap
+from models.aio import run_in_worker
+from models.fields import NonEmptyString, PositiveInteger, RecordDate
+from models.schedule import canonical_record_date
 
 class MedicalRecord:
     
-    all = {}
+    __slots__ = ("id", "_patient_id", "_doctor_id", "_record_date", "_diagnosis", "_treatment", "_persisted_owners", "__weakref__")
+    
+    all = IdentityMap()
+    
+    patient_id = PositiveInteger("Patient ID must be a positive integer")
+    doctor_id = PositiveInteger("Doctor ID must be a positive integer")
+    record_date = RecordDate("Record date must be in the format YYYY-MM-DD")
+    diagnosis = NonEmptyString("Diagnosis must be a non-empty string")
+    treatment = NonEmptyString("Treatment must be a non-empty string")
     
     def __init__(self, patient_id, doctor_id, record_date, diagnosis, treatment, id=None):
         self.id = id
         self.patient_id = patient_id
         self.doctor_id = doctor_id
+        # (patient_id, doctor_id) as last written to or read from the database
+        self._persisted_owners = None
         self.record_date = record_date
         self.diagnosis = diagnosis
         self.treatment = treatment
@@ -18,61 +34,9 @@ class MedicalRecord:
             f"MedicalRecord(id={self.id}, patient_id={self.patient_id}, doctor_id={self.doctor_id}, record_date={self.record_date}, diagnosis={self.diagnosis}, treatment={self.treatment})"
         )
     
-    @property
-    def diagnosis(self):
-        return self._diagnosis
-    
-    @diagnosis.setter
-    def diagnosis(self, diagnosis):
-        if isinstance(diagnosis, str) and len(diagnosis) > 0:
-            self._diagnosis = diagnosis
-        else:
-            raise ValueError("Diagnosis must be a non-empty string")
-
-    @property
-    def treatment(self):
-        return self._treatment
-    
-    @treatment.setter
-    def treatment(self, treatment):
-        if isinstance(treatment, str) and len(treatment) > 0:
-            self._treatment = treatment
-        else:
-            raise ValueError("Treatment must be a non-empty string")
-    
-    @property
-    def record_date(self):
-        return self._record_date
-    
-    @record_date.setter
-    def record_date(self, record_date):
-        self._record_date = record_date  # You might want to add more validation here
-    
-    @property
-    def patient_id(self):
-        return self._patient_id
-    
-    @patient_id.setter
-    def patient_id(self, patient_id):
-        if isinstance(patient_id, int) and patient_id > 0:
-            self._patient_id = patient_id
-        else:
-            raise ValueError("Patient ID must be a positive integer")
-    
-    @property
-    def doctor_id(self):
-        return self._doctor_id
-    
-    @doctor_id.setter
-    def doctor_id(self, doctor_id):
-        if isinstance(doctor_id, int) and doctor_id > 0:
-            self._doctor_id = doctor_id
-        else:
-            raise ValueError("Doctor ID must be a positive integer")
-    
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of MedicalRecord instances"""
+        """Create a new table, and its indexes, to persist the attributes of MedicalRecord instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS medical_records (
                 id INTEGER PRIMARY KEY,
@@ -85,15 +49,36 @@ class MedicalRecord:
                 FOREIGN KEY(doctor_id) REFERENCES doctors(id)
             )
         """
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        create_indexes("medical_records")
+        DB.commit()
     
     @classmethod
     def drop_table(cls):
-        """Drop the table that persists the attributes of MedicalRecord instances"""
+        """Drop the table that persists the attributes of MedicalRecord instances, its search index and workload summary"""
         sql = "DROP TABLE IF EXISTS medical_records"
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        DB.execute("DROP TABLE IF EXISTS medical_records_fts")
+        DB.execute("DROP TABLE IF EXISTS medical_record_workload")
+        DB.commit()
+    
+    @classmethod
+    def rebuild_search_index(cls):
+        """Re-index the diagnosis and treatment of every row for search()"""
+        DB.execute("INSERT INTO medical_records_fts (medical_records_fts) VALUES ('rebuild')")
+        DB.commit()
+    
+    def reset_owner_relations(self):
+        """Discard the cached medical_records lists of the patients and doctors this row belongs, or belonged, to"""
+        from models.patient import Patient
+        from models.doctor import Doctor
+        owners = {(self.patient_id, self.doctor_id)}
+        if self._persisted_owners:
+            owners.add(self._persisted_owners)
+        for patient_id, doctor_id in owners:
+            Patient.reset_relation(patient_id, "medical_records")
+            Doctor.reset_relation(doctor_id, "medical_records")
+        self._persisted_owners = (self.patient_id, self.doctor_id)
     
     def save(self):
         """Persist the attributes of a MedicalRecord instance to the database"""
@@ -101,9 +86,11 @@ class MedicalRecord:
             INSERT INTO medical_records (patient_id, doctor_id, record_date, diagnosis, treatment)
             VALUES (?, ?, ?, ?, ?)
         """
-        CURSOR.execute(sql, (self.patient_id, self.doctor_id, self.record_date, self.diagnosis, self.treatment))
-        CONN.commit()
-        self.id = CURSOR.lastrowid
+        cursor = DB.execute(sql, (self.patient_id, self.doctor_id, self.record_date, self.diagnosis, self.treatment))
+        DB.commit()
+        self.id = cursor.lastrowid
+        type(self).all.add_new(self.id, self)
+        self.reset_owner_relations()
     
     def update(self):
         """Update the table row corresponding to the current MedicalRecord instance"""
@@ -112,14 +99,17 @@ class MedicalRecord:
             SET patient_id = ?, doctor_id = ?, record_date = ?, diagnosis = ?, treatment = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.patient_id, self.doctor_id, self.record_date, self.diagnosis, self.treatment, self.id))
-        CONN.commit()
+        DB.execute(sql, (self.patient_id, self.doctor_id, self.record_date, self.diagnosis, self.treatment, self.id))
+        DB.commit()
+        self.reset_owner_relations()
     
     def delete(self):
         """Delete the table row corresponding to the current MedicalRecord instance"""
         sql = "DELETE FROM medical_records WHERE id = ?"
-        CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        DB.execute(sql, (self.id,))
+        DB.commit()
+        type(self).all.pop(self.id)
+        self.reset_owner_relations()
     
     @classmethod
     def create(cls, patient_id, doctor_id, record_date, diagnosis, treatment):
@@ -128,57 +118,231 @@ class MedicalRecord:
         medical_record.save()
         return medical_record
     
+    @classmethod
+    def create_many(cls, rows, validated=False):
+        """Create MedicalRecord instances from (patient_id, doctor_id, record_date, diagnosis, treatment) tuples in a single transaction.
+
+        Pass validated=True for rows already cleaned by the fields, as the
+        importer's workers do; their values are then not validated again.
+        """
+        build = cls._trusted if validated else cls
+        medical_records = [build(*row) for row in rows]
+        ids = DB.insert_many(
+            "medical_records",
+            ("patient_id", "doctor_id", "record_date", "diagnosis", "treatment"),
+            [(medical_record.patient_id, medical_record.doctor_id, medical_record.record_date, medical_record.diagnosis, medical_record.treatment) for medical_record in medical_records]
+        )
+        for medical_record, id in zip(medical_records, ids):
+            medical_record.id = id
+            cls.all.add_new(id, medical_record)
+            medical_record.reset_owner_relations()
+        return medical_records
+    
+    @classmethod
+    def _unloaded(cls, id):
+        """Return a MedicalRecord for id whose column attributes instance_from_db has yet to set"""
+        medical_record = cls.__new__(cls)
+        medical_record.id = id
+        return medical_record
+    
+    @classmethod
+    def _trusted(cls, patient_id, doctor_id, record_date, diagnosis, treatment):
+        """Return a new, unsaved MedicalRecord from values the fields have already cleaned, without validating them again"""
+        medical_record = cls._unloaded(None)
+        medical_record._patient_id = patient_id
+        medical_record._doctor_id = doctor_id
+        medical_record._record_date = record_date
+        medical_record._diagnosis = diagnosis
+        medical_record._treatment = treatment
+        medical_record._persisted_owners = None
+        return medical_record
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return a MedicalRecord object having the attribute values from the table row."""
-        
-        
-        medical_record = cls.all.get(row[0])
-        if medical_record:
-            
-            medical_record.patient_id = row[1]
-            medical_record.doctor_id = row[2]
-            medical_record.record_date = row[3]
-            medical_record.diagnosis = row[4]
-            medical_record.treatment = row[5]
-        else:
-            
-            medical_record = cls(row[1], row[2], row[3], row[4], row[5], id=row[0])
-            cls.all[row[0]] = medical_record
-        
+        """Return a MedicalRecord object having the attribute values from the table row.
+
+        Rows come from our own validated table, so they are written straight
+        into the slots without running the field validators.
+        """
+        medical_record = cls.all.get_or_add(row[0], cls._unloaded)
+        medical_record._patient_id = row[1]
+        medical_record._doctor_id = row[2]
+        medical_record._record_date = row[3]
+        medical_record._diagnosis = row[4]
+        medical_record._treatment = row[5]
+        medical_record._persisted_owners = (row[1], row[2])
         return medical_record
     
     @classmethod
     def get_all(cls):
         """Return a list of all MedicalRecord instances persisted to the database"""
         sql = "SELECT * FROM medical_records"
-        CURSOR.execute(sql)
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+    
+    @classmethod
+    def iter_all(cls, batch_size=500):
+        """Yield every MedicalRecord instance, fetching rows from the database batch_size at a time"""
+        sql = "SELECT * FROM medical_records ORDER BY id"
+        cursor = DB.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield cls.instance_from_db(row)
+    
+    @classmethod
+    def page(cls, after_id=0, limit=50):
+        """Return up to limit MedicalRecord instances with an id greater than after_id, in id order"""
+        sql = "SELECT * FROM medical_records WHERE id > ? ORDER BY id LIMIT ?"
+        rows = DB.execute(sql, (after_id, limit)).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+    
+    @classmethod
+    def search(cls, query, limit=20, patient_id=None, doctor_id=None):
+        """Return MedicalRecord instances whose diagnosis or treatment match an FTS5 query, best match first.
+
+        Diagnosis matches weigh twice as much as treatment matches. Raises
+        ValueError if the query is not valid FTS5 syntax.
+        """
+        sql = """
+            SELECT medical_records.* FROM medical_records_fts
+            JOIN medical_records ON medical_records.id = medical_records_fts.rowid
+            WHERE medical_records_fts MATCH ?
+        """
+        params = [query]
+        if patient_id is not None:
+            sql += " AND medical_records.patient_id = ?"
+            params.append(patient_id)
+        if doctor_id is not None:
+            sql += " AND medical_records.doctor_id = ?"
+            params.append(doctor_id)
+        sql += " ORDER BY bm25(medical_records_fts, 2.0, 1.0) LIMIT ?"
+        params.append(limit)
+        try:
+            rows = DB.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {e}")
         return [cls.instance_from_db(row) for row in rows]
     
     @classmethod
     def find_by_id(cls, id):
         """Return the MedicalRecord instance with the given primary key"""
         sql = "SELECT * FROM medical_records WHERE id = ?"
-        row = CURSOR.execute(sql, (id,)).fetchone()
+        row = DB.execute(sql, (id,)).fetchone()
         return cls.instance_from_db(row) if row else None
     
     @classmethod
     def find_by_patient_id(cls, patient_id):
         """Return a list of MedicalRecord instances for the given patient_id"""
         sql = "SELECT * FROM medical_records WHERE patient_id = ?"
-        CURSOR.execute(sql, (patient_id,))
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql, (patient_id,)).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+
+    @classmethod
+    def find_by_patient_ids(cls, patient_ids):
+        """Return a list of MedicalRecord instances for any of the given patient_ids"""
+        patient_ids = list(patient_ids)
+        rows = []
+        for start in range(0, len(patient_ids), SQL_VARIABLE_LIMIT):
+            chunk = patient_ids[start:start + SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT * FROM medical_records WHERE patient_id IN ({placeholders})"
+            rows.extend(DB.execute(sql, chunk).fetchall())
         return [cls.instance_from_db(row) for row in rows]
 
     @classmethod
     def find_by_doctor_id(cls, doctor_id):
         """Return a list of MedicalRecord instances for the given doctor_id"""
         sql = "SELECT * FROM medical_records WHERE doctor_id = ?"
-        CURSOR.execute(sql, (doctor_id,))
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql, (doctor_id,)).fetchall()
         return [cls.instance_from_db(row) for row in rows]
 
+    @classmethod
+    def find_between(cls, start, end, doctor_id=None):
+        """Return the MedicalRecord instances dated in [start, end), of one doctor or of all, in date order.
+
+        start and end may be date strings, datetimes or dates. The range is read
+        from the record_date index, or the (doctor_id, record_date) index for one doctor.
+        """
+        sql = "SELECT * FROM medical_records WHERE record_date >= ? AND record_date < ?"
+        params = [canonical_record_date(start), canonical_record_date(end)]
+        if doctor_id is not None:
+            sql += " AND doctor_id = ?"
+            params.append(doctor_id)
+        rows = DB.execute(sql + " ORDER BY record_date, id", params).fetchall()
+        return [cls.instance_from_db(row) for row in rows]
+
+    @classmethod
+    def find_by_doctor_ids(cls, doctor_ids):
+        """Return a list of MedicalRecord instances for any of the given doctor_ids"""
+        doctor_ids = list(doctor_ids)
+        rows = []
+        for start in range(0, len(doctor_ids), SQL_VARIABLE_LIMIT):
+            chunk = doctor_ids[start:start + SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT * FROM medical_records WHERE doctor_id IN ({placeholders})"
+            rows.extend(DB.execute(sql, chunk).fetchall())
+        return [cls.instance_from_db(row) for row in rows]
+    
+    async def asave(self):
+        """Async counterpart of save, run on the database worker pool"""
+        await run_in_worker(self.save)
+    
+    async def aupdate(self):
+        """Async counterpart of update, run on the database worker pool"""
+        await run_in_worker(self.update)
+    
+    async def adelete(self):
+        """Async counterpart of delete, run on the database worker pool"""
+        await run_in_worker(self.delete)
+    
+    @classmethod
+    async def asearch(cls, query, limit=20, patient_id=None, doctor_id=None):
+        """Async counterpart of search, run on the database worker pool"""
+        return await run_in_worker(cls.search, query, limit, patient_id, doctor_id)
+    
+    @classmethod
+    async def afind_by_id(cls, id):
+        """Async counterpart of find_by_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_id, id)
+    
+    @classmethod
+    async def afind_by_patient_id(cls, patient_id):
+        """Async counterpart of find_by_patient_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_patient_id, patient_id)
+    
+    @classmethod
+    async def afind_by_doctor_id(cls, doctor_id):
+        """Async counterpart of find_by_doctor_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_doctor_id, doctor_id)
+    
+    @classmethod
+    async def afind_between(cls, start, end, doctor_id=None):
+        """Async counterpart of find_between, run on the database worker pool"""
+        return await run_in_worker(cls.find_between, start, end, doctor_id)
+    
+    @classmethod
+    async def aget_all(cls):
+        """Async counterpart of get_all, run on the database worker pool"""
+        return await run_in_worker(cls.get_all)
+    
+    @classmethod
+    async def apage(cls, after_id=0, limit=50):
+        """Async counterpart of page, run on the database worker pool"""
+        return await run_in_worker(cls.page, after_id, limit)
+    
+    @classmethod
+    async def acreate(cls, patient_id, doctor_id, record_date, diagnosis, treatment):
+        """Async counterpart of create, run on the database worker pool"""
+        return await run_in_worker(cls.create, patient_id, doctor_id, record_date, diagnosis, treatment)
+    
+    @classmethod
+    async def acreate_many(cls, rows, validated=False):
+        """Async counterpart of create_many, run on the database worker pool"""
+        return await run_in_worker(cls.create_many, rows, validated)
+
 def manage_medical_records():
     """Function to manage medical record-related operations from the CLI"""
     while True:
@@ -187,7 +351,8 @@ def manage_medical_records():
         print("2. View Medical Records")
         print("3. Update Medical Record")
         print("4. Delete Medical Record")
-        print("5. Back to Main Menu")
+        print("5. Search Medical Records")
+        print("6. Back to Main Menu")
         choice = input("Enter your choice: ")
         
         if choice == '1':
@@ -201,9 +366,10 @@ def manage_medical_records():
             MedicalRecord.create(patient_id, doctor_id, record_date, diagnosis, treatment)
             print("Medical record added successfully.")
         elif choice == '2':
-            records = MedicalRecord.get_all()
-            for record in records:
-                print(record)
+            from helpers import page_through
+            shown = page_through(MedicalRecord.page, print)
+            if not shown:
+                print("No medical records found.")
         elif choice == '3':
             id = int(input("Enter medical record ID to update: "))
             record = MedicalRecord.find_by_id(id)
@@ -226,6 +392,15 @@ def manage_medical_records():
             else:
                 print("Medical record not found.")
         elif choice == '5':
+            words = input("Search diagnosis and treatment for: ").split()
+            # Quote each word so punctuation in the input isn't read as FTS5 syntax
+            query = " ".join('"' + word.replace('"', '""') + '"' for word in words)
+            records = MedicalRecord.search(query) if query else []
+            for record in records:
+                print(record)
+            if not records:
+                print("No matching medical records found.")
+        elif choice == '6':
             break
         else:
             print("Invalid choice. Please try again.")
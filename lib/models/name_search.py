@@ -0,0 +1,312 @@
+# lib/models/name_search.py
+import re
+import string
+import unicodedata
+from collections import Counter
+
+from models.__init__ import DB, SQL_VARIABLE_LIMIT
+
+
+_NOT_ASCII_ALNUM = re.compile(r"[^a-z0-9]+")
+# Letters tried by one_edit for substitutions and insertions
+_EDIT_LETTERS = string.ascii_lowercase + string.digits
+
+
+def normalize_name(name):
+    """Lower-case a name, strip accents and keep only letters, digits and single spaces"""
+    if name.isascii():
+        # Same result as below for ASCII names, without the per-character loop
+        return " ".join(_NOT_ASCII_ALNUM.sub(" ", name.lower()).split())
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    kept = "".join(c if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c))
+    return " ".join(kept.split())
+
+
+def name_trigrams(name):
+    """Return the set of trigrams of a name, each word padded with two leading and one trailing space"""
+    return _word_trigrams(normalize_name(name).split())
+
+
+def _word_trigrams(words):
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def one_edit(word):
+    """Return {variant: cost} for word and every word one edit away from it.
+
+    Costs are as in edit_similarity: 0 for word itself, 0.5 for two swapped
+    neighbouring letters and 1 for an inserted, deleted or substituted letter.
+    """
+    variants = {}
+    for i in range(len(word) + 1):
+        head, tail = word[:i], word[i:]
+        for letter in _EDIT_LETTERS:
+            variants[head + letter + tail] = 1
+            if tail:
+                variants[head + letter + tail[1:]] = 1
+        if tail:
+            variants[head + tail[1:]] = 1
+        if len(tail) > 1:
+            variants[head + tail[1] + tail[0] + tail[2:]] = 0.5
+    variants[word] = 0
+    return variants
+
+
+def _prefix_end(prefix):
+    """Return the smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def similarity(first, second):
+    """Return the trigram similarity (shared / distinct trigrams) of two sets of trigrams"""
+    if not first or not second:
+        return 0.0
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def edit_similarity(query_word, word):
+    """Return 1 - edit distance / length of the longer word, between 0 and 1.
+
+    Insertions, deletions and substitutions cost 1; swapping two neighbouring
+    letters, the commonest typing slip, costs 0.5.
+    """
+    if not query_word or not word:
+        return 0.0
+    before, previous = None, list(range(len(word) + 1))
+    last_letter = None
+    for i, letter in enumerate(query_word, 1):
+        current = [i]
+        left = i
+        for j, other in enumerate(word, 1):
+            cost = previous[j - 1] if letter == other else previous[j - 1] + 1
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if left + 1 < cost:
+                cost = left + 1
+            if j > 1 and letter == word[j - 2] and last_letter == other and before[j - 2] + 0.5 < cost:
+                cost = before[j - 2] + 0.5
+            current.append(cost)
+            left = cost
+        before, previous, last_letter = previous, current, letter
+    return 1 - previous[-1] / max(len(query_word), len(word))
+
+
+class NameIndex:
+    """Prefix and fuzzy name lookup over index tables maintained by the models.
+
+    {owner}_name_keys holds every normalized word of a name, for prefix range
+    scans; {owner}_name_trigrams holds every trigram of a name, for similarity
+    search. Both are written by the owning model's save/update/delete and
+    create_many, and can be rebuilt from the base table with rebuild().
+    """
+
+    # Key rows and trigram postings read per fuzzy lookup, which bounds its latency
+    POSTINGS_BUDGET = 5000
+    # Names scored with edit_similarity per fuzzy lookup, unless limit is larger
+    CANDIDATES = 20
+
+    def __init__(self, table, owner, name_sql):
+        self.table = table
+        self.owner_column = f"{owner}_id"
+        self.keys_table = f"{owner}_name_keys"
+        self.trigrams_table = f"{owner}_name_trigrams"
+        self.name_sql = name_sql
+        self._checked = False
+
+    def __repr__(self):
+        return f"NameIndex(table={self.table!r})"
+
+    def add(self, owner_id, name):
+        self.add_many([(owner_id, name)])
+
+    def add_many(self, names):
+        """Index (owner_id, name) pairs"""
+        keys, grams = [], []
+        for owner_id, name in names:
+            words = set(normalize_name(name).split())
+            keys.extend((key, owner_id) for key in words)
+            grams.extend((gram, owner_id) for gram in _word_trigrams(words))
+        DB.executemany(f"INSERT OR IGNORE INTO {self.keys_table} VALUES (?, ?)", keys)
+        DB.executemany(f"INSERT OR IGNORE INTO {self.trigrams_table} VALUES (?, ?)", grams)
+
+    def remove(self, owner_id):
+        DB.execute(f"DELETE FROM {self.keys_table} WHERE {self.owner_column} = ?", (owner_id,))
+        DB.execute(f"DELETE FROM {self.trigrams_table} WHERE {self.owner_column} = ?", (owner_id,))
+
+    def replace(self, owner_id, name):
+        self.remove(owner_id)
+        self.add(owner_id, name)
+
+    def rebuild(self, batch_size=5000):
+        """Re-index every row of the base table"""
+        with DB.session():
+            DB.execute(f"DELETE FROM {self.keys_table}")
+            DB.execute(f"DELETE FROM {self.trigrams_table}")
+            cursor = DB.execute(f"SELECT id, {self.name_sql} FROM {self.table}")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                self.add_many(rows)
+        self._checked = True
+
+    def prefix(self, query, limit=10):
+        """Return up to limit owner ids whose name has a word starting with every word of query.
+
+        Results are ordered by the matching word of the longest query word.
+        """
+        self._ensure_built()
+        words = normalize_name(query).split()
+        if not words:
+            return []
+        # Scan the range of the longest word; the others are checked per owner
+        # through the owner index, which covers (owner_id, key)
+        driver = max(words, key=len)
+        others = list(words)
+        others.remove(driver)
+        exists = "".join(
+            f"""
+                AND EXISTS (
+                    SELECT 1 FROM {self.keys_table} AS other
+                    WHERE other.{self.owner_column} = driver.{self.owner_column} AND other.key >= ? AND other.key < ?
+                )
+            """
+            for _ in others
+        )
+        sql = f"""
+            SELECT DISTINCT {self.owner_column} FROM (
+                SELECT driver.{self.owner_column} FROM {self.keys_table} AS driver
+                WHERE driver.key >= ? AND driver.key < ? {exists}
+                ORDER BY driver.key, driver.{self.owner_column}
+            )
+            LIMIT ?
+        """
+        params = [bound for word in (driver, *others) for bound in (word, _prefix_end(word))]
+        return [row[0] for row in DB.execute(sql, (*params, limit))]
+
+    def fuzzy(self, query, limit=10, threshold=0.5):
+        """Return up to limit (owner_id, score) pairs for names similar to query, best first.
+
+        Candidates come from two indexed lookups: names with a word one edit
+        or less away from a query word (exact words first, then swapped
+        letters, then other edits), then names sharing the most of the query's
+        rarer trigrams, counted by SQLite. Only the first CANDIDATES of them are
+        scored: every query word is compared with the most similar word of the
+        name by edit_similarity, so a typo only costs the word it is in, and
+        score is the mean over the query words. Equal scores are ordered by the
+        trigram similarity of the whole names.
+        """
+        self._ensure_built()
+        words = sorted(set(normalize_name(query).split()))
+        if not words:
+            return []
+        wanted = max(limit, self.CANDIDATES)
+        candidates = self._near_words(words, wanted)
+        if len(candidates) < wanted:
+            candidates += [
+                owner_id for owner_id in self._shared_trigrams(words, wanted) if owner_id not in candidates
+            ][:wanted - len(candidates)]
+        names = self._names(candidates)
+        query_grams = _word_trigrams(words)
+        # Best edit_similarity of each name word to each query word; names share many words
+        word_scores = {}
+        scored = []
+        for owner_id in candidates:
+            if owner_id not in names:
+                continue
+            name_words = normalize_name(names[owner_id]).split()
+            for name_word in name_words:
+                if name_word not in word_scores:
+                    word_scores[name_word] = [edit_similarity(word, name_word) for word in words]
+            score = sum(
+                max((word_scores[name_word][index] for name_word in name_words), default=0.0)
+                for index in range(len(words))
+            ) / len(words)
+            if score >= threshold:
+                scored.append((owner_id, score, similarity(query_grams, _word_trigrams(name_words))))
+        scored.sort(key=lambda scores: (-scores[1], -scores[2], scores[0]))
+        return [(owner_id, score) for owner_id, score, _ in scored[:limit]]
+
+    def _near_words(self, words, limit):
+        """Return up to limit owner ids with a word one edit or less from a query word, nearest first"""
+        # Per owner, a query word found exactly counts 2, one with swapped letters 1.5, any other edit 1
+        weights = Counter()
+        budget = self.POSTINGS_BUDGET
+        for word in words:
+            costs = one_edit(word)
+            # Cheapest first, so a cut-short budget drops the farthest variants
+            variants = sorted(costs, key=costs.get)
+            best = {}
+            for start in range(0, len(variants), SQL_VARIABLE_LIMIT):
+                if budget <= 0:
+                    break
+                chunk = variants[start:start + SQL_VARIABLE_LIMIT]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = f"SELECT key, {self.owner_column} FROM {self.keys_table} WHERE key IN ({placeholders}) LIMIT ?"
+                rows = DB.execute(sql, (*chunk, budget)).fetchall()
+                budget -= len(rows)
+                for key, owner_id in rows:
+                    best[owner_id] = max(best.get(owner_id, 0), 2 - costs[key])
+            weights.update(best)
+        return [owner_id for owner_id, _ in weights.most_common(limit)]
+
+    def _shared_trigrams(self, words, limit):
+        """Return up to limit owner ids sharing the most of the query's rarer trigrams, most first"""
+        # Counting stops early: a trigram at the cap is too common to tell names
+        # apart, and grouping its postings would cost more than the whole lookup
+        cap = self.POSTINGS_BUDGET // 2
+        count_sql = f"SELECT COUNT(*) FROM (SELECT 1 FROM {self.trigrams_table} WHERE trigram = ? LIMIT ?)"
+        sizes = {gram: DB.execute(count_sql, (gram, cap)).fetchone()[0] for gram in _word_trigrams(words)}
+        # A typo can break any of a word's trigrams, so the rarest of all of them
+        # are grouped, as many as the budget allows
+        grams, total = [], 0
+        for gram in sorted(sizes, key=sizes.get):
+            if not sizes[gram]:
+                continue
+            if sizes[gram] >= cap or total + sizes[gram] > self.POSTINGS_BUDGET:
+                break
+            grams.append(gram)
+            total += sizes[gram]
+        if not grams:
+            return []
+        sql = f"""
+            SELECT {self.owner_column} FROM {self.trigrams_table}
+            WHERE trigram IN ({", ".join("?" * len(grams))})
+            GROUP BY {self.owner_column}
+            ORDER BY COUNT(*) DESC, {self.owner_column}
+            LIMIT ?
+        """
+        return [row[0] for row in DB.execute(sql, (*grams, limit))]
+
+    def _names(self, owner_ids):
+        names = {}
+        for start in range(0, len(owner_ids), SQL_VARIABLE_LIMIT):
+            chunk = owner_ids[start:start + SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            sql = f"SELECT id, {self.name_sql} FROM {self.table} WHERE id IN ({placeholders})"
+            names.update(DB.execute(sql, chunk).fetchall())
+        return names
+
+    def reset(self):
+        """Check again on the next search whether the index needs building, e.g. after switching databases"""
+        self._checked = False
+
+    def _ensure_built(self):
+        """Index the base table once if it has rows but the index is empty, e.g. after an upgrade"""
+        if self._checked:
+            return
+        indexed = DB.execute(f"SELECT EXISTS (SELECT 1 FROM {self.keys_table})").fetchone()[0]
+        if not indexed and DB.execute(f"SELECT EXISTS (SELECT 1 FROM {self.table})").fetchone()[0]:
+            self.rebuild()
+        self._checked = True
+
+
+PATIENT_NAMES = NameIndex("patients", "patient", "first_name || ' ' || last_name")
+DOCTOR_NAMES = NameIndex("doctors", "doctor", "name")
+DB.reset_hooks.append(PATIENT_NAMES.reset)
+DB.reset_hooks.append(DOCTOR_NAMES.reset)
@@ -1,11 +1,36 @@
 # lib/models/patient.py
-from models.__init__ import CONN, CURSOR
+from collections import namedtuple
+from heapq import merge
+from itertools import islice
+
+from models.__init__ import DB, create_indexes
+from models.identity_map import IdentityMap
+from models.aio import run_in_worker
+from models.fields import NonEmptyString, OneOf, PositiveInteger
 from models.medical_record import MedicalRecord
 from models.appointment import Appointment
+from models.name_search import PATIENT_NAMES
+
+# One entry of a patient's timeline: item is the Appointment or MedicalRecord.
+# (date, kind, id) orders the entries and is the cursor for the next page
+TimelineEvent = namedtuple("TimelineEvent", ["date", "kind", "id", "item"])
+
+# kind, model, table and date column of each source of timeline events
+TIMELINE_SOURCES = (
+    ("appointment", Appointment, "appointments", "appointment_date"),
+    ("medical_record", MedicalRecord, "medical_records", "record_date"),
+)
 
 class Patient:
     
-    all = {}
+    __slots__ = ("id", "_first_name", "_last_name", "_age", "_gender", "_medical_records", "_appointments", "__weakref__")
+    
+    all = IdentityMap()
+    
+    first_name = NonEmptyString("First name must be a non-empty string")
+    last_name = NonEmptyString("Last name must be a non-empty string")
+    age = PositiveInteger("Age must be a positive integer")
+    gender = OneOf(["Male", "Female", "Other"], "Gender must be 'Male', 'Female', or 'Other'")
     
     def __init__(self, first_name, last_name, age, gender, id=None):
         self.id = id
@@ -13,8 +38,8 @@ class Patient:
         self.last_name = last_name
         self.age = age
         self.gender = gender
-        self.medical_records = []
-        self.appointments = []
+        self._medical_records = None
+        self._appointments = None
 
     def __repr__(self):
         return (
@@ -22,52 +47,54 @@ class Patient:
         )
     
     @property
-    def first_name(self):
-        return self._first_name
-    
-    @first_name.setter
-    def first_name(self, first_name):
-        if isinstance(first_name, str) and len(first_name) > 0:
-            self._first_name = first_name
-        else:
-            raise ValueError("First name must be a non-empty string")
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
 
     @property
-    def last_name(self):
-        return self._last_name
+    def medical_records(self):
+        """Return the medical records of this Patient, querying them on first access"""
+        if self._medical_records is None:
+            if self.id is None:
+                return []
+            self._medical_records = MedicalRecord.find_by_patient_id(self.id)
+        return self._medical_records
+    
+    @medical_records.setter
+    def medical_records(self, medical_records):
+        # None discards the cached list so the next access queries again
+        self._medical_records = medical_records
     
-    @last_name.setter
-    def last_name(self, last_name):
-        if isinstance(last_name, str) and len(last_name) > 0:
-            self._last_name = last_name
-        else:
-            raise ValueError("Last name must be a non-empty string")
-            
     @property
-    def age(self):
-        return self._age
+    def appointments(self):
+        """Return the appointments of this Patient, querying them on first access"""
+        if self._appointments is None:
+            if self.id is None:
+                return []
+            self._appointments = Appointment.find_by_patient_id(self.id)
+        return self._appointments
     
-    @age.setter
-    def age(self, age):
-        if isinstance(age, int) and age > 0:
-            self._age = age
-        else:
-            raise ValueError("Age must be a positive integer")
+    @appointments.setter
+    def appointments(self, appointments):
+        # None discards the cached list so the next access queries again
+        self._appointments = appointments
     
-    @property
-    def gender(self):
-        return self._gender
+    @classmethod
+    def reset_relation(cls, id, relation):
+        """Discard the cached relation list of the Patient with the given id, if it is loaded"""
+        patient = cls.all.peek(id)
+        if patient:
+            setattr(patient, relation, None)
     
-    @gender.setter
-    def gender(self, gender):
-        if isinstance(gender, str) and gender in ["Male", "Female", "Other"]:
-            self._gender = gender
-        else:
-            raise ValueError("Gender must be 'Male', 'Female', or 'Other'")
+    @classmethod
+    def reset_all_relations(cls):
+        """Discard the cached relation lists of every loaded Patient"""
+        for patient in cls.all.values():
+            patient.medical_records = None
+            patient.appointments = None
     
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of Patient instances"""
+        """Create a new table, and its indexes, to persist the attributes of Patient instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS patients (
                 id INTEGER PRIMARY KEY,
@@ -77,15 +104,18 @@ class Patient:
                 gender TEXT NOT NULL
             )
         """
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        create_indexes("patients")
+        DB.commit()
     
     @classmethod
     def drop_table(cls):
         """Drop the table that persists the attributes of Patient instances"""
         sql = "DROP TABLE IF EXISTS patients"
-        CURSOR.execute(sql)
-        CONN.commit()
+        DB.execute(sql)
+        DB.execute(f"DROP TABLE IF EXISTS {PATIENT_NAMES.keys_table}")
+        DB.execute(f"DROP TABLE IF EXISTS {PATIENT_NAMES.trigrams_table}")
+        DB.commit()
     
     def save(self):
         """Persist the attributes of a Patient instance to the database"""
@@ -93,9 +123,11 @@ class Patient:
             INSERT INTO patients (first_name, last_name, age, gender)
             VALUES (?, ?, ?, ?)
         """
-        CURSOR.execute(sql, (self.first_name, self.last_name, self.age, self.gender))
-        CONN.commit()
-        self.id = CURSOR.lastrowid
+        with DB.session():
+            cursor = DB.execute(sql, (self.first_name, self.last_name, self.age, self.gender))
+            PATIENT_NAMES.add(cursor.lastrowid, self.full_name)
+        self.id = cursor.lastrowid
+        type(self).all.add_new(self.id, self)
     
     def update(self):
         """Update the table row corresponding to the current Patient instance"""
@@ -104,14 +136,17 @@ class Patient:
             SET first_name = ?, last_name = ?, age = ?, gender = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.first_name, self.last_name, self.age, self.gender, self.id))
-        CONN.commit()
+        with DB.session():
+            DB.execute(sql, (self.first_name, self.last_name, self.age, self.gender, self.id))
+            PATIENT_NAMES.replace(self.id, self.full_name)
     
     def delete(self):
         """Delete the table row corresponding to the current Patient instance"""
         sql = "DELETE FROM patients WHERE id = ?"
-        CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        with DB.session():
+            DB.execute(sql, (self.id,))
+            PATIENT_NAMES.remove(self.id)
+        type(self).all.pop(self.id)
     
     @classmethod
     def create(cls, first_name, last_name, age, gender):
@@ -120,48 +155,242 @@ class Patient:
         patient.save()
         return patient
     
+    @classmethod
+    def create_many(cls, rows, validated=False):
+        """Create Patient instances from (first_name, last_name, age, gender) tuples in a single transaction.
+
+        Pass validated=True for rows already cleaned by the fields, as the
+        importer's workers do; their values are then not validated again.
+        """
+        build = cls._trusted if validated else cls
+        patients = [build(*row) for row in rows]
+        with DB.session():
+            ids = DB.insert_many(
+                "patients",
+                ("first_name", "last_name", "age", "gender"),
+                [(patient.first_name, patient.last_name, patient.age, patient.gender) for patient in patients]
+            )
+            PATIENT_NAMES.add_many(zip(ids, (patient.full_name for patient in patients)))
+        for patient, id in zip(patients, ids):
+            patient.id = id
+            cls.all.add_new(id, patient)
+        return patients
+    
+    @classmethod
+    def _unloaded(cls, id):
+        """Return a Patient for id whose column attributes instance_from_db has yet to set"""
+        patient = cls.__new__(cls)
+        patient.id = id
+        patient._medical_records = None
+        patient._appointments = None
+        return patient
+    
+    @classmethod
+    def _trusted(cls, first_name, last_name, age, gender):
+        """Return a new, unsaved Patient from values the fields have already cleaned, without validating them again"""
+        patient = cls._unloaded(None)
+        patient._first_name = first_name
+        patient._last_name = last_name
+        patient._age = age
+        patient._gender = gender
+        return patient
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return a Patient object having the attribute values from the table row."""
-        patient = cls.all.get(row[0])
-        if patient:
-            patient.first_name = row[1]
-            patient.last_name = row[2]
-            patient.age = row[3]
-            patient.gender = row[4]
-        else:
-            patient = cls(row[1], row[2], row[3], row[4], id=row[0])
-            cls.all[row[0]] = patient
-        
-        # Retrieve and assign related medical records
-        patient.medical_records = MedicalRecord.find_by_patient_id(patient.id)
-        # Retrieve and assign related appointments
-        patient.appointments = Appointment.find_by_patient_id(patient.id)
-        
+        """Return a Patient object having the attribute values from the table row.
+
+        Rows come from our own validated table, so they are written straight
+        into the slots without running the field validators.
+        """
+        patient = cls.all.get_or_add(row[0], cls._unloaded)
+        patient._first_name = row[1]
+        patient._last_name = row[2]
+        patient._age = row[3]
+        patient._gender = row[4]
         return patient
     
+    @classmethod
+    def attach_relations(cls, patients, medical_records, appointments):
+        """Group the given related rows by patient_id and assign them to the matching patients"""
+        patients_by_id = {patient.id: patient for patient in patients}
+        for patient in patients:
+            patient.medical_records = []
+            patient.appointments = []
+        for medical_record in medical_records:
+            patient = patients_by_id.get(medical_record.patient_id)
+            if patient:
+                patient.medical_records.append(medical_record)
+        for appointment in appointments:
+            patient = patients_by_id.get(appointment.patient_id)
+            if patient:
+                patient.appointments.append(appointment)
+        return patients
+    
+    @classmethod
+    def load_relations(cls, patients):
+        """Eagerly load medical records and appointments for a list of Patient instances"""
+        patient_ids = [patient.id for patient in patients]
+        return cls.attach_relations(
+            patients,
+            MedicalRecord.find_by_patient_ids(patient_ids),
+            Appointment.find_by_patient_ids(patient_ids)
+        )
+    
     @classmethod
     def get_all(cls):
-        """Return a list of all Patient instances persisted to the database"""
+        """Return a list of all Patient instances persisted to the database.
+
+        Related rows are loaded with one query per table instead of two per patient.
+        """
         sql = "SELECT * FROM patients"
-        CURSOR.execute(sql)
-        rows = CURSOR.fetchall()
+        rows = DB.execute(sql).fetchall()
+        patients = [cls.instance_from_db(row) for row in rows]
+        return cls.attach_relations(patients, MedicalRecord.get_all(), Appointment.get_all())
+    
+    @classmethod
+    def iter_all(cls, batch_size=500):
+        """Yield every Patient instance, fetching rows from the database batch_size at a time"""
+        sql = "SELECT * FROM patients ORDER BY id"
+        cursor = DB.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield cls.instance_from_db(row)
+    
+    @classmethod
+    def page(cls, after_id=0, limit=50):
+        """Return up to limit Patient instances with an id greater than after_id, in id order"""
+        sql = "SELECT * FROM patients WHERE id > ? ORDER BY id LIMIT ?"
+        rows = DB.execute(sql, (after_id, limit)).fetchall()
         return [cls.instance_from_db(row) for row in rows]
     
+    @classmethod
+    def iter_timeline(cls, patient_id, before=None):
+        """Yield the appointments and medical records of a patient as TimelineEvents, newest first.
+
+        Each table is read through one cursor on its (patient_id, date) index
+        and the two are merged lazily, so rows are only fetched as events are
+        consumed. before is the last event already seen, or its (date, kind,
+        id); only the older events after it are yielded. Records carry no time,
+        so a record comes after the appointments of its day.
+        """
+        streams = [cls._timeline_events(patient_id, before, *source) for source in TIMELINE_SOURCES]
+        return merge(*streams, key=lambda event: event[:3], reverse=True)
+    
+    @staticmethod
+    def _timeline_events(patient_id, before, kind, model, table, column):
+        sql = f"SELECT * FROM {table} WHERE patient_id = ?"
+        params = [patient_id]
+        if before is not None:
+            date, before_kind, id = before[:3]
+            if kind == before_kind:
+                sql += f" AND {column} <= ? AND ({column}, id) < (?, ?)"
+                params += [date, date, id]
+            else:
+                # On the same date the greater kind comes first
+                sql += f" AND {column} {'<=' if kind < before_kind else '<'} ?"
+                params.append(date)
+        for row in DB.execute(sql + f" ORDER BY {column} DESC, id DESC", params):
+            item = model.instance_from_db(row)
+            yield TimelineEvent(getattr(item, column), kind, item.id, item)
+    
+    @classmethod
+    def timeline(cls, patient_id, before=None, limit=50):
+        """Return the next limit TimelineEvents of a patient, newest first.
+
+        Pass the last event of a page as before to get the following page;
+        about limit rows are read from each table however long the history is.
+        """
+        return list(islice(cls.iter_timeline(patient_id, before), limit))
+    
     @classmethod
     def find_by_id(cls, id):
         """Return the Patient instance with the given primary key"""
         sql = "SELECT * FROM patients WHERE id = ?"
-        row = CURSOR.execute(sql, (id,)).fetchone()
+        row = DB.execute(sql, (id,)).fetchone()
         return cls.instance_from_db(row) if row else None
     
     @classmethod
     def find_by_name(cls, first_name, last_name):
         """Return a list of Patient instances with the given name"""
         sql = "SELECT * FROM patients WHERE first_name = ? AND last_name = ?"
-        row = CURSOR.execute(sql, (first_name, last_name)).fetchone()
+        row = DB.execute(sql, (first_name, last_name)).fetchone()
         return cls.instance_from_db(row) if row else None
     
+    @classmethod
+    def search_by_name(cls, query, limit=10, fuzzy=True):
+        """Return up to limit Patient instances matching a partial or misspelt name, best first.
+
+        Names with a word starting with every word of the query come first; when
+        fuzzy is true the rest of the list is filled with the most similar names,
+        scored word by word so that a typo only costs the word it is in.
+        """
+        ids = PATIENT_NAMES.prefix(query, limit)
+        if fuzzy and len(ids) < limit:
+            ids += [id for id, _ in PATIENT_NAMES.fuzzy(query, limit) if id not in ids][:limit - len(ids)]
+        return [patient for patient in (cls.find_by_id(id) for id in ids) if patient]
+    
+    async def asave(self):
+        """Async counterpart of save, run on the database worker pool"""
+        await run_in_worker(self.save)
+    
+    async def aupdate(self):
+        """Async counterpart of update, run on the database worker pool"""
+        await run_in_worker(self.update)
+    
+    async def adelete(self):
+        """Async counterpart of delete, run on the database worker pool"""
+        await run_in_worker(self.delete)
+    
+    @classmethod
+    async def afind_by_id(cls, id):
+        """Async counterpart of find_by_id, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_id, id)
+    
+    @classmethod
+    async def afind_by_name(cls, first_name, last_name):
+        """Async counterpart of find_by_name, run on the database worker pool"""
+        return await run_in_worker(cls.find_by_name, first_name, last_name)
+    
+    @classmethod
+    async def asearch_by_name(cls, query, limit=10, fuzzy=True):
+        """Async counterpart of search_by_name, run on the database worker pool"""
+        return await run_in_worker(cls.search_by_name, query, limit, fuzzy)
+    
+    @classmethod
+    async def aget_all(cls):
+        """Async counterpart of get_all, run on the database worker pool"""
+        return await run_in_worker(cls.get_all)
+    
+    @classmethod
+    async def apage(cls, after_id=0, limit=50):
+        """Async counterpart of page, run on the database worker pool"""
+        return await run_in_worker(cls.page, after_id, limit)
+    
+    @classmethod
+    async def atimeline(cls, patient_id, before=None, limit=50):
+        """Async counterpart of timeline, run on the database worker pool"""
+        return await run_in_worker(cls.timeline, patient_id, before, limit)
+    
+    @classmethod
+    async def acreate(cls, first_name, last_name, age, gender):
+        """Async counterpart of create, run on the database worker pool"""
+        return await run_in_worker(cls.create, first_name, last_name, age, gender)
+    
+    @classmethod
+    async def acreate_many(cls, rows, validated=False):
+        """Async counterpart of create_many, run on the database worker pool"""
+        return await run_in_worker(cls.create_many, rows, validated)
+    
+    @classmethod
+    async def aload_relations(cls, patients):
+        """Async counterpart of load_relations, run on the database worker pool"""
+        return await run_in_worker(cls.load_relations, patients)
+
+DB.reset_hooks.append(Patient.reset_all_relations)
+
 def manage_patients():
     while True:
         print("\n--- Patient Management Menu ---")
@@ -169,7 +398,9 @@ def manage_patients():
         print("2. Add a new patient")
         print("3. Update a patient")
         print("4. Delete a patient")
-        print("5. Return to main menu")
+        print("5. Search patients by name")
+        print("6. View a patient's timeline")
+        print("7. Return to main menu")
         
         choice = input("Enter your choice: ")
         
@@ -182,17 +413,51 @@ def manage_patients():
         elif choice == "4":
             delete_patient()
         elif choice == "5":
+            search_patients()
+        elif choice == "6":
+            view_timeline()
+        elif choice == "7":
             break
         else:
-            print("Invalid choice. Please enter a number between 1 and 5.")
+            print("Invalid choice. Please enter a number between 1 and 7.")
 
 def view_all_patients():
-    patients = Patient.get_all()
+    from helpers import page_through
+    shown = page_through(
+        Patient.page,
+        lambda patient: print(f"ID: {patient.id}, Name: {patient.first_name} {patient.last_name}, Age: {patient.age}, Gender: {patient.gender}")
+    )
+    if not shown:
+        print("No patients found.")
+
+def search_patients():
+    query = input("Enter part of the patient's name: ")
+    patients = Patient.search_by_name(query)
     if patients:
         for patient in patients:
-            print(patient)
+            print(f"ID: {patient.id}, Name: {patient.first_name} {patient.last_name}, Age: {patient.age}, Gender: {patient.gender}")
     else:
-        print("No patients found.")
+        print("No matching patients found.")
+
+def show_event(event):
+    if event.kind == "appointment":
+        appointment = event.item
+        print(f"{event.date}  Appointment with doctor {appointment.doctor_id} ({appointment.duration} min): {appointment.notes or ''}")
+    else:
+        record = event.item
+        print(f"{event.date}  Medical record by doctor {record.doctor_id}: {record.diagnosis} - {record.treatment}")
+
+def view_timeline():
+    from helpers import page_through
+    patient_id = int(input("Enter patient ID: "))
+    shown = page_through(
+        lambda before, limit: Patient.timeline(patient_id, before, limit),
+        show_event,
+        after=None,
+        cursor=lambda event: event
+    )
+    if not shown:
+        print("No appointments or medical records found.")
 
 def add_patient():
     first_name = input("Enter patient's first name: ")
@@ -0,0 +1,168 @@
+# lib/models/schedule.py
+import threading
+import warnings
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+
+from models.__init__ import DB
+
+DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d")
+# Stored forms of appointment_date and record_date: fixed width, so text order is time order
+APPOINTMENT_DATE_FORMAT = "%Y-%m-%d %H:%M"
+RECORD_DATE_FORMAT = "%Y-%m-%d"
+
+
+def parse_appointment_date(value):
+    """Return the datetime for an appointment date string ("YYYY-MM-DD HH:MM" or "YYYY-MM-DD")"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        # Fast path for zero-padded values; strptime also accepts e.g. "2024-7-1"
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except (TypeError, ValueError):
+            continue
+    raise ValueError("Appointment date must be in the format YYYY-MM-DD HH:MM")
+
+
+def stored_appointment_date(id, value):
+    """Return the datetime of a stored appointment_date, or None with a warning if it cannot be read.
+
+    Caches built from the table skip such a row instead of failing every later
+    booking of its doctor; initialize_database(force=True) quarantines it.
+    """
+    try:
+        return parse_appointment_date(value)
+    except ValueError:
+        warnings.warn(f"Appointment {id} has the unreadable date {value!r} and is ignored; "
+                      "run initialize_database(force=True) to quarantine it")
+        return None
+
+
+def canonical_appointment_date(value):
+    """Return a date string, datetime or date in the stored appointment_date form, "YYYY-MM-DD HH:MM" """
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return parse_appointment_date(value).strftime(APPOINTMENT_DATE_FORMAT)
+
+
+def canonical_record_date(value):
+    """Return a date string, datetime or date in the stored record_date form, "YYYY-MM-DD" """
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value.strftime(RECORD_DATE_FORMAT)
+    return parse_appointment_date(value).strftime(RECORD_DATE_FORMAT)
+
+
+class ScheduleIndex:
+    """Per-doctor sorted lists of booked (start, end, appointment_id) intervals.
+
+    A doctor's bookings are read from the appointments table (through the
+    doctor_id index) the first time that doctor is checked, and then kept in
+    sync by Appointment.save/update/delete. Stored bookings may overlap - rows
+    written before the check existed or with plain SQL - so the longest
+    booking of each doctor is kept too: a booking overlapping [start, end)
+    starts in [start - longest, end), which a binary search finds.
+    """
+
+    def __init__(self):
+        self._intervals = {}
+        self._bookings = {}
+        self._longest = {}
+        # Held across check-insert-add in Appointment so two bookings can't race
+        self.lock = threading.RLock()
+
+    def __repr__(self):
+        return f"ScheduleIndex(doctors={len(self._intervals)}, bookings={len(self._bookings)})"
+
+    def clear(self):
+        """Forget every loaded doctor; they are re-read from the database on next use"""
+        with self.lock:
+            self._intervals.clear()
+            self._bookings.clear()
+            self._longest.clear()
+
+    def conflict(self, doctor_id, start, end, ignore_id=None):
+        """Return the (start, end, appointment_id) booking overlapping [start, end), or None"""
+        start, end = parse_appointment_date(start), parse_appointment_date(end)
+        with self.lock:
+            intervals = self._load(doctor_id)
+            first = bisect_left(intervals, start - self._longest[doctor_id], key=lambda interval: interval[0])
+            last = bisect_left(intervals, end, key=lambda interval: interval[0])
+            for interval in intervals[first:last]:
+                # Step over the booking being rescheduled
+                if interval[1] > start and interval[2] != ignore_id:
+                    return interval
+            return None
+
+    def is_free(self, doctor_id, start, end):
+        """Return True if the doctor has no booking overlapping [start, end)"""
+        return self.conflict(doctor_id, start, end) is None
+
+    def check(self, appointment):
+        """Raise ValueError if the appointment overlaps another booking of its doctor"""
+        interval = self.conflict(appointment.doctor_id, appointment.start, appointment.end, ignore_id=appointment.id)
+        if interval:
+            raise ValueError(
+                f"Doctor {appointment.doctor_id} is already booked from "
+                f"{interval[0]:%Y-%m-%d %H:%M} to {interval[1]:%Y-%m-%d %H:%M} (appointment {interval[2]})"
+            )
+
+    def check_many(self, appointments):
+        """Raise ValueError if any of the new appointments overlap existing bookings or each other"""
+        by_doctor = {}
+        for appointment in appointments:
+            self.check(appointment)
+            by_doctor.setdefault(appointment.doctor_id, []).append(appointment)
+        for doctor_id, booked in by_doctor.items():
+            booked.sort(key=lambda appointment: appointment.start)
+            for previous, following in zip(booked, booked[1:]):
+                if following.start < previous.end:
+                    raise ValueError(
+                        f"Doctor {doctor_id} would be double-booked at {following.start:%Y-%m-%d %H:%M}"
+                    )
+
+    def add(self, appointment):
+        """Record a saved appointment's booking"""
+        with self.lock:
+            self.remove(appointment.id)
+            if appointment.doctor_id in self._intervals:
+                interval = (appointment.start, appointment.end, appointment.id)
+                insort(self._intervals[appointment.doctor_id], interval)
+                self._bookings[appointment.id] = (appointment.doctor_id, interval)
+                # Not lowered on removal: a longer bound only widens the search
+                self._longest[appointment.doctor_id] = max(self._longest[appointment.doctor_id], interval[1] - interval[0])
+
+    def remove(self, appointment_id):
+        """Forget the booking of a deleted or rescheduled appointment"""
+        with self.lock:
+            booking = self._bookings.pop(appointment_id, None)
+            if booking:
+                doctor_id, interval = booking
+                intervals = self._intervals[doctor_id]
+                intervals.pop(bisect_left(intervals, interval))
+
+    def _load(self, doctor_id):
+        intervals = self._intervals.get(doctor_id)
+        if intervals is None:
+            sql = "SELECT id, appointment_date, duration FROM appointments WHERE doctor_id = ?"
+            intervals, longest = [], timedelta(0)
+            for id, appointment_date, duration in DB.execute(sql, (doctor_id,)):
+                start = stored_appointment_date(id, appointment_date)
+                if start is None:
+                    continue
+                interval = (start, start + timedelta(minutes=duration), id)
+                intervals.append(interval)
+                self._bookings[id] = (doctor_id, interval)
+                longest = max(longest, interval[1] - interval[0])
+            intervals.sort()
+            self._intervals[doctor_id] = intervals
+            self._longest[doctor_id] = longest
+        return intervals
+
+
+SCHEDULE = ScheduleIndex()
+DB.reset_hooks.append(SCHEDULE.clear)
@@ -0,0 +1,78 @@
+# lib/models/workload.py
+from collections import namedtuple
+from datetime import date, datetime
+
+from models.__init__ import DB, WORKLOAD_QUERIES
+from models.schedule import parse_appointment_date
+
+# One row of a workload report: key is a doctor id, a specialization or a YYYY-MM-DD day
+Workload = namedtuple("Workload", ["key", "appointments", "booked_minutes", "medical_records"])
+
+
+def by_doctor(start=None, end=None):
+    """Return the workload of every doctor with activity between start (inclusive) and end (exclusive)"""
+    return _report("w.doctor_id", start, end)
+
+
+def by_specialization(start=None, end=None):
+    """Return the workload of every specialization with activity between start and end"""
+    return _report("d.specialization", start, end, join="JOIN doctors AS d ON d.id = w.doctor_id")
+
+
+def by_day(start=None, end=None, doctor_id=None):
+    """Return the workload per day between start and end, of one doctor or of all of them"""
+    return _report("w.day", start, end, doctor_id)
+
+
+def check():
+    """Return (summary table, doctor_id, day) for every summary row that differs from its source table"""
+    mismatches = []
+    for summary, sql in WORKLOAD_QUERIES.items():
+        rows = DB.execute(f"""
+            SELECT doctor_id, day FROM (SELECT * FROM ({sql}) EXCEPT SELECT * FROM {summary})
+            UNION
+            SELECT doctor_id, day FROM (SELECT * FROM {summary} EXCEPT SELECT * FROM ({sql}))
+            ORDER BY doctor_id, day
+        """).fetchall()
+        mismatches.extend((summary, doctor_id, day) for doctor_id, day in rows)
+    return mismatches
+
+
+def rebuild():
+    """Recompute the summary tables from the appointments and medical_records tables"""
+    with DB.session():
+        for summary, sql in WORKLOAD_QUERIES.items():
+            DB.execute(f"DELETE FROM {summary}")
+            DB.execute(f"INSERT INTO {summary} {sql}")
+
+
+def _day(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return parse_appointment_date(value).strftime("%Y-%m-%d")
+
+
+def _report(key, start, end, doctor_id=None, join=""):
+    # The range conditions use the (doctor_id, day) primary keys, or the day indexes,
+    # so a report reads one summary row per doctor and day instead of every source row
+    conditions, params = [], []
+    if doctor_id is not None:
+        conditions.append("doctor_id = ?")
+        params.append(doctor_id)
+    if start is not None:
+        conditions.append("day >= ?")
+        params.append(_day(start))
+    if end is not None:
+        conditions.append("day < ?")
+        params.append(_day(end))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT {key}, SUM(w.appointments), SUM(w.booked_minutes), SUM(w.medical_records) FROM (
+            SELECT doctor_id, day, appointments, booked_minutes, 0 AS medical_records
+            FROM appointment_workload {where}
+            UNION ALL
+            SELECT doctor_id, day, 0, 0, medical_records FROM medical_record_workload {where}
+        ) AS w {join}
+        GROUP BY {key} ORDER BY {key}
+    """
+    return [Workload(*row) for row in DB.execute(sql, params * 2)]
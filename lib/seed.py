@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from models.__init__ import CONN, CURSOR
+from models.__init__ import initialize_database
 from models.patient import Patient
 
 def seed_database():
@@ -9,16 +9,19 @@ def seed_database():
     Patient.create_table()
 
     # Create seed data for patients
-    Patient.create("John", "Doe", 30, "Male")
-    Patient.create("Jane", "Smith", 25, "Female")
-    Patient.create("Alice", "Johnson", 40, "Female")
-    Patient.create("Bob", "Brown", 50, "Male")
-    Patient.create("Eve", "Davis", 35, "Female")
-    Patient.create("Frank", "Wilson", 45, "Male")
-    Patient.create("Grace", "Lee", 28, "Female")
-    Patient.create("Hank", "Martinez", 60, "Male")
-    Patient.create("Ivy", "Robinson", 32, "Female")
-    Patient.create("Jack", "Clark", 38, "Male")
+    Patient.create_many([
+        ("John", "Doe", 30, "Male"),
+        ("Jane", "Smith", 25, "Female"),
+        ("Alice", "Johnson", 40, "Female"),
+        ("Bob", "Brown", 50, "Male"),
+        ("Eve", "Davis", 35, "Female"),
+        ("Frank", "Wilson", 45, "Male"),
+        ("Grace", "Lee", 28, "Female"),
+        ("Hank", "Martinez", 60, "Male"),
+        ("Ivy", "Robinson", 32, "Female"),
+        ("Jack", "Clark", 38, "Male"),
+    ])
 
+initialize_database()
 seed_database()
 print("Seeded database")
@@ -0,0 +1,86 @@
+# tests/conftest.py
+import os
+import sqlite3
+import sys
+import tempfile
+import warnings
+
+import pytest
+
+LIB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+sys.path.insert(0, LIB)
+# Never touch the hospital.db of the working directory, even at import time
+os.environ["HOSPITAL_DB"] = os.path.join(tempfile.mkdtemp(), "hospital.db")
+
+from models.__init__ import DB, initialize_database
+from models.appointment import Appointment
+from models.doctor import Doctor
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+
+MODELS = (Patient, Doctor, Appointment, MedicalRecord)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "benchmark suite (run with -m benchmark)")
+    group.addoption("--bench-sizes", type=int, nargs="+", default=[1000, 100000, 1000000], help="dataset sizes")
+    group.addoption("--bench-seed", type=int, default=0)
+    group.addoption("--bench-output", default="benchmark-report.json", help="JSON report to write")
+    group.addoption("--bench-baseline", help="earlier report; slower operations fail their test")
+    group.addoption("--bench-tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+
+
+@pytest.fixture
+def use_database():
+    """Return a function switching the models to another database file, with empty identity maps"""
+    def use(path):
+        DB.configure(path=str(path))
+        for model in MODELS:
+            model.all.clear()
+    yield use
+    DB.close_all()
+
+
+@pytest.fixture
+def db(tmp_path, use_database):
+    """A new, empty database with the current schema"""
+    use_database(tmp_path / "hospital.db")
+    initialize_database()
+    return DB
+
+
+@pytest.fixture
+def people(db):
+    """Two doctors and two patients"""
+    doctors = [Doctor.create("Dr. Grey", "Cardiology"), Doctor.create("Dr. Shepherd", "Neurology")]
+    patients = [Patient.create("Ada", "Lovelace", 36, "Female"), Patient.create("Alan", "Turing", 41, "Male")]
+    return doctors, patients
+
+
+LEGACY_SCHEMA = """
+    CREATE TABLE doctors (id INTEGER PRIMARY KEY, name TEXT NOT NULL, specialization TEXT NOT NULL);
+    CREATE TABLE patients (id INTEGER PRIMARY KEY, first_name TEXT NOT NULL, last_name TEXT NOT NULL,
+                           age INTEGER NOT NULL, gender TEXT NOT NULL);
+    CREATE TABLE appointments (id INTEGER PRIMARY KEY, appointment_date TEXT NOT NULL, patient_id INTEGER NOT NULL,
+                               doctor_id INTEGER NOT NULL, notes TEXT);
+    CREATE TABLE medical_records (id INTEGER PRIMARY KEY, patient_id INTEGER NOT NULL, doctor_id INTEGER NOT NULL,
+                                  record_date TEXT NOT NULL, diagnosis TEXT NOT NULL, treatment TEXT NOT NULL);
+    INSERT INTO doctors VALUES (1, 'Dr. Grey', 'Cardiology');
+    INSERT INTO patients VALUES (1, 'Ada', 'Lovelace', 36, 'Female');
+    INSERT INTO appointments VALUES (1, '2024-7-1 8:30', 1, 1, NULL), (2, 'next tuesday', 1, 1, NULL),
+                                    (3, '2024-07-02 09:00', 1, 1, NULL);
+    INSERT INTO medical_records VALUES (1, 1, 1, '2024-5-6', 'Asthma', 'Inhaler'), (2, 1, 1, '??', 'Flu', 'Rest');
+"""
+
+
+@pytest.fixture
+def legacy_db(tmp_path, use_database):
+    """A database written by the first release, without validated dates, upgraded at startup; returns the warnings raised"""
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+    use_database(path)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        initialize_database()
+    return caught
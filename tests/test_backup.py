@@ -0,0 +1,106 @@
+# tests/test_backup.py
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from models import backup
+from models.__init__ import DB
+from models.patient import Patient
+
+
+def patient_rows(path=None):
+    if path is None:
+        return DB.execute("SELECT * FROM patients ORDER BY id").fetchall()
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT * FROM patients ORDER BY id").fetchall()
+
+
+@pytest.mark.parametrize("pages", [None, 1])
+def test_backup_copies_every_row(people, tmp_path, pages):
+    path = tmp_path / "copy.db"
+    result = backup.backup(str(path), pages=pages)
+    assert result.path == str(path) and result.pages > 0
+    assert patient_rows(path) == patient_rows()
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_restore_replaces_the_data_and_resets_the_caches(people, tmp_path):
+    path = str(tmp_path / "copy.db")
+    backup.backup(path)
+    before = patient_rows()
+    Patient.create("Grace", "Hopper", 85, "Female")
+    ada = Patient.find_by_id(1)
+    ada.age = 37
+    ada.update()
+    backup.restore(path)
+    assert patient_rows() == before
+    # Rows loaded before the restore are not handed out again
+    assert Patient.find_by_id(1) is not ada and Patient.find_by_id(1).age == 36
+    # The name index is checked again against the restored rows
+    assert [patient.first_name for patient in Patient.search_by_name("Lovelace")] == ["Ada"]
+
+
+def test_restore_refuses_a_corrupt_backup(people, tmp_path):
+    path = tmp_path / "copy.db"
+    backup.backup(str(path))
+    data = bytearray(path.read_bytes())
+    page_size = int.from_bytes(data[16:18], "big")
+    # Scramble the cell pointers of every page but the first, which holds the header
+    for page_start in range(page_size, len(data), page_size):
+        data[page_start + 8:page_start + 64] = b"\xff" * 56
+    path.write_bytes(bytes(data))
+    before = patient_rows()
+    with pytest.raises(ValueError, match="failed its integrity check"):
+        backup.restore(str(path))
+    assert patient_rows() == before
+
+
+def test_snapshots_keep_only_the_newest(db, tmp_path, monkeypatch):
+    directory = tmp_path / "snapshots"
+    taken = iter(datetime(2024, 7, day, 12) for day in (1, 2, 3))
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return next(taken)
+
+    monkeypatch.setattr(backup, "datetime", Clock)
+    for _ in range(3):
+        backup.snapshot(str(directory), keep=2)
+    assert [taken for taken, path in backup.snapshots(str(directory))] == [datetime(2024, 7, 2, 12), datetime(2024, 7, 3, 12)]
+    assert backup.find_snapshot(str(directory), datetime(2024, 7, 2, 18)).endswith("hospital-20240702-120000-000000.db")
+    with pytest.raises(ValueError, match="No snapshot .* taken at or before 2024-07-01 12:00:00"):
+        backup.find_snapshot(str(directory), datetime(2024, 7, 1, 12))
+    with pytest.raises(ValueError, match="At least one snapshot"):
+        backup.prune(str(directory), 0)
+
+
+def test_restore_refuses_a_file_that_is_not_a_database(people, tmp_path):
+    path = tmp_path / "notes.db"
+    path.write_bytes(b"not a database" * 512)
+    with pytest.raises(ValueError, match="file is not a database"):
+        backup.restore(str(path))
+    assert len(patient_rows()) == 2
+
+
+def test_snapshots_never_replace_one_another(db, tmp_path, monkeypatch):
+    directory = tmp_path / "snapshots"
+    directory.mkdir()
+    # Named before snapshots carried microseconds
+    (directory / "hospital-20240701-120000.db").write_bytes(b"")
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2024, 7, 2, 12, 0, 0, 500)
+
+    monkeypatch.setattr(backup, "datetime", Clock)
+    first = backup.snapshot(str(directory)).path
+    with pytest.raises(FileExistsError):
+        backup.snapshot(str(directory), keep=1)
+    assert [path for taken, path in backup.snapshots(str(directory))] == [
+        str(directory / "hospital-20240701-120000.db"), first,
+    ]
+    assert first.endswith("hospital-20240702-120000-000500.db")
@@ -0,0 +1,66 @@
+# tests/test_benchmark_suite.py
+"""Per-model CRUD timings at several dataset sizes; see lib/benchmarks/suite.py.
+
+Run from the repository root:  python -m pytest -m benchmark --bench-output=bench.json  (1k, 100k and 1M rows by default)
+"""
+import json
+import random
+
+import pytest
+
+import dataset
+from benchmarks.suite import TABLES, bench_model, new_report, regressions
+from models.__init__ import DB, initialize_database
+
+pytestmark = pytest.mark.benchmark
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        metafunc.parametrize("size", metafunc.config.getoption("bench_sizes"), scope="module")
+
+
+@pytest.fixture(scope="module")
+def report(request):
+    """The report every test adds its results to, written to --bench-output at the end"""
+    profile = DB.profile
+    DB.configure(profile="fast")
+    report = new_report(request.config.getoption("bench_seed"))
+    yield report
+    DB.configure(profile=profile)
+    with open(request.config.getoption("bench_output"), "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+
+@pytest.fixture(scope="module")
+def baseline(request):
+    path = request.config.getoption("bench_baseline")
+    if not path:
+        return None
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+@pytest.fixture(scope="module")
+def loaded(size, report, tmp_path_factory):
+    """A fresh database holding the generated dataset of the given size; returns its report run"""
+    DB.configure(path=str(tmp_path_factory.mktemp("suite") / f"suite-{size}.db"))
+    for model in TABLES:
+        model.all.clear()
+    initialize_database()
+    run = {"size": size, "counts": dataset.load(size, seed=report["seed"]), "results": {}}
+    report["runs"].append(run)
+    yield run
+    DB.close_all()
+
+
+@pytest.mark.parametrize("model", TABLES, ids=lambda model: model.__name__)
+def test_model_operations(loaded, model, report, baseline, request):
+    results = bench_model(model, loaded["counts"], random.Random(report["seed"]))
+    loaded["results"][model.__name__] = results
+    if baseline:
+        run = {"size": loaded["size"], "results": {model.__name__: results}}
+        slower = list(regressions({"runs": [run]}, baseline, request.config.getoption("bench_tolerance")))
+        assert not slower, "\n".join(
+            f"size {size} {name}.{operation}: {old:.1f} -> {new:.1f} us/op" for size, name, operation, old, new in slower
+        )
@@ -0,0 +1,78 @@
+# tests/test_identity_map.py
+import sys
+import threading
+import time
+
+from models.identity_map import IdentityMap
+from models.patient import Patient
+
+
+class Item:
+    def __init__(self, id):
+        self.id = id
+
+
+def test_get_or_add_only_calls_the_factory_for_a_missing_id():
+    identity_map = IdentityMap()
+    first = identity_map.get_or_add(1, Item)
+    assert identity_map.get_or_add(1, lambda id: Item(id)) is first
+    assert identity_map.stats()["misses"] == 1 and identity_map.stats()["hits"] == 1
+
+
+def test_get_or_add_is_atomic_across_threads():
+    identity_map = IdentityMap()
+    created = []
+
+    def slow_factory(id):
+        # Give the other threads every chance to look the id up meanwhile
+        time.sleep(0.01)
+        created.append(id)
+        return Item(id)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(identity_map.get_or_add(1, slow_factory)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert created == [1]
+    assert len({id(item) for item in results}) == 1
+
+
+def test_evicted_instances_still_in_use_keep_their_identity():
+    identity_map = IdentityMap(maxsize=1)
+    kept = identity_map.get_or_add(1, Item)
+    identity_map.get_or_add(2, Item)
+    assert identity_map.get_or_add(1, Item) is kept
+
+
+def test_threads_hydrating_the_same_row_share_one_instance(people):
+    doctors, patients = people
+    row = (patients[0].id, "Ada", "Lovelace", 36, "Female")
+    threads_count, trials = 4, 200
+    # Switch threads as often as possible, so that they interleave inside instance_from_db
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(trials):
+            hydrate_concurrently(row, threads_count)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def hydrate_concurrently(row, threads_count):
+    Patient.all.clear()
+    barrier = threading.Barrier(threads_count)
+    results = []
+
+    def hydrate():
+        barrier.wait()
+        results.append(Patient.instance_from_db(row))
+
+    threads = [threading.Thread(target=hydrate) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(patient) for patient in results}) == 1
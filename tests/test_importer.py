@@ -0,0 +1,81 @@
+# tests/test_importer.py
+import gzip
+import json
+
+import pytest
+
+from models.__init__ import DB
+from models.fields import Field
+from models.importer import import_file
+from models.patient import Patient
+
+
+def write_csv(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def rows(table):
+    return DB.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_valid_csv_is_imported(db, tmp_path, workers):
+    path = write_csv(tmp_path / "patients.csv", [
+        "first_name,last_name,age,gender",
+        "Ada,Lovelace,36,Female",
+        "Alan,Turing,41,Male",
+        "Grace,Hopper,85,Female",
+    ])
+    result = import_file("patients", path, workers=workers, batch_size=2)
+    assert (result.rows, result.imported, result.rejected) == (3, 3, 0)
+    assert rows("patients") == [(1, "Ada", "Lovelace", 36, "Female"), (2, "Alan", "Turing", 41, "Male"),
+                                (3, "Grace", "Hopper", 85, "Female")]
+
+
+def test_gzipped_jsonl_fills_in_optional_columns(people, tmp_path):
+    path = tmp_path / "appointments.jsonl.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.write('{"appointment_date": "2024-7-1 9:00", "patient_id": 1, "doctor_id": 1}\n')
+    assert import_file("appointments", str(path), workers=0).imported == 1
+    assert rows("appointments") == [(1, "2024-07-01 09:00", 1, 1, None, 30)]
+
+
+def test_rejected_rows_are_written_with_their_line_and_reason(people, tmp_path):
+    doctors, patients = people
+    path = write_csv(tmp_path / "appointments.csv", [
+        "appointment_date,patient_id,doctor_id,notes,duration",
+        "2024-07-01 09:00,1,1,,30",
+        "someday,1,1,,30",
+        "2024-07-01 09:15,2,1,Overlaps line 2,30",
+        "2024-07-01 10:00,2,1,,-5",
+        "2024-07-01 10:00,2,2,Other doctor,30",
+    ])
+    errors_path = tmp_path / "errors.jsonl"
+    result = import_file("appointments", path, str(errors_path), workers=0)
+    assert (result.rows, result.imported, result.rejected) == (5, 2, 3)
+    assert [row[1:4] for row in rows("appointments")] == [("2024-07-01 09:00", 1, 1), ("2024-07-01 10:00", 2, 2)]
+    errors = [json.loads(line) for line in errors_path.read_text(encoding="utf-8").splitlines()]
+    assert [error["line"] for error in errors] == [3, 4, 5]
+    assert "YYYY-MM-DD HH:MM" in errors[0]["error"] and errors[0]["row"]["appointment_date"] == "someday"
+    # Rejected by the database step, which isolates the row that double-books doctor 1
+    assert "already booked" in errors[1]["error"] and errors[1]["row"]["notes"] == "Overlaps line 2"
+    assert errors[2]["row"]["duration"] == "-5"
+
+
+def test_unknown_table_and_file_type_are_refused(db, tmp_path):
+    with pytest.raises(ValueError, match="Table must be one of"):
+        import_file("nurses", str(tmp_path / "nurses.csv"))
+    with pytest.raises(ValueError, match="must be .csv or .jsonl"):
+        import_file("patients", str(tmp_path / "patients.xlsx"), workers=0)
+
+
+def test_validated_rows_are_created_without_validating_them_again(db, monkeypatch):
+    def refuse(field, value):
+        raise AssertionError(f"{field.name} validated again")
+
+    monkeypatch.setattr(Field, "__set__", refuse)
+    patient, = Patient.create_many([("Ada", "Lovelace", 36, "Female")], validated=True)
+    assert Patient.find_by_id(patient.id) is patient
+    assert (patient.full_name, patient.age) == ("Ada Lovelace", 36)
+    assert rows("patients") == [(patient.id, "Ada", "Lovelace", 36, "Female")]
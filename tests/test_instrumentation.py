@@ -0,0 +1,37 @@
+# tests/test_instrumentation.py
+import logging
+
+import pytest
+
+from models.__init__ import DB, track_queries
+from models.instrumentation import INSTRUMENTATION
+from models.patient import Patient
+
+
+@pytest.fixture
+def slow_log(caplog):
+    """Log every statement as slow; returns caplog"""
+    INSTRUMENTATION.log_slow_queries(0)
+    caplog.set_level(logging.WARNING, logger="hospital.slow_queries")
+    yield caplog
+    INSTRUMENTATION.log_slow_queries(None)
+
+
+def test_call_site_is_the_code_using_the_models(people):
+    with track_queries("lookup") as report:
+        Patient.find_by_id(1)
+        Patient.get_all()
+    assert {record.call_site.split()[1] for record in report.queries} == {"test_call_site_is_the_code_using_the_models"}
+    assert all(record.call_site.startswith("test_instrumentation.py:") for record in report.queries)
+
+
+def test_slow_reads_are_logged_once_with_their_row_count(people, slow_log):
+    rows = DB.execute("SELECT * FROM patients").fetchall()
+    DB.execute("SELECT * FROM patients ORDER BY id").fetchone()
+    for row in DB.execute("SELECT id FROM doctors"):
+        pass
+    DB.execute("UPDATE patients SET age = age + 1")
+    messages = [record.getMessage() for record in slow_log.records]
+    assert len(rows) == 2 and len(messages) == 4
+    assert [message.split(" rows, ")[0].split(", ")[1] for message in messages] == ["2", "1", "2", "2"]
+    assert all("from test_instrumentation.py:" in message for message in messages)
@@ -0,0 +1,72 @@
+# tests/test_name_search.py
+import sqlite3
+
+import pytest
+
+from models.__init__ import initialize_database
+from models.name_search import PATIENT_NAMES, edit_similarity, one_edit
+from models.patient import Patient
+
+
+@pytest.fixture
+def patients(db):
+    return Patient.create_many([
+        ("John", "Doe", 40, "Male"), ("Jon", "Ward", 33, "Male"), ("Maria", "Acevedo", 51, "Female"),
+        ("Luis", "Acosta", 29, "Male"), ("Jane", "Dodd", 62, "Female"),
+    ])
+
+
+def full_names(query, fuzzy=True):
+    return [patient.full_name for patient in Patient.search_by_name(query, fuzzy=fuzzy)]
+
+
+def test_prefix_search_matches_every_query_word(patients):
+    assert full_names("jo do", fuzzy=False) == ["John Doe"]
+    assert full_names("ac", fuzzy=False) == ["Maria Acevedo", "Luis Acosta"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Jonh", "John Doe"), ("Dooe", "John Doe"), ("Jonh Doe", "John Doe"),
+    ("Aecvedo", "Maria Acevedo"), ("Aocsta", "Luis Acosta"), ("Mraia Acevdo", "Maria Acevedo"),
+])
+def test_fuzzy_search_finds_a_typo_in_a_single_word(patients, query, expected):
+    assert full_names(query)[0] == expected
+
+
+def test_fuzzy_search_finds_a_word_two_edits_away_by_shared_trigrams(patients):
+    assert full_names("Acvdo")[0] == "Maria Acevedo"
+
+
+def test_fuzzy_search_scores_exact_words_before_edited_ones(patients, monkeypatch):
+    monkeypatch.setattr(PATIENT_NAMES, "CANDIDATES", 1)
+    [(patient_id, score)] = PATIENT_NAMES.fuzzy("Jon", limit=1)
+    assert (Patient.find_by_id(patient_id).full_name, score) == ("Jon Ward", 1.0)
+
+
+def test_one_edit_costs_match_edit_similarity():
+    costs = one_edit("jon")
+    assert (costs["jon"], costs["ojn"], costs["john"], costs["jo"], costs["jan"]) == (0, 0.5, 1, 1, 1)
+    assert "noj" not in costs
+
+
+def test_fuzzy_search_ignores_unrelated_names(patients):
+    assert full_names("Zzyzx") == []
+
+
+def test_swapped_letters_cost_half_an_edit():
+    assert edit_similarity("jonh", "john") > edit_similarity("jonh", "jon")
+    assert edit_similarity("smith", "smith") == 1.0
+    assert edit_similarity("abc", "xyz") == 0.0
+
+
+def test_switching_databases_checks_the_name_index_again(patients, tmp_path, use_database):
+    Patient.search_by_name("John")
+    # A database whose patients were written before the name index existed
+    path = tmp_path / "other.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE patients (id INTEGER PRIMARY KEY, first_name TEXT NOT NULL, "
+                     "last_name TEXT NOT NULL, age INTEGER NOT NULL, gender TEXT NOT NULL)")
+        conn.execute("INSERT INTO patients VALUES (1, 'Grace', 'Hopper', 85, 'Female')")
+    use_database(path)
+    initialize_database()
+    assert full_names("Grace") == ["Grace Hopper"]
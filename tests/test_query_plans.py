@@ -0,0 +1,14 @@
+# tests/test_query_plans.py
+import pytest
+
+from benchmarks.query_plans import LOOKUPS, query_plan
+
+
+@pytest.mark.parametrize("name", LOOKUPS)
+def test_lookup_is_served_by_an_index(db, name):
+    sql, params = LOOKUPS[name]
+    plan = query_plan(sql, params)
+    assert not [step for step in plan if step.startswith("SCAN")], plan
+    if "ORDER BY" in sql:
+        # The index delivers the rows in order, so nothing is sorted
+        assert not [step for step in plan if "TEMP B-TREE" in step], plan
@@ -0,0 +1,127 @@
+# tests/test_scheduling.py
+import threading
+
+import pytest
+
+from models.__init__ import DB
+from models.analytics import AppointmentSnapshot
+from models.appointment import Appointment
+from models.doctor import Doctor
+from models.schedule import SCHEDULE
+
+
+@pytest.fixture
+def unreadable_row(legacy_db):
+    """The upgraded legacy database, plus a row with an unreadable date written behind the models' back.
+
+    The date sorts among the real ones, so range queries read it too.
+    """
+    DB.execute("INSERT INTO appointments (appointment_date, patient_id, doctor_id) VALUES ('2024-07-01 soon', 1, 1)")
+    return DB.execute("SELECT MAX(id) FROM appointments").fetchone()[0]
+
+
+def test_unreadable_stored_date_does_not_block_new_bookings(unreadable_row):
+    with pytest.warns(UserWarning, match=f"Appointment {unreadable_row} has the unreadable date '2024-07-01 soon'"):
+        appointment = Appointment.create("2024-07-01 10:00", 1, 1)
+    assert Appointment.find_by_id(appointment.id) is appointment
+    with pytest.raises(ValueError, match="already booked"):
+        Appointment.create("2024-07-01 08:45", 1, 1)
+
+
+def test_unreadable_stored_date_does_not_block_availability(unreadable_row):
+    with pytest.warns(UserWarning, match="unreadable date"):
+        slots = Doctor.next_available("Cardiology", after="2024-07-01 08:00", count=1)
+    assert [(doctor.id, f"{start:%Y-%m-%d %H:%M}") for doctor, start in slots] == [(1, "2024-07-01 08:00")]
+
+
+def test_unreadable_stored_date_is_left_out_of_analytics(unreadable_row):
+    snapshot = AppointmentSnapshot()
+    with pytest.warns(UserWarning, match="unreadable date"):
+        assert snapshot.rebuild() == 3
+    doctor_ids, minutes = snapshot.booked_minutes_per_doctor()
+    assert list(doctor_ids) == [1] and list(minutes) == [60]
+
+
+def test_back_to_back_appointments_do_not_overlap(people):
+    doctors, patients = people
+    Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id)
+    Appointment.create("2024-07-01 09:30", patients[1].id, doctors[0].id, duration=60)
+    Appointment.create("2024-07-01 08:30", patients[1].id, doctors[0].id)
+    # Another doctor's diary is separate
+    Appointment.create("2024-07-01 09:00", patients[1].id, doctors[1].id)
+    assert doctors[0].is_free("2024-07-01 10:30", "2024-07-01 11:00")
+    assert not doctors[0].is_free("2024-07-01 10:15", "2024-07-01 10:45")
+
+
+def test_overlapping_appointments_are_rejected(people):
+    doctors, patients = people
+    booked = Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id, duration=60)
+    with pytest.raises(ValueError, match=f"already booked from 2024-07-01 09:00 to 2024-07-01 10:00 \\(appointment {booked.id}\\)"):
+        Appointment.create("2024-07-01 09:59", patients[1].id, doctors[0].id)
+    with pytest.raises(ValueError, match="would be double-booked at 2024-07-01 11:15"):
+        Appointment.create_many([
+            ("2024-07-01 11:00", patients[0].id, doctors[0].id),
+            ("2024-07-01 11:15", patients[1].id, doctors[0].id),
+        ])
+    assert DB.execute("SELECT COUNT(*) FROM appointments").fetchone()[0] == 1
+
+
+def test_rescheduling_onto_another_booking_is_rejected(people):
+    doctors, patients = people
+    Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id)
+    moved = Appointment.create("2024-07-01 10:00", patients[1].id, doctors[0].id)
+    # Moving within its own slot does not conflict with itself
+    moved.appointment_date = "2024-07-01 10:15"
+    moved.update()
+    moved.appointment_date = "2024-07-01 09:15"
+    with pytest.raises(ValueError, match="already booked"):
+        moved.update()
+    assert doctors[0].is_free("2024-07-01 10:00", "2024-07-01 10:15")
+
+
+
+def test_overlapping_stored_bookings_still_block_the_time_they_cover(people):
+    doctors, patients = people
+    # Written around the models, so nothing stopped them overlapping
+    DB.executemany(
+        "INSERT INTO appointments (appointment_date, patient_id, doctor_id, duration) VALUES (?, ?, ?, ?)",
+        [("2024-07-01 08:00", patients[0].id, doctors[0].id, 240), ("2024-07-01 09:00", patients[1].id, doctors[0].id, 30)],
+    )
+    assert not doctors[0].is_free("2024-07-01 10:00", "2024-07-01 10:30")
+    with pytest.raises(ValueError, match="already booked from 2024-07-01 08:00 to 2024-07-01 12:00"):
+        Appointment.create("2024-07-01 10:00", patients[0].id, doctors[0].id)
+    assert Appointment.create("2024-07-01 12:00", patients[0].id, doctors[0].id).id
+
+
+def test_delete_waits_for_a_booking_being_checked(people):
+    doctors, patients = people
+    appointment = Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id)
+    deleter = threading.Thread(target=appointment.delete)
+    with SCHEDULE.lock:
+        deleter.start()
+        deleter.join(0.1)
+        assert deleter.is_alive()
+        # Neither the row nor the booking has gone yet
+        assert DB.execute("SELECT COUNT(*) FROM appointments").fetchone()[0] == 1
+        assert not doctors[0].is_free("2024-07-01 09:00", "2024-07-01 09:30")
+    deleter.join()
+    assert doctors[0].is_free("2024-07-01 09:00", "2024-07-01 09:30")
+
+def test_next_available_skips_booked_slots(people):
+    doctors, patients = people
+    Appointment.create("2024-07-01 08:00", patients[0].id, doctors[0].id, duration=45)
+    Appointment.create("2024-07-01 09:15", patients[1].id, doctors[0].id)
+    slots = Doctor.next_available("Cardiology", duration=30, after="2024-07-01 08:00", count=3)
+    assert [(doctor.id, f"{start:%H:%M}") for doctor, start in slots] == [
+        (doctors[0].id, "08:45"), (doctors[0].id, "09:45"), (doctors[0].id, "10:00"),
+    ]
+
+
+def test_next_available_moves_on_past_a_fully_booked_day(people):
+    doctors, patients = people
+    Appointment.create("2024-07-01 08:00", patients[0].id, doctors[0].id, duration=600)
+    slots = Doctor.next_available("Cardiology", after="2024-07-01 08:00", count=1)
+    assert [(doctor.id, f"{start:%Y-%m-%d %H:%M}") for doctor, start in slots] == [(doctors[0].id, "2024-07-02 08:00")]
+    assert Doctor.next_available("Dermatology", after="2024-07-01 08:00") == []
+    # Longer than a working day
+    assert Doctor.next_available("Cardiology", duration=11 * 60, after="2024-07-01 08:00") == []
@@ -0,0 +1,29 @@
+# tests/test_search.py
+import sqlite3
+
+import pytest
+
+from models.medical_record import MedicalRecord
+
+
+def test_search_ranks_diagnosis_matches_first(people):
+    doctors, patients = people
+    treated = MedicalRecord.create(patients[0].id, doctors[0].id, "2024-05-01", "Bronchitis", "Asthma inhaler")
+    diagnosed = MedicalRecord.create(patients[1].id, doctors[0].id, "2024-05-02", "Asthma", "Inhaler")
+    assert MedicalRecord.search("asthma") == [diagnosed, treated]
+    assert MedicalRecord.search("asthma", patient_id=patients[0].id) == [treated]
+    with pytest.raises(ValueError):
+        MedicalRecord.search('"unbalanced')
+
+
+def test_search_index_created_on_a_populated_table_covers_its_rows(tmp_path, use_database):
+    path = tmp_path / "records.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE medical_records (id INTEGER PRIMARY KEY, patient_id INTEGER NOT NULL, doctor_id INTEGER NOT NULL,
+                                          record_date TEXT NOT NULL, diagnosis TEXT NOT NULL, treatment TEXT NOT NULL)
+        """)
+        conn.execute("INSERT INTO medical_records VALUES (1, 1, 1, '2024-05-06', 'Asthma', 'Inhaler')")
+    use_database(path)
+    MedicalRecord.create_table()
+    assert [record.id for record in MedicalRecord.search("asthma")] == [1]
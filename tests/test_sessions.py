@@ -0,0 +1,76 @@
+# tests/test_sessions.py
+import pytest
+
+from models.__init__ import DB, session
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+
+
+def count(table):
+    return DB.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_session_commits_writes_of_every_model_together(people):
+    doctors, patients = people
+    with session():
+        Patient.create("Grace", "Hopper", 85, "Female")
+        MedicalRecord.create(patients[0].id, doctors[0].id, "2024-05-01", "Asthma", "Inhaler")
+    assert count("patients") == 3
+    assert count("medical_records") == 1
+
+
+def test_failed_session_rolls_back_every_write(people):
+    doctors, patients = people
+    with pytest.raises(RuntimeError):
+        with session():
+            Patient.create("Grace", "Hopper", 85, "Female")
+            MedicalRecord.create(patients[0].id, doctors[0].id, "2024-05-01", "Asthma", "Inhaler")
+            raise RuntimeError
+    assert count("patients") == 2
+    assert count("medical_records") == 0
+
+
+def test_nested_session_rolls_back_to_its_savepoint(db):
+    with session():
+        kept = Patient.create("Grace", "Hopper", 85, "Female")
+        with pytest.raises(RuntimeError):
+            with session():
+                Patient.create("Ada", "Lovelace", 36, "Female")
+                raise RuntimeError
+    assert [patient.id for patient in Patient.page()] == [kept.id]
+
+
+def test_create_after_rollback_does_not_reuse_the_rolled_back_instance(db):
+    with pytest.raises(RuntimeError):
+        with session():
+            discarded = Patient.create("Grace", "Hopper", 85, "Female")
+            rolled_back_id = discarded.id
+            raise RuntimeError
+    assert discarded.id is None
+    assert rolled_back_id not in Patient.all
+
+    patient = Patient.create("Ada", "Lovelace", 36, "Female")
+    assert patient.id == rolled_back_id
+    assert Patient.find_by_id(patient.id) is patient
+    assert patient is not discarded
+
+
+def test_savepoint_rollback_only_forgets_its_own_instances(db):
+    with session():
+        with pytest.raises(RuntimeError):
+            with session():
+                inner = Patient.create("Grace", "Hopper", 85, "Female")
+                raise RuntimeError
+        outer = Patient.create("Ada", "Lovelace", 36, "Female")
+    assert inner.id is None
+    assert Patient.find_by_id(outer.id) is outer
+
+
+def test_instances_committed_by_a_nested_session_are_rolled_back_with_the_outer_one(db):
+    with pytest.raises(RuntimeError):
+        with session():
+            with session():
+                patients = Patient.create_many([("Grace", "Hopper", 85, "Female"), ("Ada", "Lovelace", 36, "Female")])
+            raise RuntimeError
+    assert [patient.id for patient in patients] == [None, None]
+    assert count("patients") == 0
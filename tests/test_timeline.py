@@ -0,0 +1,54 @@
+# tests/test_timeline.py
+import asyncio
+
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+
+
+def all_pages(patient_id, limit):
+    pages, before = [], None
+    while True:
+        page = Patient.timeline(patient_id, before, limit)
+        if not page:
+            return pages
+        pages.append(page)
+        before = page[-1]
+
+
+def test_pages_follow_one_another_newest_first(people):
+    doctors, patients = people
+    Appointment.create_many([(f"2024-07-{day:02} 09:00", patients[0].id, doctors[0].id) for day in range(1, 11)])
+    MedicalRecord.create_many([(patients[0].id, doctors[0].id, f"2024-06-{day:02}", "Check-up", "None")
+                               for day in range(1, 6)])
+    Appointment.create("2024-07-01 09:00", patients[1].id, doctors[1].id)
+    pages = all_pages(patients[0].id, 4)
+    events = [event for page in pages for event in page]
+    assert [len(page) for page in pages] == [4, 4, 4, 3]
+    assert [event.date for event in events] == sorted((event.date for event in events), reverse=True)
+    assert events[0].date == "2024-07-10 09:00" and events[-1].date == "2024-06-01"
+    assert {event.item.patient_id for event in events} == {patients[0].id}
+
+
+def test_events_of_the_same_date_are_neither_repeated_nor_skipped(people):
+    doctors, patients = people
+    # Records carry no time, so they follow the appointments of their day, even those at midnight
+    records = MedicalRecord.create_many([(patients[0].id, doctors[0].id, "2024-07-01", "Flu", "Rest")] * 3)
+    appointments = Appointment.create_many([
+        ("2024-07-01 00:00", patients[0].id, doctors[0].id),
+        ("2024-07-01 00:00", patients[0].id, doctors[1].id),
+    ])
+    for limit in (1, 2, 4):
+        events = [event for page in all_pages(patients[0].id, limit) for event in page]
+        assert [(event.kind, event.id) for event in events] == (
+            [("appointment", appointment.id) for appointment in reversed(appointments)]
+            + [("medical_record", record.id) for record in reversed(records)]
+        )
+        # A (date, kind, id) tuple works as the cursor too
+        assert Patient.timeline(patients[0].id, tuple(events[0][:3]), 1) == events[1:2]
+
+
+def test_patient_without_history_has_an_empty_timeline(people):
+    doctors, patients = people
+    assert Patient.timeline(patients[1].id) == []
+    assert asyncio.run(Patient.atimeline(patients[1].id)) == []
@@ -0,0 +1,50 @@
+# tests/test_workload.py
+from models import workload
+from models.__init__ import DB
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.workload import Workload
+
+
+def summary(table):
+    return DB.execute(f"SELECT * FROM {table} ORDER BY doctor_id, day").fetchall()
+
+
+def test_triggers_keep_the_summaries_in_step_with_every_write(people):
+    doctors, patients = people
+    first = Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id)
+    Appointment.create_many([
+        ("2024-07-01 10:00", patients[1].id, doctors[0].id, None, 60),
+        ("2024-07-02 09:00", patients[0].id, doctors[1].id),
+    ])
+    MedicalRecord.create(patients[0].id, doctors[0].id, "2024-07-01", "Asthma", "Inhaler")
+    first.duration = 45
+    first.update()
+    assert workload.check() == []
+    assert workload.by_doctor() == [Workload(doctors[0].id, 2, 105, 1), Workload(doctors[1].id, 1, 30, 0)]
+    assert workload.by_day("2024-07-01", "2024-07-02") == [Workload("2024-07-01", 2, 105, 1)]
+    assert workload.by_specialization() == [Workload("Cardiology", 2, 105, 1), Workload("Neurology", 1, 30, 0)]
+
+
+def test_moving_or_deleting_the_last_appointment_of_a_day_removes_its_summary_row(people):
+    doctors, patients = people
+    appointment = Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id)
+    appointment.doctor_id = doctors[1].id
+    appointment.appointment_date = "2024-07-03 09:00"
+    appointment.update()
+    assert summary("appointment_workload") == [(doctors[1].id, "2024-07-03", 1, 30)]
+    record = MedicalRecord.create(patients[0].id, doctors[0].id, "2024-07-01", "Asthma", "Inhaler")
+    appointment.delete()
+    record.delete()
+    assert summary("appointment_workload") == []
+    assert summary("medical_record_workload") == []
+    assert workload.check() == []
+
+
+def test_rebuild_repairs_summaries_written_around_the_triggers(people):
+    doctors, patients = people
+    Appointment.create("2024-07-01 09:00", patients[0].id, doctors[0].id)
+    DB.execute("DELETE FROM appointment_workload")
+    assert workload.check() == [("appointment_workload", doctors[0].id, "2024-07-01")]
+    workload.rebuild()
+    assert workload.check() == []